@@ -0,0 +1,55 @@
+"""Compare two sets of benchmark results written by `run.py`.
+
+For every benchmark in both sets the best times are compared. Benchmarks which are slower by more than the threshold
+are reported as regressions, and the exit status is 1 if there are any, so the comparison can gate a CI job:
+
+    python benchmarks/compare.py before.json after.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base", type=Path, help="The results to compare against.")
+    parser.add_argument("head", type=Path, help="The results to compare.")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="The relative slowdown reported as a regression (default 0.1)."
+    )
+    args = parser.parse_args(argv)
+
+    base = _load(args.base)
+    head = _load(args.head)
+    regressions = 0
+    print(f"{'benchmark':<60} {'base (us)':>12} {'head (us)':>12} {'change':>8}  {'memory':>12}")
+    for name in sorted(base.keys() & head.keys()):
+        before, after = base[name], head[name]
+        change = after["best"] / before["best"] - 1
+        regressed = change > args.threshold
+        regressions += regressed
+        memory = ""
+        if "peak_bytes" in before and "peak_bytes" in after:
+            memory = f"{after['peak_bytes'] / before['peak_bytes'] - 1:+.1%}"
+        print(
+            f"{name:<60} {before['best'] * 1e6:>12.2f} {after['best'] * 1e6:>12.2f} {change:>+8.1%}  {memory:>12}"
+            + ("  REGRESSION" if regressed else "")
+        )
+
+    for name in sorted(base.keys() - head.keys()):
+        print(f"{name:<60} only in {args.base}")
+    for name in sorted(head.keys() - base.keys()):
+        print(f"{name:<60} only in {args.head}")
+
+    return 1 if regressions else 0
+
+
+def _load(path: Path) -> dict[str, dict]:
+    "Load a set of results, by benchmark name."
+    return {result["name"]: result for result in json.loads(path.read_text())["results"]}
+
+
+if __name__ == "__main__":
+    sys.exit(main())
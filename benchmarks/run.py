@@ -0,0 +1,194 @@
+"""Measure how fast source maps are built and queried, over synthetic documents of controlled size.
+
+Every benchmark times one operation on one document: building a source map from the source, point queries with
+`get_range()` and `get_path()`, range queries with `get_paths_overlapping()`, batch queries with `get_ranges()`
+and `get_paths()`, and the first query of a lazy source map, including scanning the source. Construction also records
+the peak memory allocated while building the source map. The results are written as JSON, which `compare.py` compares
+between two runs:
+
+    python benchmarks/run.py --output before.json
+    git checkout my-branch
+    python benchmarks/run.py --output after.json
+    python benchmarks/compare.py before.json after.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from yaml_where import CompiledSourceMap, LazySourceMap, YAMLWhere, __version__
+from yaml_where.engines import c_engine_available
+from yaml_where.path import Descendants
+from yaml_where.testing import documents
+
+# The documents to benchmark, by name, with their generator and the sizes to generate them at for quick and full runs
+DOCUMENTS = {
+    "wide_mapping": (documents.wide_mapping, 1_000, 10_000),
+    "long_sequence": (documents.long_sequence, 1_000, 10_000),
+    "flow_sequence": (lambda size: documents.long_sequence(size, flow=True), 1_000, 10_000),
+    "deep_nesting": (documents.deep_nesting, 50, 200),
+    "block_scalar": (documents.block_scalar, 1_000, 10_000),
+    "document_stream": (documents.document_stream, 20, 200),
+}
+
+# The source map types to benchmark, by name
+SOURCE_MAPS = {
+    "yaml_where": YAMLWhere,
+    "compiled": CompiledSourceMap,
+}
+
+# The documents to benchmark the first query of a lazy source map on, which have many top-level entries
+LAZY_DOCUMENTS = ["wide_mapping", "long_sequence"]
+
+# The most paths and positions that point and batch queries use
+MAX_QUERIES = 1_000
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", "-o", type=Path, help="Write the results to this JSON file, rather than stdout.")
+    parser.add_argument("--quick", action="store_true", help="Use small documents, to check that benchmarks run.")
+    parser.add_argument("--filter", "-k", default="", help="Only run benchmarks whose names contain this string.")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of timing runs for each benchmark.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, func in benchmarks(args.quick):
+        if args.filter not in name:
+            continue
+        result = measure(func, args.repeat)
+        result["name"] = name
+        if "/from_string" in name:
+            result["peak_bytes"] = peak_memory(func)
+        print(f"{name:<60} {result['best'] * 1e6:>14.2f} us", file=sys.stderr)
+        results.append(result)
+
+    output = json.dumps({"metadata": metadata(args.quick), "results": results}, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        args.output.write_text(output + "\n")
+    return 0
+
+
+def benchmarks(quick: bool) -> Iterator[tuple[str, Callable[[], object]]]:
+    """Generate the benchmarks, as (name, function) pairs.
+
+    Names are `document/size/source map/operation`. The functions perform the operation once, except for point
+    queries, which each perform one query per sampled path or position, so their times are divided by the number of
+    queries.
+    """
+    engines = ["python", "c"] if c_engine_available() else ["python"]
+    for document, (generate, quick_size, full_size) in DOCUMENTS.items():
+        size = quick_size if quick else full_size
+        source = generate(size)
+        for map_name, source_map_type in SOURCE_MAPS.items():
+            prefix = f"{document}/{size}/{map_name}"
+            if document == "document_stream":
+                if source_map_type is YAMLWhere:
+                    yield f"{prefix}/from_string", lambda source=source: list(YAMLWhere.iter_documents(source))
+                continue
+
+            for engine in engines:
+                suffix = "" if engine == "python" else f"[{engine}]"
+                yield (
+                    f"{prefix}/from_string{suffix}",
+                    lambda source=source, cls=source_map_type, engine=engine: cls.from_string(source, engine),
+                )
+
+            yield from _query_benchmarks(prefix, source_map_type.from_string(source), YAMLWhere.from_string(source))
+
+        if document in LAZY_DOCUMENTS:
+            # The path of the middle top-level element
+            paths = [path for path, _ in YAMLWhere.from_string(source).find_ranges([Descendants()]) if len(path) == 1]
+            path = paths[len(paths) // 2]
+            yield (
+                f"{document}/{size}/lazy/first_query",
+                lambda source=source, path=path: LazySourceMap.from_string(source).get_range(*path),
+            )
+
+
+def _query_benchmarks(prefix: str, source_map, reference: YAMLWhere) -> Iterator[tuple[str, Callable[[], object]]]:
+    "Generate the query benchmarks for a source map, with paths and positions sampled from every element."
+    matches = [(path, rng) for path, rng in reference.find_ranges([Descendants()]) if path]
+    step = max(1, len(matches) // MAX_QUERIES)
+    paths = [path for path, _ in matches[::step]]
+    ranges = [rng for _, rng in matches[::step]]
+    positions = [rng.start for rng in ranges]
+
+    def get_range():
+        for path in paths:
+            source_map.get_range(*path)
+
+    def get_path():
+        for pos in positions:
+            source_map.get_path(pos)
+
+    def get_paths_overlapping():
+        for rng in ranges:
+            source_map.get_paths_overlapping(rng)
+
+    get_range.queries = len(paths)
+    get_path.queries = len(positions)
+    get_paths_overlapping.queries = len(ranges)
+    yield f"{prefix}/get_range", get_range
+    yield f"{prefix}/get_path", get_path
+    yield f"{prefix}/get_paths_overlapping", get_paths_overlapping
+    yield f"{prefix}/get_ranges", lambda: source_map.get_ranges(paths)
+    yield f"{prefix}/get_paths", lambda: source_map.get_paths(positions)
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    """Time a function.
+
+    The function is called enough times per run to take at least 0.2 seconds, and the best and median times per call
+    of `repeat` runs are reported. The best time is the least affected by other work on the machine.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    queries = getattr(func, "queries", 1)
+    times = [elapsed / number / queries for elapsed in timer.repeat(repeat, number)]
+    return {"best": min(times), "median": statistics.median(times), "number": number, "repeat": repeat}
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    "Get the peak number of bytes allocated while a function runs."
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def metadata(quick: bool) -> dict:
+    "Describe the environment that the benchmarks ran in."
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "version": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "c_engine": c_engine_available(),
+        "quick": quick,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
 from .version import __version__, __version_info__
 
 from .yaml_where import YAMLWhere
+from .compiled import CompiledSourceMap
+from .lazy import LazySourceMap
+from .cache import CacheStats, SourceMapCache
+from .bulk import index_files
 from .exceptions import MissingKeyError, UndefinedAccessError
 from .range import Range, Position
 
@@ -8,9 +12,14 @@ from .range import Range, Position
 __all__ = [
     "__version__",
     "__version_info__",
+    "CacheStats",
+    "CompiledSourceMap",
+    "LazySourceMap",
     "MissingKeyError",
     "Position",
     "Range",
+    "SourceMapCache",
     "UndefinedAccessError",
     "YAMLWhere",
+    "index_files",
 ]
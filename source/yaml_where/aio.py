@@ -0,0 +1,110 @@
+"""Support for building source maps from asyncio code.
+
+Parsing a large source takes long enough to stall an event loop, so the asynchronous constructors run it in an
+executor. Concurrent requests for the same work share a single call, and a call is cancelled when every task waiting
+for it is.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Executor
+from typing import Any
+
+
+class _SharedCall:
+    "A call running in an executor, and the number of tasks waiting for its result."
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+# The calls in progress, by event loop and key
+_calls: dict[tuple[asyncio.AbstractEventLoop, Hashable], _SharedCall] = {}
+
+
+async def run_coalesced(key: Hashable, executor: Executor | None, func: Callable, *args) -> Any:
+    """Call a function in an executor, sharing the call with concurrent callers which use the same key.
+
+    If a call with the same key is already in progress in the running event loop its result is awaited, rather than
+    calling the function again. Cancelling a caller does not affect the others, but once every caller is cancelled the
+    call is cancelled too: it is removed from the executor's queue if it has not started, and its result is discarded
+    otherwise.
+
+    Args:
+        key (Hashable): Identifies the call. Calls with equal keys must return equivalent results.
+        executor (Executor | None): The executor to call the function in, or None for the event loop's default
+            executor.
+        func (Callable): The function to call.
+        *args: The arguments to call the function with.
+
+    Returns:
+        Any: The result of the call.
+    """
+    loop = asyncio.get_running_loop()
+    call_key = (loop, key)
+    call = _calls.get(call_key)
+    if call is None:
+        call = _SharedCall(loop.run_in_executor(executor, func, *args))
+        _calls[call_key] = call
+        call.future.add_done_callback(lambda _: _forget(call_key, call))
+
+    call.waiters += 1
+    try:
+        return await asyncio.shield(call.future)
+    finally:
+        call.waiters -= 1
+        if call.waiters == 0 and not call.future.done():
+            # Later callers start a new call, rather than sharing the cancelled one
+            call.future.cancel()
+            _forget(call_key, call)
+
+
+def _forget(call_key: tuple, call: _SharedCall):
+    "Stop sharing a call with new callers."
+    if _calls.get(call_key) is call:
+        del _calls[call_key]
+
+
+class LatestVersions:
+    """Runs work for versions of documents, cancelling the work for a version when a newer version arrives.
+
+    This suits editors and language servers, where a buffer can change again before the source map for its previous
+    contents is ready:
+
+        latest = LatestVersions()
+        source_map = await latest.run(uri, version, YAMLWhere.afrom_string(text))
+    """
+
+    def __init__(self):
+        self._tasks: dict[Hashable, tuple[int, asyncio.Task]] = {}
+
+    async def run(self, document: Hashable, version: int, awaitable: Awaitable) -> Any:
+        """Await the work for a version of a document.
+
+        Args:
+            document (Hashable): Identifies the document, for example by its URI.
+            version (int): The version of the document. Versions increase as the document changes.
+            awaitable (Awaitable): The work for this version.
+
+        Returns:
+            Any: The result of the work.
+
+        Raises:
+            asyncio.CancelledError: If a newer version of the document arrived before the work was finished, or this
+                version is older than one which has already arrived.
+        """
+        task = asyncio.ensure_future(awaitable)
+        current = self._tasks.get(document)
+        if current is not None and current[0] > version:
+            task.cancel()
+        else:
+            if current is not None:
+                current[1].cancel()
+            self._tasks[document] = (version, task)
+
+        try:
+            return await task
+        finally:
+            if self._tasks.get(document, (None, None))[1] is task:
+                del self._tasks[document]
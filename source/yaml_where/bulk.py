@@ -0,0 +1,120 @@
+"""Building source maps for many files in parallel."""
+
+import os
+from collections.abc import Generator, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from multiprocessing.context import BaseContext
+
+from ruamel.yaml.error import YAMLError
+
+from yaml_where import engines
+from yaml_where.compiled import CompiledSourceMap
+
+# The exceptions raised for files which can't be read or parsed. Any other exception is a bug, and is raised.
+_FILE_ERRORS = (OSError, YAMLError)
+
+
+def index_files(
+    paths: Iterable[str | os.PathLike],
+    workers: int | None = None,
+    engine: str = "python",
+    mp_context: BaseContext | None = None,
+) -> Iterator[tuple[str | os.PathLike, CompiledSourceMap | Exception]]:
+    """Build compiled source maps for YAML files using a pool of worker processes.
+
+    Each file is read and parsed in a worker process, which sends back the compact compiled source map rather than the
+    composed nodes. Results are yielded as soon as they are ready, so they are not in the order of `paths`. Only a few
+    files per worker are in flight at any time, so `paths` may be a lazy iterable of any length.
+
+    A file which can't be read or parsed doesn't stop the others from being indexed: the OSError or YAMLError is
+    yielded in place of its source map. A worker process which dies, for example because it runs out of memory, breaks
+    the pool. The files in flight in the pool are then yielded with a BrokenProcessPool error, and the remaining files
+    are indexed in a new pool. Any other exception is raised.
+
+    Args:
+        paths (Iterable[str | os.PathLike]): The paths of the YAML files.
+        workers (int | None): The number of worker processes, or None for one per CPU. With 0 workers the files are
+            indexed in the calling process.
+        engine (str): The parsing engine to use, "python" or "c".
+        mp_context (BaseContext | None): The multiprocessing context to start worker processes with, or None for the
+            default context, as for `ProcessPoolExecutor`.
+
+    Returns:
+        Iterator[tuple[str | os.PathLike, CompiledSourceMap | Exception]]: (path, result) pairs, where the result is
+            the compiled source map for the file, with `filename` set to the path, or the error which stopped it being
+            built.
+
+    Raises:
+        ValueError: If `workers` is negative or the engine is unknown, when iteration starts.
+    """
+    if workers is not None and workers < 0:
+        raise ValueError(f"workers must not be negative, not {workers}")
+    if engine not in engines.ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(engines.ENGINES)}")
+
+    if workers == 0:
+        for path in paths:
+            try:
+                yield path, _index_file(path, engine)
+            except _FILE_ERRORS as err:
+                yield path, err
+        return
+
+    workers = workers or os.cpu_count() or 1
+    remaining: Iterator | None = iter(paths)
+    while remaining is not None:
+        remaining = yield from _index_in_pool(remaining, workers, engine, mp_context)
+
+
+def _index_in_pool(
+    paths: Iterator[str | os.PathLike], workers: int, engine: str, mp_context: BaseContext | None
+) -> Generator[tuple, None, Iterator | None]:
+    """Index files in a new pool of worker processes, as `index_files()` does.
+
+    Returns:
+        Iterator | None: The paths which are left if the pool broke, or None once every path has been indexed.
+    """
+    with ProcessPoolExecutor(workers, mp_context) as executor:
+        max_pending = workers * 4
+        pending: dict[Future, str | os.PathLike] = {}
+        remaining = None
+        for path in paths:
+            try:
+                pending[executor.submit(_index_file, path, engine)] = path
+            except BrokenProcessPool:
+                # The futures in flight fail with the same error, and the rest of the paths go to a new pool
+                remaining = chain([path], paths)
+                break
+
+            if len(pending) >= max_pending:
+                yield from _finished(pending, wait(pending, return_when=FIRST_COMPLETED).done)
+        while pending:
+            yield from _finished(pending, wait(pending, return_when=FIRST_COMPLETED).done)
+    return remaining
+
+
+def _finished(pending: dict, done: set) -> Iterator[tuple]:
+    "Remove finished futures from `pending`, and get their paths and results."
+    for future in done:
+        path = pending.pop(future)
+        try:
+            yield path, future.result()
+        except (*_FILE_ERRORS, BrokenProcessPool) as err:
+            yield path, err
+
+
+def _index_file(path: str | os.PathLike, engine: str) -> CompiledSourceMap:
+    "Build the compiled source map for a file."
+    with open(path, "rb") as stream:
+        source = stream.read()
+    try:
+        # Strings can be parsed by either engine, while other encodings are detected by the "python" engine
+        source = source.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+
+    source_map = CompiledSourceMap.from_string(source, engine)
+    source_map.filename = os.fspath(path)
+    return source_map
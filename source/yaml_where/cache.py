@@ -0,0 +1,142 @@
+"""Caching of source maps for unchanged sources.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from yaml_where.storage import content_hash
+from yaml_where.yaml_where import YAMLWhere
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    "Counters describing the effectiveness of a SourceMapCache."
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+
+
+class SourceMapCache:
+    """A least-recently-used cache of source maps.
+
+    Source maps built from strings are keyed by a hash of their content, and source maps built from files are keyed by
+    the file's path, modification time and size, so unchanged sources are not parsed (or, for files, read) again.
+
+    The cache is bounded by a number of entries and, optionally, by a total size. The size of an entry is the size of
+    its source in bytes, which is a reasonable proxy for the size of the source map. When either bound is exceeded the
+    least recently used entries are evicted. Sources which are on their own bigger than the size bound are not cached.
+
+    Cached source maps are shared between all callers which look them up, so they must not be modified.
+
+    Caches are safe to use from several threads.
+    """
+
+    def __init__(self, max_entries: int = 128, max_size: int | None = None):
+        """
+        Args:
+            max_entries (int): The maximum number of source maps to keep.
+            max_size (int | None): The maximum total size, in bytes, of the sources of the cached source maps, or None
+                for no size bound.
+        """
+        if max_entries < 0:
+            raise ValueError(f"max_entries must not be negative, not {max_entries}")
+        if max_size is not None and max_size < 0:
+            raise ValueError(f"max_size must not be negative, not {max_size}")
+
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._entries: OrderedDict[tuple, tuple[YAMLWhere, int]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def from_string(self, source: str) -> YAMLWhere:
+        """Get the source map for a YAML string, building it if it is not cached.
+
+        Args:
+            source (str): The YAML string.
+
+        Returns:
+            YAMLWhere: The source map for the string.
+        """
+        data = source.encode("utf-8", "surrogatepass")
+        key = ("string", content_hash(data))
+        source_map = self._get(key)
+        if source_map is None:
+            source_map = YAMLWhere.from_string(source)
+            self._put(key, source_map, len(data))
+        return source_map
+
+    def from_path(self, path: str | os.PathLike) -> YAMLWhere:
+        """Get the source map for a YAML file, building it if it is not cached.
+
+        The file is only read if it was modified, or changed size, since it was cached.
+
+        Args:
+            path (str | os.PathLike): The path of the YAML file.
+
+        Returns:
+            YAMLWhere: The source map for the file.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = ("path", path, stat.st_mtime_ns, stat.st_size)
+        source_map = self._get(key)
+        if source_map is None:
+            source_map = YAMLWhere.from_path(path)
+            self._put(key, source_map, stat.st_size)
+        return source_map
+
+    @property
+    def stats(self) -> CacheStats:
+        "A snapshot of the cache's counters."
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._size)
+
+    def clear(self):
+        "Remove all entries from the cache. The counters are kept."
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key: tuple) -> YAMLWhere | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key: tuple, source_map: YAMLWhere, size: int):
+        if self._max_size is not None and size > self._max_size:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                # Another thread built the same source map concurrently
+                return
+
+            self._entries[key] = (source_map, size)
+            self._size += size
+            while len(self._entries) > self._max_entries or (
+                self._max_size is not None and self._size > self._max_size
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self._evictions += 1
+
+
+#: A cache shared by the whole process.
+default_cache = SourceMapCache()
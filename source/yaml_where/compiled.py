@@ -0,0 +1,1009 @@
+"""Compact, array-backed source maps.
+
+A compiled source map holds the spans of every element of a document in flat arrays, so it can answer queries without
+keeping the YAML node graph alive.
+"""
+
+from array import array
+from bisect import bisect_right
+from collections.abc import Callable, Iterable, Iterator
+
+from ruamel.yaml import YAML, MappingNode, Node, ScalarNode, SequenceNode
+from ruamel.yaml.composer import ComposerError
+from ruamel.yaml.events import (
+    AliasEvent,
+    CollectionEndEvent,
+    Event,
+    MappingStartEvent,
+    NodeEvent,
+    ScalarEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+
+from yaml_where import engines, instrumentation
+from yaml_where.exceptions import (
+    MissingKeyError,
+    NoSuchPathError,
+    UndefinedAccessError,
+    UnsupportedNodeTypeError,
+    YAMLWhereException,
+)
+from yaml_where.intervals import IntervalIndex
+from yaml_where.lines import LineIndex
+from yaml_where.path import (
+    AnyKey,
+    Descendants,
+    Index,
+    Item,
+    Key,
+    Value,
+    YAMLPath,
+    YAMLPathComponent,
+)
+from yaml_where.range import Position, Range
+from yaml_where.traversal import find_in_sequence, pattern_reach, sequence_index
+
+#: The biases of `get_nearest_path()`.
+NEAREST_BIASES = ("enclosing", "before", "after")
+
+# Row kinds
+NULL = 0
+SCALAR = 1
+SEQUENCE = 2
+MAPPING = 3
+
+
+class CompiledSourceMap:
+    """A source map whose spans are stored in flat arrays.
+
+    Every element of the document is a *row*. Rows are numbered in document order, with the document's root as row 0.
+    For each row the map stores its kind, its parent row, the span of its key (for the values of mappings) and the span
+    of its value. The child rows of each collection are stored contiguously in `children`, so that children can be
+    bisected by position.
+
+    An alias to a collection is a row of its own, which shares the children of the anchored collection rather than
+    copying them, so a map is no larger than the document's node graph. The parent of a shared child is the anchored
+    collection.
+
+    Compiled source maps have the same query interface as `YAMLWhere`. Because they don't keep the node graph, keys of
+    mappings which are not scalars (complex keys) are recorded as None.
+    """
+
+    #: The path of the file the source map was read from, if any.
+    filename: str | None = None
+
+    #: The YAML string the source map was created from, if any. Stored source maps don't keep their source.
+    source: str | None = None
+
+    def __init__(
+        self,
+        kinds: array,
+        parents: array,
+        keys: list,
+        key_spans: array,
+        value_spans: array,
+        child_offsets: array,
+        child_counts: array,
+        children: array,
+        ordered: array,
+    ):
+        self._kinds = kinds
+        self._parents = parents
+        self._keys = keys
+        self._key_spans = key_spans
+        self._value_spans = value_spans
+        self._child_offsets = child_offsets
+        self._child_counts = child_counts
+        self._children = children
+        self._ordered = ordered
+        self._key_index: dict | None = None
+        self._intervals: IntervalIndex | None = None
+        self._lines: LineIndex | None = None
+
+    @classmethod
+    def from_string(cls, source: str, engine: str = "python") -> "CompiledSourceMap":
+        """Create a CompiledSourceMap from a YAML string.
+
+        With the "python" engine the source map is built from the parser's events, without composing the document's
+        nodes. The "c" engine composes the nodes with libyaml, which is faster still, when it is installed.
+
+        Args:
+            source (str): The YAML string to parse.
+            engine (str): The parsing engine to use, "python" or "c".
+
+        Returns:
+            CompiledSourceMap: The compiled source map for the document.
+
+        Raises:
+            ValueError: If the engine is unknown.
+        """
+        if engine not in engines.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(engines.ENGINES)}")
+        if engine == "c" and engines.c_engine_available():
+            source_map = cls.from_node(engines.compose(source, engine))
+        else:
+            source_map = cls.from_events(YAML(typ="rt").parse(source))
+        if isinstance(source, str):
+            source_map.source = source
+        return source_map
+
+    # Events are usually parsed as they are read, so the measurement includes the time spent parsing
+    @classmethod
+    @instrumentation.measured(instrumentation.COMPOSE, "from_events")
+    def from_events(cls, events: Iterable[Event]) -> "CompiledSourceMap":
+        """Create a CompiledSourceMap from the parser events of a single-document YAML stream.
+
+        The source map is the same as `from_node()` would create from the composed document, but no nodes are created.
+        Only the events of anchored nodes are kept, so that they can be replayed for their aliases.
+
+        Args:
+            events (Iterable[Event]): The events of the stream, as produced by `YAML.parse()`.
+
+        Returns:
+            CompiledSourceMap: The compiled source map for the document.
+
+        Raises:
+            ComposerError: If the stream holds more than one document, or an alias refers to an undefined anchor.
+        """
+        return _EventReader(events).read()
+
+    @classmethod
+    @instrumentation.measured(instrumentation.COMPOSE, "from_node")
+    def from_node(cls, node: Node | None) -> "CompiledSourceMap":
+        """Create a CompiledSourceMap from a composed YAML node.
+
+        The node tree is walked once, iteratively, in document order.
+
+        Args:
+            node (Node | None): The root node of a document, or None for an empty document.
+
+        Returns:
+            CompiledSourceMap: The compiled source map for the document.
+        """
+        builder = _SourceMapBuilder()
+        if node is None:
+            builder.null()
+            return builder.finish()
+
+        # The collections being walked, with iterators over their remaining (key node, value node) entries. Their ids
+        # are tracked so that recursive aliases are not followed forever.
+        stack: list[tuple[Node, Iterator[tuple[Node | None, Node]]]] = []
+        active: set[int] = set()
+
+        # The rows of the collections by id, which aliases to them share
+        rows: dict[int, int] = {}
+
+        def visit(key_node: Node | None, node: Node):
+            key = key_node.value if isinstance(key_node, ScalarNode) else None
+            key_span = None if key_node is None else _span(key_node)
+            if isinstance(node, ScalarNode):
+                builder.scalar(key, key_span, _span(node))
+                return
+
+            if id(node) in rows and id(node) not in active:
+                builder.alias(key, key_span, rows[id(node)])
+                return
+
+            row = len(builder.kinds)
+            if isinstance(node, MappingNode):
+                builder.start_collection(MAPPING, key, key_span, _start(node))
+                entries = iter(node.value)
+            elif isinstance(node, SequenceNode):
+                builder.start_collection(SEQUENCE, key, key_span, _start(node))
+                entries = ((None, child) for child in node.value)
+            else:
+                raise UnsupportedNodeTypeError(f"Unsupported node type {type(node).__name__}")  # pragma: no cover
+
+            if id(node) in active:
+                builder.end_collection(_end(node))
+            else:
+                active.add(id(node))
+                rows[id(node)] = row
+                stack.append((node, entries))
+
+        visit(None, node)
+        while stack:
+            collection, entries = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                active.discard(id(collection))
+                builder.end_collection(_end(collection))
+            else:
+                visit(*entry)
+
+        return builder.finish()
+
+    @instrumentation.measured(instrumentation.QUERY, "get_path", lambda self, pos: pos)
+    def get_path(self, pos: Position) -> YAMLPath:
+        """Get the path corresponding to a position in the document.
+
+        Args:
+            pos (Position): The position to get the path for.
+
+        Returns:
+            YAMLPath: The path components for the position.
+        """
+        return self._get_path(pos)
+
+    @instrumentation.measured(instrumentation.QUERY, "get_nearest_path", lambda self, pos, bias="enclosing": pos)
+    def get_nearest_path(self, pos: Position, bias: str = "enclosing") -> YAMLPath:
+        """Get the path of the element nearest to a position, which need not be in any element.
+
+        This has the same semantics as `YAMLWhere.get_nearest_path()`.
+        """
+        if bias not in NEAREST_BIASES:
+            raise ValueError(f"Unknown bias {bias!r}, expected one of {', '.join(NEAREST_BIASES)}")
+
+        return self._get_path(pos, bias)
+
+    def _get_path(self, pos: Position, bias: str | None = None) -> YAMLPath:
+        """Get the path corresponding to a position, as `get_path()` does.
+
+        With a bias, positions which are in no element give the path of the nearest element, as `get_nearest_path()`
+        does, rather than raising NoSuchPathError.
+        """
+        point = (pos.line, pos.column)
+        path: list[YAMLPathComponent] = []
+        row = 0
+        while True:
+            instrumentation.visit()
+            kind = self._kinds[row]
+            if kind == SCALAR:
+                return tuple(path)
+
+            if kind == NULL:
+                raise NoSuchPathError("Can not resolve a path in a null node")
+
+            idx = self._locate(row, point)
+            if idx is None:
+                if bias is None:
+                    raise NoSuchPathError(f"Can not resolve the range {pos} to a path")
+
+                # Once the walk leaves the position, this finds the last or first child of each collection
+                idx = None if bias == "enclosing" else self._nearest(row, point, bias)
+                if idx is None:
+                    return tuple(path)
+
+            offset = self._child_offsets[row]
+            if kind == SEQUENCE:
+                row = self._children[offset + idx]
+                path.append(Index(idx))
+                continue
+
+            row = self._children[offset + idx // 2]
+            if idx % 2 == 0:
+                # Paths which land on a key end there
+                path.append(Key(self._keys[row]))
+                return tuple(path)
+
+            path.append(Value(self._keys[row]))
+
+    def get_paths(self, positions: Iterable[Position]) -> list[YAMLPath | NoSuchPathError]:
+        """Get the paths corresponding to many positions in the document.
+
+        This has the same semantics as `YAMLWhere.get_paths()`.
+        """
+        positions = list(positions)
+        results = []
+        with instrumentation.measure(instrumentation.QUERY, "get_paths", len(positions)):
+            for pos in positions:
+                try:
+                    results.append(self._get_path(pos))
+                except NoSuchPathError as err:
+                    results.append(err)
+        return results
+
+    @instrumentation.measured(instrumentation.QUERY, "get_range", lambda self, *path: path)
+    def get_range(self, *path: YAMLPathComponent) -> Range:
+        """Get the range for an entry.
+
+        This has the same semantics as `YAMLWhere.get_range()`.
+
+        Raises:
+            MissingKeyError: A key is of the appropriate type for an element, but is missing in that element.
+            UndefinedAccessError: If a key is of an inappropriate type for an element.
+        """
+        if not path:
+            kind = self._kinds[0]
+            if kind == SCALAR:
+                return self._value_range(0)
+            if kind == NULL:
+                raise UndefinedAccessError("get() is not defined for null nodes")
+            raise UndefinedAccessError("get_range() with empty path is not defined for collections")
+
+        row = 0
+        for component in path:
+            row = self._child_row(row, component)
+
+        head = path[-1]
+        if isinstance(head, Key):
+            return self._key_range(row)
+
+        elif isinstance(head, (Value, Index)):
+            return self._value_range(row)
+
+        else:
+            assert isinstance(head, Item)
+            return self._item_range(row)
+
+    def get_ranges(self, paths: Iterable[YAMLPath]) -> list[Range | YAMLWhereException]:
+        """Get the ranges for many paths at once.
+
+        This has the same semantics as `YAMLWhere.get_ranges()`.
+        """
+        paths = list(paths)
+        results = []
+        with instrumentation.measure(instrumentation.QUERY, "get_ranges", len(paths)):
+            for path in paths:
+                try:
+                    results.append(self.get_range(*path))
+                except YAMLWhereException as err:
+                    results.append(err)
+        return results
+
+    @property
+    def lines(self) -> LineIndex:
+        """The line index of `source`, as for `YAMLWhere.lines`.
+
+        Raises:
+            ValueError: If the source map was not created from a string.
+        """
+        if self.source is None:
+            raise ValueError("The line index requires a source map created from a string")
+
+        if self._lines is None:
+            with instrumentation.measure(instrumentation.INDEX, "line index"):
+                self._lines = LineIndex(self.source)
+        return self._lines
+
+    def get_text(self, *path: YAMLPathComponent) -> str:
+        """Get the source text of an element.
+
+        This has the same semantics as `YAMLWhere.get_text()`.
+
+        Raises:
+            ValueError: If the source map was not created from a string.
+        """
+        rng = self.get_range(*path)
+        lines = self.lines
+        return self.source[lines.offset(rng.start) : lines.offset(rng.end)]
+
+    def find_ranges(self, pattern: Iterable[YAMLPathComponent]) -> Iterator[tuple[YAMLPath, Range]]:
+        """Find the elements matching a pattern.
+
+        This has the same semantics as `YAMLWhere.find_ranges()`.
+        """
+        pattern = tuple(pattern)
+        reach = pattern_reach(pattern)
+
+        # Traversal states, as (path, row, pattern positions), or (path, range, None) for matches of keys and items,
+        # which are yielded in turn
+        stack: list[tuple] = [((), 0, (0,))]
+        while stack:
+            path, row, positions = stack.pop()
+            if positions is None:
+                yield path, row
+                continue
+
+            kind = self._kinds[row]
+            if kind == NULL:
+                continue
+
+            positions = {reached for idx in positions for reached in reach[idx]}
+            if len(pattern) in positions:
+                yield path, self._value_range(row)
+                positions.discard(len(pattern))
+
+            if not positions:
+                continue
+
+            offset = self._child_offsets[row]
+            rows = self._children[offset : offset + self._child_counts[row]]
+            if kind == MAPPING:
+                states = self._find_in_mapping(pattern, sorted(positions), path, row, rows)
+            elif kind == SEQUENCE:
+                states = find_in_sequence(pattern, sorted(positions), path, rows)
+            else:
+                states = []
+            stack.extend(reversed(states))
+
+    @instrumentation.measured(instrumentation.QUERY, "get_paths_overlapping", lambda self, rng: rng)
+    def get_paths_overlapping(self, rng: Range) -> list[YAMLPath]:
+        """Get the paths of the elements overlapping a range.
+
+        This has the same semantics as `YAMLWhere.get_paths_overlapping()`.
+        """
+        return self._interval_index().overlapping(rng)
+
+    @instrumentation.measured(instrumentation.QUERY, "get_paths_within", lambda self, rng: rng)
+    def get_paths_within(self, rng: Range) -> list[YAMLPath]:
+        """Get the paths of the elements within a range.
+
+        This has the same semantics as `YAMLWhere.get_paths_within()`.
+        """
+        return self._interval_index().within(rng)
+
+    def _interval_index(self) -> IntervalIndex:
+        "Get the interval index of the elements' ranges, building it on first use."
+        if self._intervals is None:
+            with instrumentation.measure(instrumentation.INDEX, "interval index"):
+                self._intervals = IntervalIndex(self._element_ranges())
+        return self._intervals
+
+    def _element_ranges(self) -> Iterator[tuple[YAMLPath, Range, YAMLPath | None]]:
+        """Generate the elements in document order for an interval index, skipping entries with complex keys.
+
+        The children of a collection are traversed once. An alias to the collection shares them, so it is an element
+        with the path they were traversed under.
+        """
+        if self._kinds[0] == NULL:
+            return
+
+        # The paths the children were traversed under, by the rows they belong to
+        traversed: dict[int, YAMLPath] = {}
+        stack: list[tuple[YAMLPath, int]] = [((), 0)]
+        while stack:
+            path, row = stack.pop()
+            if path and isinstance(path[-1], Value):
+                yield path[:-1] + (Key(path[-1].value()),), self._key_range(row), None
+
+            offset = self._child_offsets[row]
+            children = self._children[offset : offset + self._child_counts[row]]
+            if children:
+                owner = self._parents[children[0]]
+                if owner in traversed:
+                    yield path, self._value_range(row), traversed[owner]
+                    continue
+                traversed[owner] = path
+            yield path, self._value_range(row), None
+
+            if self._kinds[row] == SEQUENCE:
+                stack.extend((path + (Index(idx),), child) for idx, child in reversed(list(enumerate(children))))
+            elif self._kinds[row] == MAPPING:
+                stack.extend(
+                    (path + (Value(self._keys[child]),), child)
+                    for child in reversed(children)
+                    if self._keys[child] is not None
+                )
+
+    def _child_row(self, row: int, component: YAMLPathComponent) -> int:
+        "Get the row of the child of `row` referred to by `component`."
+        instrumentation.visit()
+        kind = self._kinds[row]
+        if kind == MAPPING:
+            if not isinstance(component, Item):
+                raise UndefinedAccessError(f"Can not access a mapping with non-item component {component}")
+
+            child = self._lookup(row, component.value())
+            if child is None:
+                raise MissingKeyError(component)
+            return child
+
+        elif kind == SEQUENCE:
+            idx = sequence_index(component)
+            if idx is None:
+                raise UndefinedAccessError(f"Can not access a sequence with non-index component {component}")
+
+            count = self._child_counts[row]
+            if idx < 0:
+                idx += count
+            if not 0 <= idx < count:
+                raise MissingKeyError(component)
+            return self._children[self._child_offsets[row] + idx]
+
+        elif kind == SCALAR:
+            raise UndefinedAccessError("get_range() path must be empty for scalars")
+
+        raise UndefinedAccessError("get() is not defined for null nodes")
+
+    def _lookup(self, row: int, key) -> int | None:
+        """Find the first child of mapping `row` whose key equals `key`.
+
+        The index is built on first use. Mappings are indexed by the offset of their children, which aliases to them
+        share.
+        """
+        if self._key_index is None:
+            with instrumentation.measure(instrumentation.INDEX, "key index"):
+                self._key_index = self._build_key_index()
+
+        if not self._child_counts[row]:
+            return None
+        try:
+            return self._key_index.get((self._child_offsets[row], key))
+        except TypeError:
+            return None
+
+    def _find_in_mapping(
+        self, pattern: tuple, positions: list[int], path: YAMLPath, row: int, rows: array
+    ) -> list[tuple]:
+        "Get the traversal states for the children of mapping `row` which match the pattern positions."
+        # The rows that concrete components refer to
+        found = {idx: self._lookup(row, pattern[idx].value()) for idx in positions if isinstance(pattern[idx], Item)}
+        if any(isinstance(pattern[idx], (AnyKey, Descendants)) for idx in positions):
+            candidates = rows
+        else:
+            candidates = sorted({child for child in found.values() if child is not None})
+
+        states = []
+        for child in candidates:
+            key = self._keys[child]
+            children: dict[YAMLPathComponent, list[int]] = {}
+            for idx in positions:
+                component = pattern[idx]
+                if isinstance(component, Descendants):
+                    if key is not None:
+                        children.setdefault(Value(key), []).append(idx)
+                    continue
+
+                if isinstance(component, AnyKey):
+                    if key is None:
+                        continue
+                    component = component.value()(key)
+                elif found.get(idx) != child:
+                    continue
+
+                if idx + 1 == len(pattern) and isinstance(component, Key):
+                    states.append((path + (component,), self._key_range(child), None))
+                elif idx + 1 == len(pattern) and not isinstance(component, Value):
+                    states.append((path + (component,), self._item_range(child), None))
+                else:
+                    children.setdefault(component, []).append(idx + 1)
+
+            for component, child_positions in children.items():
+                states.append((path + (component,), child, child_positions))
+
+        return states
+
+    def _build_key_index(self) -> dict:
+        "Index the children of every mapping by their (child offset, key), keeping the first child for each key."
+        index = {}
+        for child, (parent, child_key) in enumerate(zip(self._parents, self._keys)):
+            if child_key is not None and self._kinds[parent] == MAPPING:
+                index.setdefault((self._child_offsets[parent], child_key), child)
+        return index
+
+    def _locate(self, row: int, point: tuple[int, int]) -> int | None:
+        """Find the child span of collection `row` containing `point`.
+
+        For sequences, span `i` is the value of child `i`. For mappings, span `2i` is the key of child `i` and span
+        `2i + 1` is its value.
+        """
+        count, span = self._child_spans(row)
+        if self._ordered[row]:
+            idx = bisect_right(range(count), point, key=lambda idx: span(idx)[0]) - 1
+            candidates = (idx,) if idx >= 0 else ()
+        else:
+            candidates = range(count)
+
+        for idx in candidates:
+            start, end = span(idx)
+            if start <= point < end:
+                if not self._ordered[row]:
+                    instrumentation.visit(idx + 1)
+                return idx
+
+        if not self._ordered[row]:
+            instrumentation.visit(count)
+        return None
+
+    def _nearest(self, row: int, point: tuple[int, int], bias: str) -> int | None:
+        """Find the child span of collection `row` nearest to `point`, which is in no span, or None if there is none.
+
+        Spans are numbered as for `_locate()`. With the "before" bias this is the span ending last at or before
+        `point`, and with the "after" bias the span starting first after it.
+        """
+        count, span = self._child_spans(row)
+        if self._ordered[row]:
+            idx = bisect_right(range(count), point, key=lambda idx: span(idx)[0]) - 1
+            if bias == "after":
+                idx += 1
+            return idx if 0 <= idx < count else None
+
+        instrumentation.visit(count)
+        if bias == "before":
+            candidates = [idx for idx in range(count) if span(idx)[1] <= point]
+            return max(candidates, key=lambda idx: span(idx)[1], default=None)
+        candidates = [idx for idx in range(count) if span(idx)[0] > point]
+        return min(candidates, key=lambda idx: span(idx)[0], default=None)
+
+    def _child_spans(self, row: int) -> tuple[int, Callable[[int], tuple[tuple[int, int], tuple[int, int]]]]:
+        "Get the number of child spans of collection `row`, and a function giving the (start, end) of each of them."
+        offset = self._child_offsets[row]
+        count = self._child_counts[row]
+        if self._kinds[row] == MAPPING:
+
+            def span(idx):
+                spans = self._key_spans if idx % 2 == 0 else self._value_spans
+                base = self._children[offset + idx // 2] * 4
+                return (spans[base], spans[base + 1]), (spans[base + 2], spans[base + 3])
+
+            return count * 2, span
+
+        def span(idx):
+            spans = self._value_spans
+            base = self._children[offset + idx] * 4
+            return (spans[base], spans[base + 1]), (spans[base + 2], spans[base + 3])
+
+        return count, span
+
+    def _key_range(self, row: int) -> Range:
+        spans = self._key_spans
+        base = row * 4
+        return Range._trusted(Position(spans[base], spans[base + 1]), Position(spans[base + 2], spans[base + 3]))
+
+    def _value_range(self, row: int) -> Range:
+        spans = self._value_spans
+        base = row * 4
+        return Range._trusted(Position(spans[base], spans[base + 1]), Position(spans[base + 2], spans[base + 3]))
+
+    def _item_range(self, row: int) -> Range:
+        base = row * 4
+        # An alias's value span is its anchor's, which can end before the key does, leaving the entry with the key's range
+        end = max(
+            (self._key_spans[base + 2], self._key_spans[base + 3]),
+            (self._value_spans[base + 2], self._value_spans[base + 3]),
+        )
+        return Range._trusted(Position(self._key_spans[base], self._key_spans[base + 1]), Position(*end))
+
+
+_NO_SPAN = (-1, -1, -1, -1)
+
+
+def _start(node: Node) -> tuple[int, int]:
+    return node.start_mark.line, node.start_mark.column
+
+
+def _end(node: Node) -> tuple[int, int]:
+    return node.end_mark.line, node.end_mark.column
+
+
+def _span(node: Node) -> tuple[int, int, int, int]:
+    return node.start_mark.line, node.start_mark.column, node.end_mark.line, node.end_mark.column
+
+
+class _SourceMapBuilder:
+    """Accumulates the rows of a CompiledSourceMap in document order.
+
+    Scalars are added with `scalar()`. Collections are opened with `start_collection()`, after which their children are
+    added, and closed with `end_collection()`. Aliases to collections are added with `alias()`. Spans are
+    `(start line, start column, end line, end column)` tuples.
+    """
+
+    def __init__(self):
+        self.kinds = array("b")
+        self.parents = array("i")
+        self.keys: list = []
+        self.key_spans = array("i")
+        self.value_spans = array("i")
+        self.child_offsets = array("i")
+        self.child_counts = array("i")
+        self.children = array("i")
+        self.ordered = array("b")
+
+        # The rows of the open collections, with the rows of the children added to them so far
+        self._open: list[tuple[int, list[int]]] = []
+
+        # The rows of aliases, with the rows of the collections they share the children of
+        self._aliases: list[tuple[int, int]] = []
+
+    def null(self):
+        "Add the root of an empty document."
+        self._add(NULL, None, None, (0, 0, 0, 0))
+
+    def scalar(self, key, key_span: tuple[int, int, int, int] | None, span: tuple[int, int, int, int]):
+        "Add a scalar."
+        self._add(SCALAR, key, key_span, span)
+
+    def start_collection(self, kind: int, key, key_span: tuple[int, int, int, int] | None, start: tuple[int, int]):
+        "Open a mapping or sequence. Its end is set by the matching `end_collection()`."
+        row = self._add(kind, key, key_span, start + start)
+        self._open.append((row, []))
+
+    def alias(self, key, key_span: tuple[int, int, int, int] | None, target: int):
+        "Add an alias to the closed collection `target`, which has its span and shares its children."
+        base = target * 4
+        row = self._add(self.kinds[target], key, key_span, tuple(self.value_spans[base : base + 4]))
+        self.child_offsets[row] = self.child_offsets[target]
+        self.child_counts[row] = self.child_counts[target]
+        self._aliases.append((row, target))
+
+    def end_collection(self, end: tuple[int, int]):
+        "Close the most recently opened collection."
+        row, rows = self._open.pop()
+        base = row * 4
+        self.value_spans[base + 2], self.value_spans[base + 3] = end
+        self.child_offsets[row] = len(self.children)
+        self.child_counts[row] = len(rows)
+        self.children.extend(rows)
+        self.ordered[row] = self._is_ordered(self.kinds[row], rows)
+
+    def set_end(self, spans: array, row: int, end: tuple[int, int]):
+        "Change the end of the key or value span of a row, after its parent may have been closed."
+        base = row * 4
+        spans[base + 2], spans[base + 3] = end
+
+        # The spans are sorted and disjoint only for the ancestors which are still open
+        open_rows = {open_row for open_row, _ in self._open}
+        parent = self.parents[row]
+        while parent != -1 and parent not in open_rows:
+            offset = self.child_offsets[parent]
+            rows = self.children[offset : offset + self.child_counts[parent]]
+            self.ordered[parent] = self._is_ordered(self.kinds[parent], rows)
+            parent = self.parents[parent]
+
+    def finish(self) -> CompiledSourceMap:
+        "Get the compiled source map for the rows added."
+        assert not self._open, "Unclosed collections"
+
+        # The spans of shared children may have changed since the aliases were added
+        for row, target in self._aliases:
+            self.ordered[row] = self.ordered[target]
+        return CompiledSourceMap(
+            self.kinds,
+            self.parents,
+            self.keys,
+            self.key_spans,
+            self.value_spans,
+            self.child_offsets,
+            self.child_counts,
+            self.children,
+            self.ordered,
+        )
+
+    def _add(self, kind: int, key, key_span: tuple[int, int, int, int] | None, span: tuple[int, int, int, int]) -> int:
+        row = len(self.kinds)
+        if self._open:
+            parent, siblings = self._open[-1]
+            siblings.append(row)
+        else:
+            parent = -1
+
+        self.kinds.append(kind)
+        self.parents.append(parent)
+        self.keys.append(key)
+        self.key_spans.extend(_NO_SPAN if key_span is None else key_span)
+        self.value_spans.extend(span)
+        self.child_offsets.append(0)
+        self.child_counts.append(0)
+        self.ordered.append(1)
+        return row
+
+    def _is_ordered(self, kind: int, rows: list[int]) -> bool:
+        "Check whether the child spans of a collection are sorted and disjoint."
+        span_arrays = (self.key_spans, self.value_spans) if kind == MAPPING else (self.value_spans,)
+        previous_end = None
+        for row in rows:
+            base = row * 4
+            for spans in span_arrays:
+                if previous_end is not None and (spans[base], spans[base + 1]) < previous_end:
+                    return False
+                previous_end = spans[base + 2], spans[base + 3]
+        return True
+
+
+class _Alias:
+    "An alias in recorded events. It refers to the recorded events of its anchored node."
+
+    __slots__ = ("events",)
+
+    def __init__(self, events: list):
+        self.events = events
+
+
+class _EventReader:
+    """Builds a CompiledSourceMap from parser events.
+
+    This mirrors the composer, walking the events of the document instead of its nodes. The events of each anchored node
+    are recorded while it is parsed, with aliases and nested anchored nodes in them replaced by the recordings they
+    refer to. An alias to a collection which has a row shares that row's children, and the recording is replayed in
+    place of other aliases, to scalars and to collections in complex keys. A recording is *active* while its node is
+    being parsed or replayed, and an alias to an active recording is recursive, so it is added as an empty collection.
+    """
+
+    def __init__(self, events: Iterable[Event]):
+        self._events = iter(events)
+        self._builder = _SourceMapBuilder()
+
+        # The recording of the latest node with each anchor. Like the composer, an anchor refers to its node as soon as
+        # the node starts.
+        self._anchors: dict[str, list] = {}
+
+        # The recordings of the anchored nodes being parsed, with the collection depth they started at
+        self._recording: list[tuple[list, int]] = []
+        self._depth = 0
+
+        # The recordings being replayed, with iterators over their remaining events
+        self._replaying: list[tuple[list, Iterator]] = []
+
+        # The ids of the active recordings
+        self._active: set[int] = set()
+
+        # The rows of the collections with recordings, by the ids of the recordings, and the recording of the node
+        # whose first event was read last, if any
+        self._rows: dict[int, int] = {}
+        self._node: list | None = None
+
+        # Spans of recursive aliases whose ends are known once their recording is complete, as (spans, row) pairs
+        self._unfinished: dict[int, list[tuple[array, int]]] = {}
+
+    def read(self) -> CompiledSourceMap:
+        "Read the events of the stream."
+        builder = self._builder
+        self._next()  # Stream start
+        event = self._next()
+        if isinstance(event, StreamEndEvent):
+            builder.null()
+            return builder.finish()
+
+        root = self._read_node()
+        self._next()  # Document end
+        event = self._next()
+        if not isinstance(event, StreamEndEvent):
+            raise ComposerError(
+                "expected a single document in the stream",
+                root.start_mark,
+                "but found another document",
+                event.start_mark,
+            )
+        return builder.finish()
+
+    def _read_node(self) -> Event:
+        "Add the rows of the next node, returning its first event."
+        builder = self._builder
+
+        # The open collections: the kind of each and, for mappings, the key of the entry being read or None while a
+        # key is expected
+        stack: list[list] = []
+        first = None
+        while True:
+            item = self._next()
+            if stack and stack[-1][0] == MAPPING and stack[-1][1] is None and not isinstance(item, CollectionEndEvent):
+                stack[-1][1] = self._read_key(item)
+                continue
+
+            if isinstance(item, _Alias) and id(item.events) not in self._active and id(item.events) not in self._rows:
+                self._replay(item.events)
+                continue
+
+            key = key_span = key_events = None
+            if stack and stack[-1][0] == MAPPING and not isinstance(item, CollectionEndEvent):
+                key, key_span, key_events = stack[-1][1]
+                stack[-1][1] = None
+
+            row = len(builder.kinds)
+            if isinstance(item, _Alias) and id(item.events) not in self._active:
+                builder.alias(key, key_span, self._rows[id(item.events)])
+            elif isinstance(item, _Alias):
+                # A recursive alias
+                events = item.events
+                builder.start_collection(_kind(events[0]), key, key_span, _event_start(events[0]))
+                if id(events) in self._unfinished:
+                    self._unfinished[id(events)].append((builder.value_spans, row))
+                    builder.end_collection(_event_start(events[0]))
+                else:
+                    builder.end_collection((events[-1].end_mark.line, events[-1].end_mark.column))
+            elif isinstance(item, ScalarEvent):
+                builder.scalar(key, key_span, _event_span(item, item))
+            elif isinstance(item, CollectionEndEvent):
+                builder.end_collection((item.end_mark.line, item.end_mark.column))
+                stack.pop()
+            else:
+                kind = _kind(item)
+                builder.start_collection(kind, key, key_span, _event_start(item))
+                stack.append([kind, None])
+                if self._node is not None:
+                    self._rows[id(self._node)] = row
+
+            if key_events is not None:
+                self._unfinished[id(key_events)].append((builder.key_spans, row))
+
+            if first is None:
+                first = item
+            if not stack:
+                return first
+
+    def _read_key(self, item) -> tuple:
+        """Read a mapping key starting with `item`.
+
+        Returns:
+            The key's value, or None if it is not a scalar, its span, and the recording of the node it is a recursive
+            alias to, if it is one. The end of a recursive alias is not known yet, so its span is empty.
+        """
+        if isinstance(item, _Alias):
+            events = item.events
+            if isinstance(events[0], ScalarEvent):
+                return events[0].value, _event_span(events[0], events[0]), None
+            if id(events) in self._unfinished:
+                return None, _event_start(events[0]) * 2, events
+            return None, _event_span(events[0], events[-1]), None
+
+        if isinstance(item, ScalarEvent):
+            return item.value, _event_span(item, item), None
+
+        # A complex key, whose contents are skipped
+        depth = 1
+        while depth:
+            end = self._next()
+            if isinstance(end, CollectionEndEvent):
+                depth -= 1
+            elif isinstance(end, (MappingStartEvent, SequenceStartEvent)):
+                depth += 1
+        return None, _event_span(item, end), None
+
+    def _replay(self, events: list):
+        "Replay a recording in place of an alias."
+        self._active.add(id(events))
+        self._replaying.append((events, iter(events)))
+
+    def _next(self):
+        "Get the next event, or the _Alias of an alias event, from the recording being replayed or the parser."
+        self._node = None
+        while self._replaying:
+            events, remaining = self._replaying[-1]
+            item = next(remaining, None)
+            if item is not None:
+                if item is events[0]:
+                    self._node = events
+                return item
+            self._replaying.pop()
+            self._active.discard(id(events))
+
+        event = next(self._events)
+        if isinstance(event, AliasEvent):
+            item = _Alias(self._resolve(event))
+        else:
+            item = event
+            if isinstance(event, NodeEvent) and event.anchor is not None:
+                # Recordings of anchored nodes within a recording are replayed like aliases, so that they are active
+                # while they are replayed
+                events: list = []
+                if self._recording:
+                    self._recording[-1][0].append(_Alias(events))
+                self._recording.append((events, self._depth))
+                self._anchors[event.anchor] = events
+                self._node = events
+                self._active.add(id(events))
+                self._unfinished[id(events)] = []
+
+        if self._recording:
+            self._recording[-1][0].append(item)
+
+        if isinstance(item, (MappingStartEvent, SequenceStartEvent)):
+            self._depth += 1
+        elif isinstance(item, CollectionEndEvent):
+            self._depth -= 1
+
+        # Recordings end when the depth returns to where they started
+        while self._recording and self._recording[-1][1] == self._depth:
+            events, _ = self._recording.pop()
+            self._finish_recording(events)
+
+        return item
+
+    def _resolve(self, event: AliasEvent) -> list:
+        "Get the recording an alias refers to."
+        try:
+            return self._anchors[event.anchor]
+        except KeyError:
+            raise ComposerError(None, None, f"found undefined alias {event.anchor!r}", event.start_mark) from None
+
+    def _finish_recording(self, events: list):
+        "Set the ends of the recursive aliases to a complete recording."
+        self._active.discard(id(events))
+        end = events[-1].end_mark.line, events[-1].end_mark.column
+        for spans, row in self._unfinished.pop(id(events)):
+            self._builder.set_end(spans, row, end)
+
+
+def _kind(event: Event) -> int:
+    return MAPPING if isinstance(event, MappingStartEvent) else SEQUENCE
+
+
+def _event_start(event: Event) -> tuple[int, int]:
+    return event.start_mark.line, event.start_mark.column
+
+
+def _event_span(first: Event, last: Event) -> tuple[int, int, int, int]:
+    return first.start_mark.line, first.start_mark.column, last.end_mark.line, last.end_mark.column
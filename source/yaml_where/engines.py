@@ -0,0 +1,232 @@
+"""Parsing engines which compose YAML sources into nodes.
+
+The "python" engine is ruamel.yaml's pure-Python round-trip parser, which is always available. The "c" engine parses
+with libyaml, through PyYAML's `CParser`, when PyYAML is installed with libyaml support. Both engines produce
+ruamel.yaml nodes with the same positions, so source maps are the same whichever engine built them.
+
+The engines differ in the YAML version they parse: libyaml parses YAML 1.1, in which some characters that are not
+line breaks in YAML 1.2 are. Sources for which that matters, and sources which libyaml rejects, are parsed by the
+"python" engine instead, so that the "c" engine only ever changes how fast a source is parsed.
+"""
+
+import re
+
+from ruamel.yaml import YAML, MappingNode, Node, ScalarNode, SequenceNode
+from ruamel.yaml.error import FileMark
+
+from yaml_where import instrumentation
+from yaml_where.lines import LineIndex
+from yaml_where.range import Position
+
+try:
+    from yaml import YAMLError as CYAMLError
+    from yaml import events as c_events
+    from yaml.cyaml import CParser
+except ImportError:  # pragma: no cover
+    CParser = None
+
+#: The names of the parsing engines.
+ENGINES = ("python", "c")
+
+# The name ruamel.yaml gives string sources in marks
+_NAME = "<unicode string>"
+
+# Characters whose positions libyaml counts differently: YAML 1.1 line breaks, and byte order marks after the start
+_YAML_1_1_ONLY = re.compile("[\x85\u2028\u2029]|.\ufeff", re.DOTALL)
+
+
+def c_engine_available() -> bool:
+    "Check whether the C engine can be used."
+    return CParser is not None
+
+
+@instrumentation.measured(instrumentation.PARSE, "compose", lambda source, engine="python": engine)
+def compose(source, engine: str = "python") -> Node | None:
+    """Compose the single document of a YAML source.
+
+    Args:
+        source: The YAML source, as a string, bytes or stream.
+        engine (str): The parsing engine to use, one of `ENGINES`. The "c" engine falls back to the "python" engine if
+            it isn't available, and for sources which aren't strings.
+
+    Returns:
+        Node | None: The root node of the document, or None if the source is empty.
+
+    Raises:
+        ValueError: If the engine is unknown.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(ENGINES)}")
+
+    if engine == "c" and CParser is not None and isinstance(source, str) and not _YAML_1_1_ONLY.search(source):
+        try:
+            return _compose_c(source)
+        except (CYAMLError, _FallBack):
+            # Errors are reported by the "python" engine
+            pass
+
+    return YAML(typ="rt").compose(source)
+
+
+class _FallBack(Exception):
+    'Raised when a source has to be parsed by the "python" engine.'
+
+
+def _compose_c(source: str) -> Node | None:
+    "Compose a document from libyaml's parser events."
+    parser = CParser(source)
+    try:
+        parser.get_event()  # Stream start
+        if parser.check_event(c_events.StreamEndEvent):
+            return None
+
+        parser.get_event()  # Document start
+        root = _compose_node(parser, source)
+        parser.get_event()  # Document end
+        if not parser.check_event(c_events.StreamEndEvent):
+            raise _FallBack("The stream holds more than one document")
+        return root
+    finally:
+        parser.dispose()
+
+
+def _compose_node(parser, source: str) -> Node:
+    "Compose the next node from the parser's events, iteratively."
+    lines = LineIndex(source)
+    end = lines.position(len(source))
+
+    def mark(event_mark):
+        # libyaml's marks are read-only, so they are replaced by ruamel.yaml's. libyaml reads a source without a final
+        # line break as if it had one, so the end of such a source is on the line after its last line.
+        if event_mark.line >= len(lines):
+            return FileMark(_NAME, len(source), end.line, end.column)
+        return FileMark(_NAME, event_mark.index, event_mark.line, event_mark.column)
+
+    def move(node, pos):
+        node.start_mark = node.end_mark = FileMark(_NAME, lines.offset(pos), pos.line, pos.column)
+
+    anchors: dict[str, Node] = {}
+
+    # The open collections, with the key of the entry being composed for mappings, or None while a key is expected
+    stack: list[list] = []
+
+    # An empty value of a block mapping, whose position depends on the event after it
+    empty_value = None
+    while True:
+        event = parser.get_event()
+        if empty_value is not None:
+            node, first_key = empty_value
+            move(node, _empty_block_value_position(source, lines, node, first_key, event, mark(event.start_mark)))
+            empty_value = None
+
+        if isinstance(event, c_events.AliasEvent):
+            try:
+                node = anchors[event.anchor]
+            except KeyError:
+                raise _FallBack(f"Undefined alias {event.anchor!r}") from None
+
+        elif isinstance(event, c_events.ScalarEvent):
+            node = ScalarNode(
+                event.tag,
+                event.value,
+                mark(event.start_mark),
+                mark(event.end_mark),
+                style=event.style,
+                anchor=event.anchor,
+            )
+            if event.anchor is not None:
+                anchors[event.anchor] = node
+
+            if stack and stack[-1][1] is not None and _is_empty(event):
+                # The parsers place empty mapping values differently
+                if stack[-1][0].flow_style:
+                    move(node, _empty_flow_value_position(source, lines, node))
+                else:
+                    mapping, key = stack[-1]
+                    empty_value = node, mapping.value[0][0] if mapping.value else key
+
+        elif isinstance(event, c_events.CollectionStartEvent):
+            node_type = MappingNode if isinstance(event, c_events.MappingStartEvent) else SequenceNode
+            node = node_type(
+                event.tag, [], mark(event.start_mark), None, flow_style=event.flow_style, anchor=event.anchor
+            )
+            if event.anchor is not None:
+                anchors[event.anchor] = node
+            stack.append([node, None])
+            continue
+
+        else:
+            node = stack.pop()[0]
+            node.end_mark = mark(event.end_mark)
+
+        if not stack:
+            return node
+
+        entry = stack[-1]
+        if isinstance(entry[0], SequenceNode):
+            entry[0].value.append(node)
+        elif entry[1] is None:
+            entry[1] = node
+        else:
+            entry[0].value.append((entry[1], node))
+            entry[1] = None
+
+
+def _is_empty(event) -> bool:
+    "Check whether a scalar event is for a node which is left out of the source entirely."
+    return (
+        event.value == ""
+        and not event.style
+        and event.tag is None
+        and event.anchor is None
+        and event.start_mark.line == event.end_mark.line
+        and event.start_mark.column == event.end_mark.column
+    )
+
+
+def _empty_block_value_position(
+    source: str, lines: LineIndex, node: Node, first_key: Node, next_event, next_start
+) -> Position:
+    """Get the position ruamel.yaml gives an empty value of a block mapping.
+
+    Without a value indicator both parsers place the value at the start of the next token. With one, libyaml places the
+    value at the end of the indicator. ruamel.yaml places it at the end of the next token, which is either the next key
+    or the end of the mapping, unless a comment follows the indicator and another key follows the value, in which case
+    it places it at the end of the indicator.
+    """
+    value_end = node.start_mark
+    offset = lines.offset(value_end)
+    if source[offset - 1 : offset] != ":":
+        return Position(value_end.line, value_end.column)
+
+    if isinstance(next_event, c_events.MappingEndEvent):
+        return Position(next_start.line, next_start.column)
+
+    if source[offset : lines.line_end(value_end.line)].lstrip(" \t").startswith("#"):
+        return Position(value_end.line, value_end.column)
+
+    # Keys, and explicit key indicators, are at the mapping's indentation, which is that of its first key
+    before_first = source[lines.line_starts[first_key.start_mark.line] : lines.offset(first_key.start_mark)].rstrip(" ")
+    indent = len(before_first) - 1 if before_first.endswith("?") else first_key.start_mark.column
+    line = source[lines.line_starts[next_start.line] : lines.offset(next_start)]
+    if next_start.column == indent and not line.strip(" "):
+        # The next key is an implicit key
+        return Position(next_start.line, next_start.column)
+    if line[indent : indent + 1] == "?" and not line[:indent].strip(" ") and not line[indent + 1 :].strip(" "):
+        # The next key follows an explicit key indicator
+        return Position(next_start.line, indent + 1)
+
+    raise _FallBack("Can not locate an empty mapping value")
+
+
+def _empty_flow_value_position(source: str, lines: LineIndex, node: Node) -> Position:
+    """Get the position ruamel.yaml gives an empty value of a flow mapping.
+
+    Without a value indicator both parsers place the value at the start of the next token. With one, libyaml still
+    does, while ruamel.yaml places the value at the end of the indicator.
+    """
+    offset = lines.offset(node.start_mark)
+    indicator = len(source[:offset].rstrip(" \t\r\n")) - 1
+    if source[indicator] != ":":
+        return Position(node.start_mark.line, node.start_mark.column)
+    return lines.position(indicator + 1)
@@ -20,3 +20,15 @@ class UnsupportedNodeTypeError(YAMLWhereException):
 
 class NoSuchPathError(YAMLWhereException):
     """When a path in the document can not be found for a range."""
+
+
+class SourceMapFormatError(YAMLWhereException):
+    """Stored source map data is malformed or of an unsupported version."""
+
+
+class StaleSourceMapError(YAMLWhereException):
+    """A stored source map was built from a different version of its source."""
+
+
+class PathSyntaxError(YAMLWhereException, ValueError):
+    """A path expression is not valid in its syntax."""
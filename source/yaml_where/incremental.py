@@ -0,0 +1,287 @@
+"""Incremental updates of composed YAML node trees after edits to their source.
+
+An edit is isolated to the entries of a block mapping or block sequence it falls within. Block collection entries
+occupy whole lines (apart from the first entry, which may share its first line with a parent's key or sequence
+indicator), so the lines of the entries can be composed on their own as a collection with the same indentation. The
+composed entries replace the old ones, and the positions of everything after them are shifted by the change in the
+number of lines.
+"""
+
+import copy
+from bisect import bisect_right
+from collections.abc import Iterator
+
+from ruamel.yaml import YAML, MappingNode, Node, ScalarNode, SequenceNode
+from ruamel.yaml.error import YAMLError
+
+from yaml_where.lines import LINE_BREAK, LineIndex
+from yaml_where.range import Position
+
+
+def patch_node_tree(root: Node | None, lines: LineIndex, start: int, end: int, new_text: str) -> bool:
+    """Update a composed node tree, in place, for an edit to its source.
+
+    Args:
+        root (Node | None): The root node composed from `lines.source`.
+        lines (LineIndex): The line index of the source before the edit.
+        start (int): The offset of the start of the edited text.
+        end (int): The offset of the end of the edited text.
+        new_text (str): The text replacing the source between `start` and `end`.
+
+    Returns:
+        bool: True if the tree was updated, or False if the edit could not be isolated. The tree is unchanged if it
+            was not updated.
+    """
+    # The entries that could be recomposed, outermost first. Deeper entries are smaller, so they are tried first.
+    candidates = list(_candidates(root, lines, start, end))
+    for spine, collection, index, region in reversed(candidates):
+        if _recompose_entry(spine, collection, index, region, lines, start, end, new_text):
+            return True
+
+    return False
+
+
+class _Region:
+    "The part of the source occupied by an entry of a block collection."
+
+    def __init__(self, start: int, end: int, first_line: int, end_line: int, next_column: int | None):
+        self.start = start
+        self.end = end
+        self.first_line = first_line
+
+        # The first line after the region, and the column of the token there which ends the entry, or None if the
+        # region ends at the end of the source.
+        self.end_line = end_line
+        self.next_column = next_column
+
+
+def _candidates(root: Node | None, lines: LineIndex, start: int, end: int) -> Iterator:
+    """Find the block collection entries containing an edit, from the outermost inwards.
+
+    Yields:
+        (spine, collection, index, region) tuples. The spine is the list of (ancestor, child index) pairs leading to
+        the collection.
+    """
+    spine: list[tuple[Node, int]] = []
+    node = root
+    while isinstance(node, (MappingNode, SequenceNode)) and node.flow_style is False:
+        found = _entry_containing(node, lines, start, end)
+        if found is None:
+            return
+
+        index, region = found
+        yield list(spine), node, index, region
+        spine.append((node, index))
+        node = node.value[index][1] if isinstance(node, MappingNode) else node.value[index]
+
+
+def _entry_containing(collection: Node, lines: LineIndex, start: int, end: int) -> tuple[int, _Region] | None:
+    "Find the entry of a block collection whose region contains the edit."
+    source = lines.source
+    column = collection.start_mark.column
+    entries = collection.value
+
+    def entry_line(index):
+        node = entries[index][0] if isinstance(collection, MappingNode) else entries[index]
+        return node.start_mark.line
+
+    index = bisect_right(range(len(entries)), lines.position(start).line, key=entry_line) - 1
+    if index < 0 or not _entry_starts_line(collection, index, lines):
+        return None
+
+    first_line = entry_line(index)
+    region_start = lines.offset(collection.start_mark if index == 0 else Position(first_line, 0))
+    if index + 1 < len(entries):
+        if not _entry_starts_line(collection, index + 1, lines):
+            return None
+        end_line = entry_line(index + 1)
+        next_column = column
+    else:
+        end_line, next_column = collection.end_mark.line, collection.end_mark.column
+        if lines.offset(collection.end_mark) == len(source):
+            next_column = None
+        elif source[lines.line_starts[end_line] : lines.line_starts[end_line] + next_column].strip(" "):
+            # Block collections end at the start of a line or at an indicator of their parent, so this is defensive
+            return None  # pragma: no cover
+
+    region_end = len(source) if next_column is None else lines.line_starts[end_line]
+    if not region_start <= start <= end <= region_end:
+        return None
+
+    return index, _Region(region_start, region_end, first_line, end_line, next_column)
+
+
+def _entry_starts_line(collection: Node, index: int, lines: LineIndex) -> bool:
+    """Check whether an entry of a block collection starts at the collection's indentation.
+
+    This is the case unless the entry is a complex mapping key or a sequence item on the line after its indicator.
+    """
+    column = collection.start_mark.column
+    if isinstance(collection, MappingNode):
+        mark = collection.value[index][0].start_mark
+        return mark.column == column
+
+    mark = collection.value[index].start_mark
+    line_start = lines.line_starts[mark.line]
+    indicator = lines.source[line_start + column : line_start + mark.column]
+    return mark.column > column and indicator[0] == "-" and not indicator[1:].strip(" ")
+
+
+def _recompose_entry(
+    spine: list[tuple[Node, int]],
+    collection: Node,
+    index: int,
+    region: _Region,
+    lines: LineIndex,
+    start: int,
+    end: int,
+    new_text: str,
+) -> bool:
+    "Recompose the entry of `collection` at `index`, and splice the result into the tree."
+    source = lines.source
+    column = collection.start_mark.column
+    if any(node.anchor is not None for node in _walk(_entry_nodes(collection, index, index + 1))):
+        # Aliases elsewhere could refer to the old nodes
+        return False
+
+    if index > 0 and _ends_with_empty_value(_entry_nodes(collection, index - 1, index)[-1]):
+        # Where an empty value is placed depends on the token after it, which the edit may change
+        return False
+
+    # The first line of the first entry is prefixed by spaces in place of whatever precedes the entry
+    prefix = " " * column if index == 0 else ""
+    fragment = prefix + source[region.start : start] + new_text + source[end : region.end]
+    for line in fragment.splitlines():
+        content = line.lstrip(" ")
+        if content and not content.startswith("#") and len(line) - len(content) < column:
+            # A line which is less indented than the collection belongs to one of its ancestors
+            return False
+        if line.startswith(("---", "...", "%")):
+            # Document markers and directives end the document, which the fragment can't show
+            return False
+
+    try:
+        composed = YAML(typ="rt").compose(fragment)
+    except YAMLError:
+        return False
+
+    if (
+        type(composed) is not type(collection)
+        or composed.flow_style is not False
+        or (composed.start_mark.line, composed.start_mark.column) != (0, column)
+    ):
+        return False
+
+    new_nodes = list(_walk(_entry_nodes(composed, 0, len(composed.value))))
+    if any(node.anchor is not None for node in new_nodes):
+        return False
+
+    breaks = [match.end() for match in LINE_BREAK.finditer(fragment)]
+    fragment_lines = len(breaks)
+    if region.next_column is not None and (not breaks or breaks[-1] != len(fragment)):
+        # The edit runs into the line after the region
+        return False
+
+    # The nodes following the entry, whose positions shift with the number of lines in the entry
+    following = [node for node, _ in spine] + [collection]
+    siblings = []
+    for parent, child_index in spine + [(collection, index)]:
+        siblings += _entry_nodes(parent, child_index + 1, len(parent.value))
+    following_nodes = list(_walk(siblings))
+    if any(node.anchor is not None for node in following_nodes):
+        return False
+
+    # The fragment's columns line up with the source's, so its marks only need to move down to the entry's line
+    marks = _MarkShifter(region.first_line, 0)
+    fragment_end = (fragment_lines, len(fragment) - (breaks[-1] if breaks else 0))
+    if any(
+        isinstance(node, ScalarNode) and (node.end_mark.line, node.end_mark.column) == fragment_end
+        for node in new_nodes
+    ):
+        # Where empty values and block scalars which run to the end of the fragment end depends on what follows them
+        return False
+
+    for node in new_nodes:
+        for attr in ("start_mark", "end_mark"):
+            mark = getattr(node, attr)
+            if region.next_column is not None and (mark.line, mark.column) == fragment_end:
+                # Positions at the end of the fragment are where the next token after the entry is
+                mark = marks.moved(mark, region.first_line + fragment_lines, region.next_column)
+            else:
+                mark = marks.shifted(mark)
+            setattr(node, attr, mark)
+
+    if region.next_column is None:
+        # The collection and its ancestors end at the end of the source
+        marks = _MarkShifter(0, 0)
+        for node in following:
+            node.end_mark = marks.moved(node.end_mark, region.first_line + fragment_end[0], fragment_end[1])
+    elif region.first_line + fragment_lines != region.end_line:
+        marks = _MarkShifter(region.first_line + fragment_lines - region.end_line, region.end_line)
+        for node in following + following_nodes:
+            node.start_mark = marks.shifted(node.start_mark)
+            node.end_mark = marks.shifted(node.end_mark)
+
+    collection.value[index : index + 1] = composed.value
+    return True
+
+
+class _MarkShifter:
+    """Creates shifted copies of marks.
+
+    Marks can be shared between nodes, so each mark is copied once and the copy reused.
+    """
+
+    def __init__(self, delta: int, from_line: int):
+        self.delta = delta
+        self.from_line = from_line
+
+        # Keeps the original marks alive, so that their ids are not reused
+        self._copies: dict[int, tuple[object, object]] = {}
+
+    def shifted(self, mark):
+        "Get the mark moved by `delta` lines, if it is on or after `from_line`."
+        if mark.line < self.from_line:
+            return mark
+        return self.moved(mark, mark.line + self.delta, mark.column)
+
+    def moved(self, mark, line: int, column: int):
+        "Get a copy of the mark at a new position."
+        try:
+            return self._copies[id(mark)][1]
+        except KeyError:
+            moved = copy.copy(mark)
+            moved.line = line
+            moved.column = column
+            self._copies[id(mark)] = (mark, moved)
+            return moved
+
+
+def _ends_with_empty_value(node: Node) -> bool:
+    "Check whether the last scalar of a node, following the last entries of collections, is empty."
+    while isinstance(node, (MappingNode, SequenceNode)) and node.value:
+        node = _entry_nodes(node, len(node.value) - 1, len(node.value))[-1]
+    if not isinstance(node, ScalarNode):
+        return False
+    return (node.start_mark.line, node.start_mark.column) == (node.end_mark.line, node.end_mark.column)
+
+
+def _entry_nodes(collection: Node, start: int, stop: int) -> list[Node]:
+    "Get the nodes of a range of entries of a collection."
+    if isinstance(collection, MappingNode):
+        return [node for entry in collection.value[start:stop] for node in entry]
+    return collection.value[start:stop]
+
+
+def _walk(nodes) -> Iterator[Node]:
+    "Iterate over nodes and all of their descendants."
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, MappingNode):
+            for key, value in node.value:
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(node, SequenceNode):
+            stack.extend(node.value)
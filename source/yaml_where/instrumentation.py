@@ -0,0 +1,269 @@
+"""Opt-in instrumentation of parsing, indexing and queries.
+
+Instrumentation is disabled by default. While it is disabled each instrumented point costs a function call and a check
+of a module global, so it can be left in production code. Once enabled, the time spent in each phase is accumulated, queries count the
+nodes they visit, and every measurement can be passed to a callback:
+
+    with instrumented(slow_query_threshold=0.01) as instrumentation:
+        source_map = YAMLWhere.from_string(source)
+        source_map.get_range(Value("a"))
+    print(instrumentation.stats())
+
+The phases are:
+
+- `PARSE`: parsing a source and composing its nodes, which the parsers do together.
+- `COMPOSE`: building source maps from nodes, i.e. dispatching nodes to calculators, and compiling source maps.
+- `INDEX`: building the indexes that queries use, such as the key indexes of mappings, the spans of children and the
+  interval index of the elements' ranges.
+- `QUERY`: `get_range()`, `get_path()`, their batch versions, and range queries such as `get_paths_overlapping()`.
+
+Phases nest: a query which builds an index or creates calculators on first use is slower by that much. Operations of
+the same phase don't: the queries a query makes of the children of a node are part of its measurement.
+
+Code is instrumented with the `measured()` decorator, the `measure()` context manager and `visit()`, which do nothing
+while instrumentation is disabled.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any
+
+PARSE = "parse"
+COMPOSE = "compose"
+INDEX = "index"
+QUERY = "query"
+
+#: The instrumented phases.
+PHASES = (PARSE, COMPOSE, INDEX, QUERY)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Measurement:
+    "A measurement of an instrumented operation, as passed to callbacks."
+
+    #: The phase the operation belongs to.
+    phase: str
+    #: The operation, such as "get_range".
+    operation: str
+    #: How long the operation took, in seconds.
+    seconds: float
+    #: For queries, the number of nodes visited, including spans checked by linear scans. For other phases, 0.
+    nodes_visited: int = 0
+    #: What the operation was applied to, such as the path of a `get_range()` query, or None.
+    detail: Any = None
+
+
+@dataclass(frozen=True)
+class PhaseStats:
+    "The number of measurements of a phase, and their total time in seconds."
+
+    count: int
+    seconds: float
+
+
+@dataclass(frozen=True)
+class InstrumentationStats:
+    "Counters and cumulative timings, by phase, of everything measured by an Instrumentation."
+
+    phases: dict[str, PhaseStats]
+    #: The total number of nodes visited by queries.
+    nodes_visited: int
+    #: The number of queries which took at least the slow query threshold.
+    slow_queries: int
+
+
+class Instrumentation:
+    """Collects measurements while it is enabled.
+
+    Measurements can be taken in several threads at once.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Measurement], None] | None = None,
+        slow_query_threshold: float | None = None,
+    ):
+        """
+        Args:
+            callback (Callable[[Measurement], None] | None): A function called with every measurement, in the thread
+                which took it.
+            slow_query_threshold (float | None): Queries which take at least this many seconds are counted as slow and
+                logged as warnings, or None to not look for slow queries.
+        """
+        self.callback = callback
+        self.slow_query_threshold = slow_query_threshold
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        "Discard the measurements taken so far."
+        with self._lock:
+            self._counts = dict.fromkeys(PHASES, 0)
+            self._seconds = dict.fromkeys(PHASES, 0.0)
+            self._nodes_visited = 0
+            self._slow_queries = 0
+
+    def stats(self) -> InstrumentationStats:
+        "Get the counters and cumulative timings of the measurements taken so far."
+        with self._lock:
+            return InstrumentationStats(
+                phases={phase: PhaseStats(self._counts[phase], self._seconds[phase]) for phase in PHASES},
+                nodes_visited=self._nodes_visited,
+                slow_queries=self._slow_queries,
+            )
+
+    @contextmanager
+    def measure(self, phase: str, operation: str, detail: Any = None) -> Iterator[None]:
+        """Measure the operation run in the `with` block.
+
+        Nodes visited while measuring a query are counted for it, including those of queries nested in it.
+        """
+        local = self._local
+        outer_visits = getattr(local, "visits", None)
+        outer_phases = getattr(local, "phases", frozenset())
+        local.visits = 0
+        local.phases = outer_phases | {phase}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            visits = local.visits if phase == QUERY else 0
+            local.visits = outer_visits if outer_visits is None else outer_visits + local.visits
+            local.phases = outer_phases
+            self.record(Measurement(phase, operation, seconds, visits, detail))
+
+    def measuring(self, phase: str) -> bool:
+        "Whether an operation of a phase is being measured in this thread."
+        return phase in getattr(self._local, "phases", ())
+
+    def visit(self, count: int = 1):
+        "Count nodes visited by the queries being measured in this thread."
+        local = self._local
+        if getattr(local, "visits", None) is not None:
+            local.visits += count
+
+    def record(self, measurement: Measurement):
+        "Add a measurement to the counters, and pass it on to the callback."
+        slow = (
+            measurement.phase == QUERY
+            and self.slow_query_threshold is not None
+            and measurement.seconds >= self.slow_query_threshold
+        )
+        with self._lock:
+            self._counts[measurement.phase] += 1
+            self._seconds[measurement.phase] += measurement.seconds
+            self._nodes_visited += measurement.nodes_visited
+            self._slow_queries += slow
+
+        if slow:
+            logger.warning(
+                "Slow query %s(%s) took %.3f ms and visited %d nodes",
+                measurement.operation,
+                measurement.detail,
+                measurement.seconds * 1000,
+                measurement.nodes_visited,
+            )
+        if self.callback is not None:
+            self.callback(measurement)
+
+
+#: The enabled Instrumentation, or None while instrumentation is disabled. Use `enable()` and `disable()` to set it.
+active: Instrumentation | None = None
+
+
+def enable(
+    callback: Callable[[Measurement], None] | None = None, slow_query_threshold: float | None = None
+) -> Instrumentation:
+    """Enable instrumentation, replacing any instrumentation which is already enabled.
+
+    Args:
+        callback (Callable[[Measurement], None] | None): A function called with every measurement.
+        slow_query_threshold (float | None): Queries which take at least this many seconds are counted as slow and
+            logged as warnings, or None to not look for slow queries.
+
+    Returns:
+        Instrumentation: The enabled instrumentation, whose `stats()` describe the measurements.
+    """
+    global active
+    active = Instrumentation(callback, slow_query_threshold)
+    return active
+
+
+def disable():
+    "Disable instrumentation."
+    global active
+    active = None
+
+
+@contextmanager
+def measure(phase: str, operation: str, detail: Any = None) -> Iterator[None]:
+    """Measure the operation run in the `with` block with the enabled instrumentation.
+
+    Nothing is measured while instrumentation is disabled, or while an operation of the same phase is being measured
+    in this thread, which the operation is part of.
+
+    Args:
+        phase (str): The phase the operation belongs to.
+        operation (str): The operation, such as "get_range".
+        detail (Any): What the operation is applied to.
+    """
+    instrumentation = active
+    if instrumentation is None or instrumentation.measuring(phase):
+        yield
+    else:
+        with instrumentation.measure(phase, operation, detail):
+            yield
+
+
+def measured(phase: str, operation: str, detail: Callable[..., Any] | None = None) -> Callable:
+    """Decorate a function so that its calls are measured as `measure()` measures a `with` block.
+
+    Args:
+        phase (str): The phase the calls belong to.
+        operation (str): The operation, such as "get_range".
+        detail (Callable[..., Any] | None): A function of the arguments of a call which gets what the operation is
+            applied to, or None to measure calls without a detail.
+    """
+
+    def decorate(function: Callable) -> Callable:
+        @wraps(function)
+        def measured_function(*args, **kwargs):
+            if active is None:
+                return function(*args, **kwargs)
+            with measure(phase, operation, None if detail is None else detail(*args, **kwargs)):
+                return function(*args, **kwargs)
+
+        return measured_function
+
+    return decorate
+
+
+def visit(count: int = 1):
+    "Count nodes visited by the queries being measured in this thread, if instrumentation is enabled."
+    if active is not None:
+        active.visit(count)
+
+
+@contextmanager
+def instrumented(
+    callback: Callable[[Measurement], None] | None = None, slow_query_threshold: float | None = None
+) -> Iterator[Instrumentation]:
+    """Enable instrumentation for the duration of a `with` block, restoring the previous instrumentation afterwards.
+
+    The arguments are those of `enable()`.
+    """
+    global active
+    previous = active
+    try:
+        yield enable(callback, slow_query_threshold)
+    finally:
+        active = previous
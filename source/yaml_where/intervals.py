@@ -0,0 +1,158 @@
+"""An index of the spans of a document's elements, for finding the elements overlapping or within a range."""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from itertools import groupby
+from operator import itemgetter
+
+from yaml_where import instrumentation
+from yaml_where.path import YAMLPath
+from yaml_where.range import Range
+
+
+class IntervalIndex:
+    """The ranges of the elements of a document, sorted by their starts.
+
+    The ranges of distinct elements are either nested or disjoint, so each range is stored with its *parent*, the
+    innermost range containing it. The elements overlapping or within a range are found by bisecting the starts, and the
+    elements containing a position by following parents. A query takes O(log n + k) time for n elements and k results,
+    plus at most the nesting depth of the document at the ends of the range.
+
+    Elements which an alias refers to under several paths have the same range under each of them. Each collection is
+    indexed once, under the first path to it, and an alias to it as an element of its own. The paths of the elements
+    within the collection under the alias's path are only made when they are found, so aliases of aliases, which could
+    give exponentially many paths, don't grow the index.
+    """
+
+    def __init__(self, entries: Iterable[tuple[YAMLPath, Range, YAMLPath | None]]):
+        """
+        Args:
+            entries (Iterable[tuple[YAMLPath, Range, YAMLPath | None]]): The paths and ranges of the elements, in
+                document order, with the path of the collection each alias refers to, or None for other elements.
+        """
+        entries = sorted(enumerate(entries), key=_order)
+        self.paths: list[YAMLPath] = [path for _, (path, _, _) in entries]
+        self.starts = [(rng.start.line, rng.start.column) for _, (_, rng, _) in entries]
+        self.ends = [(rng.end.line, rng.end.column) for _, (_, rng, _) in entries]
+
+        # The document order of the elements, and the (document order, path) of the aliases to each collection
+        self.orders = array("q", (order for order, _ in entries))
+        self.aliases: dict[YAMLPath, list[tuple[int, YAMLPath]]] = {}
+        for order, (path, _, target) in entries:
+            if target is not None:
+                self.aliases.setdefault(target, []).append((order, path))
+
+        # The index of the innermost range containing each range, or -1. The stack holds the ranges containing the
+        # current one, innermost last.
+        self.parents = array("i")
+        stack: list[int] = []
+        for idx, end in enumerate(self.ends):
+            while stack and self.ends[stack[-1]] < end:
+                stack.pop()
+            self.parents.append(stack[-1] if stack else -1)
+            stack.append(idx)
+
+    def overlapping(self, rng: Range) -> list[YAMLPath]:
+        """Get the paths of the elements overlapping a range.
+
+        Two ranges overlap if either contains the start of the other, so an empty range overlaps the elements which
+        contain its position, as for `get_path()`, and an empty element overlaps the ranges which contain its position.
+
+        Args:
+            rng (Range): The range to find the elements overlapping.
+
+        Returns:
+            list[YAMLPath]: The paths of the elements, ordered by the starts of their ranges, outer elements first.
+        """
+        start = (rng.start.line, rng.start.column)
+        end = (rng.end.line, rng.end.column)
+        containing = self._containing(start)
+        if start == end:
+            return self._paths(containing)
+
+        # The elements which start in the range follow those which start before it and contain its start
+        lo = bisect_left(self.starts, start)
+        hi = bisect_left(self.starts, end)
+        instrumentation.visit(hi - lo)
+        return self._paths([idx for idx in containing if idx < lo] + list(range(lo, hi)))
+
+    def within(self, rng: Range) -> list[YAMLPath]:
+        """Get the paths of the elements within a range, i.e. whose ranges are `<=` it.
+
+        Args:
+            rng (Range): The range to find the elements within.
+
+        Returns:
+            list[YAMLPath]: The paths of the elements, ordered by the starts of their ranges, outer elements first.
+        """
+        end = (rng.end.line, rng.end.column)
+        lo = bisect_left(self.starts, (rng.start.line, rng.start.column))
+        hi = bisect_right(self.starts, end)
+        instrumentation.visit(hi - lo)
+        return self._paths([idx for idx in range(lo, hi) if self.ends[idx] <= end])
+
+    def _paths(self, indexes: list[int]) -> list[YAMLPath]:
+        "Get the paths of elements, in order, with the paths of the elements within aliases to their collections."
+        if not self.aliases:
+            return [self.paths[idx] for idx in indexes]
+
+        # The paths of elements with the same range are in document order, where the elements under an alias follow it
+        paths = []
+        for _, group in groupby(indexes, key=lambda idx: (self.starts[idx], self.ends[idx])):
+            same_range = sorted((found for idx in group for found in self._alias_paths(idx)), key=itemgetter(0))
+            paths += [path for _, path in same_range]
+        return paths
+
+    def _alias_paths(self, idx: int) -> list[tuple[tuple[int, ...], YAMLPath]]:
+        """Get the paths of an element, including those under aliases to collections containing it.
+
+        A path under an alias doesn't go through a collection twice, so aliases within collections to themselves end
+        their paths.
+
+        Returns:
+            list[tuple[tuple[int, ...], YAMLPath]]: (order, path) pairs. The orders are the document orders of the
+                aliases followed, outermost first, then of the element, so the paths sort in document order.
+        """
+        found = []
+        # The paths to expand, with the number of their leading components which are the first path to a collection,
+        # and the first paths of the collections the rest of the path goes through
+        stack = [((self.orders[idx],), self.paths[idx], len(self.paths[idx]), frozenset())]
+        while stack:
+            order, path, depth, through = stack.pop()
+            if not any(path[:length] in through for length in range(depth)):
+                found.append((order, path))
+
+            for length in range(depth):
+                aliases = self.aliases.get(path[:length])
+                if aliases is None:
+                    continue
+                collections = [path[:end] for end in range(length, depth)]
+                if any(collection in through for collection in collections):
+                    continue
+                for alias_order, alias in aliases:
+                    stack.append(((alias_order, *order), alias + path[length:], len(alias), through.union(collections)))
+        return found
+
+    def _containing(self, point: tuple[int, int]) -> list[int]:
+        "Get the indexes of the elements containing a position, outer elements first."
+        # Every element containing the position contains the last element starting at or before it
+        idx = bisect_right(self.starts, point) - 1
+        visits = 0
+        while idx != -1 and self.ends[idx] <= point:
+            idx = self.parents[idx]
+            visits += 1
+
+        containing = []
+        while idx != -1:
+            containing.append(idx)
+            idx = self.parents[idx]
+        instrumentation.visit(visits + len(containing))
+        containing.reverse()
+        return containing
+
+
+def _order(entry: tuple[int, tuple[YAMLPath, Range, YAMLPath | None]]) -> tuple[int, int, int, int]:
+    "Order ranges by their starts, and ranges with the same start outermost first."
+    rng = entry[1][1]
+    return rng.start.line, rng.start.column, -rng.end.line, -rng.end.column
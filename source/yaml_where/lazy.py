@@ -0,0 +1,407 @@
+"""Source maps which compose the parts of a document only when queries reach them.
+
+The entries of a block mapping or block sequence at the top level of a document start at column 0, and nothing else
+does, apart from comments, document markers and directives, and the items of block sequences which are the values of
+top-level keys. A scan of the first characters of lines therefore finds the entries without parsing the document. Each
+entry is composed on its own, from the lines between its start and the start of the next entry, the first time a query
+reaches it.
+"""
+
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from ruamel.yaml import MappingNode, Node, ScalarNode, SequenceNode
+from ruamel.yaml.error import YAMLError
+
+from yaml_where import engines, instrumentation
+from yaml_where.cache import CacheStats
+from yaml_where.exceptions import MissingKeyError
+from yaml_where.incremental import _MarkShifter
+from yaml_where.lines import LineIndex
+from yaml_where.path import Index, Item, YAMLPath, YAMLPathComponent
+from yaml_where.range import Position, Range
+from yaml_where.traversal import sequence_index
+from yaml_where.yaml_where import YAMLWhere, _from_node
+
+# The first character of every line which has content at column 0, after a byte order mark at the start of the source
+_TOP_LEVEL = re.compile(r"(?:\A\ufeff?|(?<=[\r\n]))[^ \t\r\n#\ufeff]")
+
+# What follows indicators which are separated from the rest of the line, and document markers
+_SEPARATORS = ("", " ", "\t", "\r", "\n")
+
+# A start of document marker, which may precede the first entry
+_START_MARKER = re.compile(r"---[ \t]*(?:#[^\r\n]*)?(?=[\r\n]|\Z)")
+
+# A plain scalar key. Other keys are only known once their entries have been composed.
+_PLAIN_KEY = re.compile(r"([^-?:,\[\]{}#&*!|>'\"%@` \t\r\n][^:#\r\n]*?)[ \t]*:(?=[ \t\r\n]|\Z)")
+
+
+class LazySourceMap:
+    """A source map which composes each top-level entry of a document the first time a query reaches it.
+
+    Creating a LazySourceMap only scans the source for the lines where the entries of its top-level block mapping or
+    block sequence start. `get_range()` and `get_path()` compose the entries they need, which are cached, most recently
+    used first, up to `max_subtrees` of them. Entries which are never queried are never composed. Queries give the same
+    results as those of a `YAMLWhere`.
+
+    Documents which can't be split into entries this way are composed as a whole, with `YAMLWhere`, by the first query
+    which reaches an entry that does not compose on its own. This is the case for documents whose top level is not a
+    block collection, which use complex keys or directives, or which have aliases to anchors in other entries.
+
+    Errors in the source are raised by the queries which compose the entries holding them, rather than by
+    `from_string()`.
+
+    LazySourceMaps are safe to use from several threads.
+    """
+
+    #: The path of the file the source map was read from, if any.
+    filename: str | None = None
+
+    def __init__(self, source: str, engine: str = "python", max_subtrees: int = 16):
+        """
+        Args:
+            source (str): The YAML string.
+            engine (str): The parsing engine to compose entries with, as for `YAMLWhere.from_string()`.
+            max_subtrees (int): The maximum number of composed entries to keep.
+
+        Raises:
+            ValueError: If the engine is unknown, or `max_subtrees` is negative.
+        """
+        if engine not in engines.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(engines.ENGINES)}")
+        if max_subtrees < 0:
+            raise ValueError(f"max_subtrees must not be negative, not {max_subtrees}")
+
+        self.source = source
+        self._engine = engine
+        self._max_subtrees = max_subtrees
+        self._lock = threading.Lock()
+
+        # The composed entries, by entry number, as source maps of collections holding only that entry
+        self._subtrees: OrderedDict[int, tuple[YAMLWhere, int]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        # The source map of the whole document, once it has been composed as a whole
+        self._document: YAMLWhere | None = None
+
+        # The line index of the source, built on first use
+        self._line_index: LineIndex | None = None
+
+        with instrumentation.measure(instrumentation.INDEX, "top-level entries"):
+            entries = _scan(source)
+
+        if entries is None:
+            self._kind = None
+            entries = [], [], []
+        else:
+            self._kind, *entries = entries
+
+        # The offsets and first lines of the entries, and the keys of mapping entries, or None where they are unknown
+        self._offsets, self._lines, self._keys = entries
+
+        # The first entry with each known key, and the entries whose keys are unknown, in order
+        self._key_index: dict[str, int] = {}
+        self._unknown: list[int] = []
+        for idx, key in enumerate(self._keys):
+            if key is None:
+                self._unknown.append(idx)
+            else:
+                self._key_index.setdefault(key, idx)
+
+    @classmethod
+    def from_string(cls, source: str, engine: str = "python", max_subtrees: int = 16) -> "LazySourceMap":
+        """Create a LazySourceMap from a YAML string.
+
+        The arguments are those of the constructor.
+
+        Returns:
+            LazySourceMap: The source map, of which no entries have been composed yet.
+        """
+        return cls(source, engine, max_subtrees)
+
+    @classmethod
+    def from_path(cls, path: str | os.PathLike, engine: str = "python", max_subtrees: int = 16) -> "LazySourceMap":
+        """Create a LazySourceMap from a UTF-8 encoded file.
+
+        Args:
+            path (str | os.PathLike): The path of the YAML file.
+            engine (str): The parsing engine to compose entries with.
+            max_subtrees (int): The maximum number of composed entries to keep.
+
+        Returns:
+            LazySourceMap: The source map, with `filename` set to `path`.
+        """
+        with open(path, "rb") as stream:
+            source = stream.read().decode("utf-8")
+
+        source_map = cls(source, engine, max_subtrees)
+        source_map.filename = os.fspath(path)
+        return source_map
+
+    @property
+    def lazy(self) -> bool:
+        "Whether the document is composed entry by entry, rather than having been composed as a whole."
+        return self._kind is not None and self._document is None
+
+    @property
+    def stats(self) -> CacheStats:
+        """A snapshot of the counters of the composed entries.
+
+        Misses are entries composed by queries, and the size is the total size, in bytes, of the sources of the
+        entries which are kept.
+        """
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._subtrees), self._size)
+
+    @property
+    def lines(self) -> LineIndex:
+        """The line index of `source`, as for `YAMLWhere.lines`.
+
+        The index is built the first time it is used, and is independent of which entries have been composed.
+        """
+        if self._line_index is None:
+            with instrumentation.measure(instrumentation.INDEX, "line index"):
+                self._line_index = LineIndex(self.source)
+        return self._line_index
+
+    def get_text(self, *path: YAMLPathComponent) -> str:
+        """Get the source text of an element, composing the entry of the document it leads into if needed.
+
+        This has the same semantics as `YAMLWhere.get_text()`.
+        """
+        rng = self.get_range(*path)
+        lines = self.lines
+        return self.source[lines.offset(rng.start) : lines.offset(rng.end)]
+
+    @instrumentation.measured(instrumentation.QUERY, "get_range", lambda self, *path: path)
+    def get_range(self, *path: YAMLPathComponent) -> Range:
+        """Get the range for a path, composing the entry of the document it leads into if needed.
+
+        This has the same semantics as `YAMLWhere.get_range()`.
+        """
+        if self.lazy:
+            try:
+                return self._get_entry_range(*path)
+            except _WholeDocument:
+                pass
+        return self._whole().get_range(*path)
+
+    def _get_entry_range(self, *path: YAMLPathComponent) -> Range:
+        "Get the range for a path from the entry it leads into."
+        head = path[0] if path else None
+        if self._kind is MappingNode and isinstance(head, Item):
+            idx = self._find_key(head.value())
+            if idx is None:
+                raise MissingKeyError(head)
+            return self._subtree(idx).get_range(*path)
+
+        idx = None if self._kind is MappingNode else sequence_index(head)
+        if idx is None:
+            # Errors about the collection are those of any entry, which has to be composed to check the collection
+            return self._subtree(0).get_range(*path)
+
+        if idx < 0:
+            idx += len(self._offsets)
+        if not 0 <= idx < len(self._offsets):
+            raise MissingKeyError(head)
+        return self._subtree(idx).get_range(Index(0), *path[1:])
+
+    @instrumentation.measured(instrumentation.QUERY, "get_path", lambda self, pos: pos)
+    def get_path(self, pos: Position) -> YAMLPath:
+        """Get the path corresponding to a position, composing the entry of the document it is in if needed.
+
+        This has the same semantics as `YAMLWhere.get_path()`.
+        """
+        if self.lazy:
+            try:
+                return self._get_entry_path(pos)
+            except _WholeDocument:
+                pass
+        return self._whole().get_path(pos)
+
+    def _get_entry_path(self, pos: Position) -> YAMLPath:
+        "Get the path corresponding to a position from the entry it is in."
+        # Entries occupy the lines up to the start of the next entry
+        idx = max(bisect_right(self._lines, pos.line) - 1, 0)
+        path = self._subtree(idx).get_path(pos)
+        if self._kind is SequenceNode:
+            return (Index(idx), *path[1:])
+        return path
+
+    def _find_key(self, key) -> int | None:
+        "Find the first entry of a mapping with a key, composing the entries before it whose keys are unknown."
+        try:
+            known = self._key_index.get(key)
+            candidates = list(self._unknown)
+        except TypeError:
+            # Keys which can't be hashed can only equal complex keys, which aren't indexed
+            known = None
+            candidates = range(len(self._offsets))
+
+        for idx in candidates:
+            if known is not None and idx > known:
+                break
+            if self._subtree(idx)._lookup(key) is not None:
+                return idx
+        return known
+
+    def _subtree(self, idx: int) -> YAMLWhere:
+        "Get the source map of an entry, composing it if it is not kept."
+        with self._lock:
+            entry = self._subtrees.get(idx)
+            if entry is not None:
+                self._hits += 1
+                self._subtrees.move_to_end(idx)
+                return entry[0]
+
+            self._misses += 1
+            start = self._offsets[idx]
+            end = self._offsets[idx + 1] if idx + 1 < len(self._offsets) else len(self.source)
+            node = self._compose(start, end, self._lines[idx], idx + 1 < len(self._offsets))
+            if node is None:
+                raise _WholeDocument(f"Entry {idx} does not compose on its own")
+
+            subtree = _from_node(node)
+            if self._kind is MappingNode:
+                self._learn_key(idx, node.value[0][0])
+
+            size = len(self.source[start:end].encode("utf-8", "surrogatepass"))
+            if self._max_subtrees:
+                self._subtrees[idx] = (subtree, size)
+                self._size += size
+            while len(self._subtrees) > self._max_subtrees:
+                _, (_, evicted_size) = self._subtrees.popitem(last=False)
+                self._size -= evicted_size
+                self._evictions += 1
+            return subtree
+
+    def _compose(self, start: int, end: int, line: int, followed: bool) -> Node | None:
+        """Compose the entry between two offsets, whose first line is `line`, or None if it doesn't compose on its own.
+
+        The entry is composed as a collection holding only that entry, whose marks are moved down to the entry's lines.
+        Where an empty value at the end of the entry is placed depends on the token after it, so an entry which is
+        `followed` by another is composed with a placeholder for the start of the next entry, which is then removed.
+        """
+        text = self.source[start:end]
+        if followed:
+            text += "-\n" if self._kind is SequenceNode else "_:\n"
+        try:
+            root = engines.compose(text, self._engine)
+        except YAMLError:
+            return None
+
+        if type(root) is not self._kind or root.flow_style is not False or len(root.value) != (2 if followed else 1):
+            return None
+
+        if followed:
+            # The collection ends where the next entry starts
+            del root.value[1:]
+            root.end_mark = _MarkShifter(0, 0).moved(root.end_mark, _count_line_breaks(text, 0, end - start), 0)
+
+        # Aliases make nodes reachable more than once, but each is moved once
+        marks = _MarkShifter(line, 0)
+        seen = set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            node.start_mark = marks.shifted(node.start_mark)
+            node.end_mark = marks.shifted(node.end_mark)
+            if isinstance(node, MappingNode):
+                stack.extend(child for entry in node.value for child in entry)
+            elif isinstance(node, SequenceNode):
+                stack.extend(node.value)
+        return root
+
+    def _learn_key(self, idx: int, key_node: Node):
+        "Record the key of a composed mapping entry, if it was unknown."
+        pos = bisect_left(self._unknown, idx)
+        if pos < len(self._unknown) and self._unknown[pos] == idx:
+            del self._unknown[pos]
+            if isinstance(key_node, ScalarNode):
+                self._keys[idx] = key_node.value
+                if self._key_index.get(key_node.value, idx) >= idx:
+                    self._key_index[key_node.value] = idx
+        elif self._keys[idx] is not None and self._keys[idx] != key_node.value:
+            # The scan only records keys which it reads the same way the parser does, so this is defensive
+            raise _WholeDocument(f"Entry {idx} has a different key than was scanned")  # pragma: no cover
+
+    def _whole(self) -> YAMLWhere:
+        "Get the source map of the whole document, composing it if needed."
+        with self._lock:
+            if self._document is None:
+                self._document = YAMLWhere.from_string(self.source, self._engine)
+                self._subtrees.clear()
+                self._size = 0
+            return self._document
+
+
+class _WholeDocument(Exception):
+    "Raised when the document has to be composed as a whole."
+
+
+def _scan(source: str) -> tuple[type, list[int], list[int], list[str | None]] | None:
+    """Find the entries of the top-level block collection of a document, without parsing it.
+
+    Returns:
+        tuple[type, list[int], list[int], list[str | None]] | None: The node type of the collection, and the offsets,
+            first lines and keys of its entries. The keys of sequence items, and of mapping entries whose keys are not
+            plain scalars, are None. The first entry starts at the start of the source, so that it includes anything
+            which precedes it. None is returned if the document can't be split into entries.
+    """
+    kind = None
+    offsets: list[int] = []
+    lines: list[int] = []
+    keys: list[str | None] = []
+    line = 0
+    for match in _TOP_LEVEL.finditer(source):
+        offset = match.end() - 1
+        char = source[offset]
+        separated = source[offset + 1 : offset + 2] in _SEPARATORS
+        if source.startswith(("---", "..."), offset) and source[offset + 3 : offset + 4] in _SEPARATORS:
+            if offsets or not _START_MARKER.match(source, offset):
+                # Further documents, or content after the marker
+                return None
+            continue
+
+        if char == "%" or (char in "?:" and separated):
+            # Directives and complex keys
+            return None
+
+        if char == "-" and separated:
+            if kind is MappingNode:
+                # An item of a block sequence which is the value of a top-level key
+                continue
+            kind = SequenceNode
+            key = None
+        elif kind is SequenceNode:
+            return None
+        else:
+            kind = MappingNode
+            key_match = _PLAIN_KEY.match(source, offset)
+            key = key_match[1] if key_match else None
+
+        if not offsets:
+            # The first entry includes everything which precedes it
+            offset = 0
+        line += _count_line_breaks(source, offsets[-1] if offsets else 0, offset)
+        offsets.append(offset)
+        lines.append(line)
+        keys.append(key)
+
+    if kind is None:
+        return None
+    return kind, offsets, lines, keys
+
+
+def _count_line_breaks(source: str, start: int, end: int) -> int:
+    "Count the line breaks between two offsets, neither of which is inside a carriage return and line feed pair."
+    return source.count("\n", start, end) + source.count("\r", start, end) - source.count("\r\n", start, end)
@@ -0,0 +1,221 @@
+"""Conversions between positions and offsets in a source string.
+
+Offsets are counted in code points, as Python indexes strings, or in bytes of the source's UTF-8 encoding, as files are
+indexed. Columns are counted in code points, or in UTF-16 code units, as the Language Server Protocol counts them.
+"""
+
+import re
+from array import array
+from bisect import bisect_right
+
+from yaml_where.range import Position
+
+# The line breaks recognized by the YAML reader. A carriage return followed by a line feed is a single break.
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+class LineIndex:
+    """The offsets of the starts of the lines of a source string.
+
+    The index is built once, in a single scan of the source, after which positions and offsets are converted without
+    looking at the source again. Lines are broken the same way the YAML reader breaks them, and a leading byte order
+    mark is not counted in the columns of the first line.
+
+    The byte offsets of the lines, and which lines hold characters outside ASCII or outside the Basic Multilingual
+    Plane, are found in a second scan the first time a byte offset or UTF-16 column is converted. Conversions within
+    lines which are entirely ASCII are then arithmetic, and other lines are only looked at up to the column converted.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.line_starts = array("q", [1 if source.startswith("\ufeff") else 0])
+        self.line_starts.extend(match.end() for match in LINE_BREAK.finditer(source))
+
+        # The byte offsets of the starts of the lines, followed by the size of the source in bytes, and flags for the
+        # lines' characters
+        self._byte_starts: array | None = None
+        self._flags: bytearray | None = None
+
+    def __len__(self):
+        "The number of lines in the source."
+        return len(self.line_starts)
+
+    def offset(self, pos: Position) -> int:
+        """Get the offset of a position in the source.
+
+        Args:
+            pos (Position): A position in the source. The end of a line is a valid position.
+
+        Returns:
+            int: The offset, in code points, of the position from the start of the source.
+
+        Raises:
+            ValueError: If the position is not in the source.
+        """
+        if not 0 <= pos.line < len(self.line_starts) or pos.column < 0:
+            raise ValueError(f"{pos} is not in the source")
+
+        offset = self.line_starts[pos.line] + pos.column
+        if offset > self.line_end(pos.line):
+            raise ValueError(f"{pos} is not in the source")
+        return offset
+
+    def line_end(self, line: int) -> int:
+        "Get the offset of the end of a line, before its line break."
+        if line + 1 == len(self.line_starts):
+            return len(self.source)
+
+        end = self.line_starts[line + 1] - 1
+        if self.source[end - 1 : end + 1] == "\r\n":
+            end -= 1
+        return end
+
+    def position(self, offset: int) -> Position:
+        """Get the position of an offset in the source.
+
+        Args:
+            offset (int): An offset, in code points, from the start of the source.
+
+        Returns:
+            Position: The position of the offset. An offset between the carriage return and line feed of a line break is
+                at the end of the line, as they are a single break.
+
+        Raises:
+            ValueError: If the offset is not in the source.
+        """
+        if not 0 <= offset <= len(self.source):
+            raise ValueError(f"Offset {offset} is not in the source")
+
+        line = max(bisect_right(self.line_starts, offset) - 1, 0)
+        return self._clamped(line, offset - self.line_starts[line])
+
+    def byte_offset(self, pos: Position) -> int:
+        """Get the offset of a position in the UTF-8 encoding of the source.
+
+        Args:
+            pos (Position): A position in the source.
+
+        Returns:
+            int: The offset, in bytes, of the position from the start of the encoded source.
+
+        Raises:
+            ValueError: If the position is not in the source.
+        """
+        offset = self.offset(pos)
+        byte_starts, flags = self._encoded()
+        if not flags[pos.line] & _NON_ASCII:
+            return byte_starts[pos.line] + pos.column
+        return byte_starts[pos.line] + len(_utf8(self.source[self.line_starts[pos.line] : offset]))
+
+    def position_at_byte(self, byte_offset: int) -> Position:
+        """Get the position of an offset in the UTF-8 encoding of the source.
+
+        Args:
+            byte_offset (int): An offset, in bytes, from the start of the encoded source.
+
+        Returns:
+            Position: The position of the offset. As for `position()`, an offset within a line break is at the end of
+                the line.
+
+        Raises:
+            ValueError: If the offset is not in the source, or is inside the encoding of a character.
+        """
+        byte_starts, flags = self._encoded()
+        if not 0 <= byte_offset <= byte_starts[-1]:
+            raise ValueError(f"Byte offset {byte_offset} is not in the source")
+
+        line = max(bisect_right(byte_starts, byte_offset, hi=len(self.line_starts)) - 1, 0)
+        if byte_offset <= byte_starts[line] or not flags[line] & _NON_ASCII:
+            return self._clamped(line, byte_offset - byte_starts[line])
+
+        start = self.line_starts[line]
+        end = self.line_starts[line + 1] if line + 1 < len(self.line_starts) else len(self.source)
+        prefix = _utf8(self.source[start:end])[: byte_offset - byte_starts[line]]
+        try:
+            column = len(prefix.decode("utf-8", "surrogatepass"))
+        except UnicodeDecodeError:
+            raise ValueError(f"Byte offset {byte_offset} is inside a character") from None
+        return self._clamped(line, column)
+
+    def utf16_column(self, pos: Position) -> int:
+        """Get the column of a position in UTF-16 code units.
+
+        Args:
+            pos (Position): A position in the source.
+
+        Returns:
+            int: The column, counting characters outside the Basic Multilingual Plane as two.
+
+        Raises:
+            ValueError: If the position is not in the source.
+        """
+        offset = self.offset(pos)
+        if not self._encoded()[1][pos.line] & _ASTRAL:
+            return pos.column
+        return pos.column + sum(ord(char) > 0xFFFF for char in self.source[self.line_starts[pos.line] : offset])
+
+    def position_at_utf16(self, line: int, column: int) -> Position:
+        """Get the position of a column in UTF-16 code units.
+
+        Args:
+            line (int): A zero-based line number.
+            column (int): A column in UTF-16 code units.
+
+        Returns:
+            Position: The position, with its column in code points.
+
+        Raises:
+            ValueError: If the position is not in the source, or is between the two code units of a character.
+        """
+        pos = Position(line, column)
+        if 0 <= line < len(self.line_starts) and self._encoded()[1][line] & _ASTRAL:
+            units = 0
+            code_points = 0
+            for char in self.source[self.line_starts[line] : self.line_end(line)]:
+                if units >= column:
+                    break
+                units += 2 if ord(char) > 0xFFFF else 1
+                code_points += 1
+            if units > column:
+                raise ValueError(f"UTF-16 column {column} of line {line} is inside a character")
+            pos = Position(line, code_points + column - units)
+
+        # Check that the position is in the source
+        self.offset(pos)
+        return pos
+
+    def _clamped(self, line: int, column: int) -> Position:
+        "Get a position on a line, with its column clamped to the line's start and end."
+        return Position(line, max(min(column, self.line_end(line) - self.line_starts[line]), 0))
+
+    def _encoded(self) -> tuple[array, bytearray]:
+        "Get the byte offsets of the lines and the flags for their characters, finding them if needed."
+        if self._byte_starts is None:
+            source = self.source
+            byte_starts = array("q", [len(_utf8(source[: self.line_starts[0]]))])
+            flags = bytearray(len(self.line_starts))
+            ends = list(self.line_starts[1:]) + [len(source)]
+            for line, (start, end) in enumerate(zip(self.line_starts, ends)):
+                text = source[start:end]
+                if text.isascii():
+                    byte_starts.append(byte_starts[-1] + len(text))
+                    continue
+
+                encoded = _utf8(text)
+                byte_starts.append(byte_starts[-1] + len(encoded))
+                flags[line] = _NON_ASCII
+                if any(ord(char) > 0xFFFF for char in text):
+                    flags[line] |= _ASTRAL
+
+            self._byte_starts, self._flags = byte_starts, flags
+        return self._byte_starts, self._flags
+
+
+# Flags for the characters of a line
+_NON_ASCII = 1
+_ASTRAL = 2
+
+
+def _utf8(text: str) -> bytes:
+    "Encode text as UTF-8, keeping unpaired surrogates."
+    return text.encode("utf-8", "surrogatepass")
@@ -1,28 +1,70 @@
+import json
+import re
 from abc import abstractmethod
+from functools import lru_cache
 from typing import Any
+from weakref import WeakValueDictionary
+
+from yaml_where.exceptions import PathSyntaxError
 
 
 class YAMLPathComponent:
     """A sequence of PathComponents identifies an element in a YAML file.
     
     Elements can be the keys in a mapping, a value in a mapping, or an element in a sequence.
+
+    Components are compared by their type and value, and are hashable, so paths can be used as dict keys and set
+    members.
     """
+    __slots__ = ("__weakref__",)
+
     @abstractmethod
     def value(self) -> Any:
         "Get the value associated with this path component"
 
+    @classmethod
+    def intern(cls, value: Any) -> "YAMLPathComponent":
+        """Get the shared component of this type for a value.
+
+        Interned components are created once for each type and value, for as long as they are in use, so paths built
+        from them share their components, and equal components are usually identical, which is quicker to compare.
+
+        Args:
+            value (Any): The value of the component. It must be hashable.
+
+        Returns:
+            YAMLPathComponent: The interned component.
+        """
+        key = (cls, type(value), value)
+        component = _interned.get(key)
+        if component is None:
+            component = _interned.setdefault(key, cls(value))
+        return component
+
     def __eq__(self, other):
-        return self.value() == other.value()
+        if self is other:
+            return True
+        if not isinstance(other, YAMLPathComponent):
+            return NotImplemented
+        return type(self) is type(other) and self.value() == other.value()
+
+    def __hash__(self):
+        return hash((type(self), self.value()))
 
     def __repr__(self):
         return f"{type(self).__name__}(value={self.value()})"
 
 
+_interned: WeakValueDictionary = WeakValueDictionary()
+
+
 YAMLPath = tuple[YAMLPathComponent, ...]
 
 
 class Item(YAMLPathComponent):
     "A reference to a *key-value pair* in a mapping"
+    __slots__ = ("_value",)
+
     def __init__(self, value: Any):
         self._value = value 
 
@@ -35,18 +77,43 @@ class Item(YAMLPathComponent):
 
 class Key(Item):
     "A reference to a *key* in a mapping"
+    __slots__ = ()
+
     def __str__(self):
         return f"key/{self.value()}"
 
 
 class Value(Item):
     "A reference to a *value* in a mapping"
+    __slots__ = ()
+
     def __str__(self):
         return f"value/{self.value()}"
 
 
+class Token(Value):
+    """A JSON Pointer reference token which is an array index, such as the `0` of `/env/0`.
+
+    A reference token is resolved against the value it points into (RFC 6901): a mapping looks the token up as a key,
+    which is a string, and a sequence as an index.
+    """
+    __slots__ = ()
+
+    def __init__(self, value: str):
+        super().__init__(value)
+
+    def index(self) -> int:
+        "The index in a sequence."
+        return int(self._value)
+
+    def __str__(self):
+        return f"token/{self.value()}"
+
+
 class Index(YAMLPathComponent):
     "A reference to the index-th element in a sequence"
+    __slots__ = ("_index",)
+
     def __init__(self, index: int):
         self._index = index
 
@@ -56,3 +123,203 @@ class Index(YAMLPathComponent):
     def __str__(self):
         return f"index/{self._index}"
 
+
+class AnyKey(YAMLPathComponent):
+    """A pattern component matching every entry of a mapping.
+
+    Matches are reported with a component of type `component` for each entry, which also decides the range of a match
+    which ends the pattern: the entry's value (`Value`, the default), its key (`Key`) or the whole entry (`Item`).
+    """
+    __slots__ = ("_component",)
+
+    def __init__(self, component: type[Item] = Value):
+        if not (isinstance(component, type) and issubclass(component, Item)):
+            raise TypeError(f"AnyKey matches must be reported with Item, Key or Value, not {component!r}")
+        self._component = component
+
+    def value(self) -> type[Item]:
+        "The type of the components reported for matches."
+        return self._component
+
+    def __str__(self):
+        return f"{self._component.__name__.lower()}/*"
+
+
+class AnyIndex(YAMLPathComponent):
+    "A pattern component matching every element of a sequence."
+    __slots__ = ()
+
+    def value(self) -> None:
+        return None
+
+    def __str__(self):
+        return "index/*"
+
+
+class Descendants(YAMLPathComponent):
+    """A pattern component matching any number of steps down the document, including none.
+
+    The steps are into the values of mappings and the elements of sequences, so `(Descendants(), Value("image"))`
+    matches every value of an `image` key, wherever it is.
+    """
+    __slots__ = ()
+
+    def value(self) -> None:
+        return None
+
+    def __str__(self):
+        return "**"
+
+
+class PathExpression(tuple):
+    """A path parsed from a string, which is formatted back to an equivalent string by `str()`.
+
+    Path expressions are tuples of path components, so they can be used wherever a `YAMLPath` is. Parsed expressions
+    are cached, so parsing a string again is a dictionary lookup.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, text: str) -> "PathExpression":
+        """Parse a path expression.
+
+        Args:
+            text (str): The path expression.
+
+        Returns:
+            PathExpression: The parsed path.
+
+        Raises:
+            PathSyntaxError: If the text is not a valid expression.
+        """
+        return _parse_cached(cls, text)
+
+    @classmethod
+    def from_path(cls, path: YAMLPath) -> "PathExpression":
+        """Create a path expression for a path.
+
+        Args:
+            path (YAMLPath): The path.
+
+        Returns:
+            PathExpression: The path expression.
+
+        Raises:
+            ValueError: If the path can not be written in the expression's syntax.
+        """
+        expression = cls(path)
+        # Formatting the expression checks that it can be written
+        str(expression)
+        return expression
+
+    @classmethod
+    @abstractmethod
+    def _parse(cls, text: str) -> YAMLPath:
+        "Parse the components of a path expression, raising PathSyntaxError if the text is not valid."
+
+
+class JSONPointer(PathExpression):
+    """A path in JSON Pointer syntax (RFC 6901), such as `/spec/containers/0/image`.
+
+    Reference tokens which are array indexes (digits without leading zeros) are `Token` components, which are keys in
+    mappings and indexes in sequences, and the others are mapping keys.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def _parse(cls, text: str) -> YAMLPath:
+        if not text:
+            return ()
+        if not text.startswith("/"):
+            raise PathSyntaxError(f"JSON Pointer {text!r} does not start with '/'")
+        if re.search("~[^01]|~$", text):
+            raise PathSyntaxError(f"JSON Pointer {text!r} has an invalid escape sequence")
+
+        return tuple(
+            Token.intern(token) if _ARRAY_INDEX.fullmatch(token) else Value.intern(_unescape_token(token))
+            for token in text[1:].split("/")
+        )
+
+    def __str__(self):
+        return "".join("/" + _pointer_token(component) for component in self)
+
+
+class DottedPath(PathExpression):
+    """A path in dotted syntax, such as `spec.containers[0].image`.
+
+    Names separated by dots are mapping keys, and integers in brackets are sequence indexes. Keys which aren't plain
+    names are written as JSON strings in brackets, such as `metadata.labels["app.kubernetes.io/name"]`.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def _parse(cls, text: str) -> YAMLPath:
+        path = []
+        pos = 0
+        while pos < len(text):
+            if text[pos] == "[":
+                match = _BRACKETED.match(text, pos)
+                if match is None:
+                    raise PathSyntaxError(f"Invalid bracketed component at {pos} in path {text!r}")
+                if match["index"] is not None:
+                    path.append(Index.intern(int(match["index"])))
+                else:
+                    try:
+                        path.append(Value.intern(json.loads(match["key"])))
+                    except ValueError:
+                        raise PathSyntaxError(f"Invalid key {match['key']} at {pos} in path {text!r}") from None
+            else:
+                if path:
+                    if text[pos] != ".":
+                        raise PathSyntaxError(f"Expected '.' or '[' at {pos} in path {text!r}")
+                    pos += 1
+                match = _NAME.match(text, pos)
+                if match is None:
+                    raise PathSyntaxError(f"Expected a name at {pos} in path {text!r}")
+                path.append(Value.intern(match[0]))
+            pos = match.end()
+
+        return tuple(path)
+
+    def __str__(self):
+        parts = []
+        for component in self:
+            if type(component) is Index:
+                parts.append(f"[{component.value()}]")
+            elif type(component) is not Value or not isinstance(component.value(), str):
+                raise ValueError(f"{component!r} can not be written as a dotted path")
+            elif _NAME.fullmatch(component.value()):
+                parts.append(("." if parts else "") + component.value())
+            else:
+                parts.append(f"[{json.dumps(component.value(), ensure_ascii=False)}]")
+        return "".join(parts)
+
+
+_ARRAY_INDEX = re.compile("0|[1-9][0-9]*")
+_NAME = re.compile(r"[^.\[\]\s\"']+")
+_BRACKETED = re.compile(r'\[(?:(?P<index>0|[1-9][0-9]*)|(?P<key>"(?:[^"\\]|\\.)*"))\]')
+
+
+@lru_cache(maxsize=1024)
+def _parse_cached(cls: type[PathExpression], text: str) -> PathExpression:
+    "Parse a path expression, caching the result."
+    return cls(cls._parse(text))
+
+
+def _unescape_token(token: str) -> str:
+    "Unescape a JSON Pointer reference token."
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _pointer_token(component: YAMLPathComponent) -> str:
+    "Get the JSON Pointer reference token for a path component."
+    if type(component) is Index:
+        return str(component.value())
+    if type(component) is Token:
+        return component.value()
+    if type(component) is not Value or not isinstance(component.value(), str):
+        raise ValueError(f"{component!r} can not be written as a JSON Pointer")
+    return component.value().replace("~", "~0").replace("/", "~1")
@@ -1,31 +1,36 @@
 """Basic types for representing positions and ranges in a document."""
 
 from dataclasses import dataclass
+
 from ruamel.yaml.nodes import Node
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Position:
     "Zero-based indexes describing a position in a document."
     line: int
     column: int
 
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.line == other.line and self.column == other.column
+
     def __lt__(self, other):
         "Check if this position is before another."
-        return (self.line, self.column) < (other.line, other.column)
+        return self.line < other.line or (self.line == other.line and self.column < other.column)
 
     def __le__(self, other):
-        "Check if this position is before another."
-        return (self.line, self.column) <= (other.line, other.column)
+        "Check if this position is before, or the same as, another."
+        return self.line < other.line or (self.line == other.line and self.column <= other.column)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Range:
     "Half-open range describing a span inside a document."
     start: Position
     end: Position
 
-
     def __post_init__(self):
         if not self.start <= self.end:
             raise ValueError(f"Range start ({self.start}) must be before end ({self.end}).")
@@ -46,7 +51,7 @@ class Range:
     @classmethod
     def from_node(cls, node: Node):
         "Create a range that covers the entire node."
-        return cls(
+        return cls._trusted(
             Position(node.start_mark.line, node.start_mark.column),
             Position(node.end_mark.line, node.end_mark.column),
         )
@@ -54,4 +59,17 @@ class Range:
     @classmethod
     def from_parts(cls, start_line, start_column, end_line, end_column):
         "Create a range from its parts."
-        return cls(Position(start_line, start_column), Position(end_line, end_column))
\ No newline at end of file
+        return cls(Position(start_line, start_column), Position(end_line, end_column))
+
+    @classmethod
+    def _trusted(cls, start: Position, end: Position):
+        "Create a range from positions which are known to be in order, without checking them."
+        rng = _new(cls)
+        _setattr(rng, "start", start)
+        _setattr(rng, "end", end)
+        return rng
+
+
+# Frozen dataclasses are initialized with object's attribute setter
+_new = object.__new__
+_setattr = object.__setattr__
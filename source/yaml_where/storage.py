@@ -0,0 +1,256 @@
+"""Persistent storage of compiled source maps.
+
+Compiled source maps are stored in a compact binary format. A stored source map records a hash of the YAML source it
+was built from, so that it can be discarded when the source changes. Stored source maps are memory-mapped when they are
+loaded, so their spans are queried in place rather than being copied into memory.
+
+The format is a fixed header followed by the columns of the source map, all little-endian:
+
+- header: magic (4 bytes), format version (u16), reserved (u16), source hash (16 bytes), row count (u32),
+  child count (u32), size of the key data (u32) and size of the filename (u32)
+- parents, key spans, value spans, child offsets, child counts, children and key lengths (i32 columns)
+- kinds and ordered flags (i8 columns)
+- the UTF-8 encoded keys, concatenated, and the UTF-8 encoded filename
+
+A key length of -1 records a key of None.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from yaml_where.compiled import CompiledSourceMap
+from yaml_where.exceptions import SourceMapFormatError, StaleSourceMapError
+
+MAGIC = b"YWSM"
+
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHH16sIIII")
+
+
+def content_hash(source: str | bytes) -> bytes:
+    """Get the hash identifying a YAML source.
+
+    Args:
+        source (str | bytes): The YAML source. Strings are hashed in their UTF-8 encoding.
+
+    Returns:
+        bytes: A 16 byte digest of the source.
+    """
+    if isinstance(source, str):
+        source = source.encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(source, digest_size=16).digest()
+
+
+def dumps(source_map: CompiledSourceMap, source_hash: bytes = bytes(16)) -> bytes:
+    """Serialize a compiled source map.
+
+    Args:
+        source_map (CompiledSourceMap): The source map to serialize.
+        source_hash (bytes): The `content_hash()` of the source the map was built from.
+
+    Returns:
+        bytes: The serialized source map.
+    """
+    if len(source_hash) != 16:
+        raise ValueError(f"source_hash must be 16 bytes, not {len(source_hash)}")
+
+    key_lengths = array("i")
+    key_data = bytearray()
+    for key in source_map._keys:
+        if key is None:
+            key_lengths.append(-1)
+        elif isinstance(key, str):
+            encoded = key.encode("utf-8", "surrogatepass")
+            key_lengths.append(len(encoded))
+            key_data += encoded
+        else:
+            raise ValueError(f"Can not store a source map with a key of type {type(key).__name__}")
+
+    filename = (source_map.filename or "").encode("utf-8", "surrogatepass")
+    parts = [
+        _HEADER.pack(
+            MAGIC,
+            VERSION,
+            0,
+            source_hash,
+            len(source_map._kinds),
+            len(source_map._children),
+            len(key_data),
+            len(filename),
+        )
+    ]
+    for column in (
+        source_map._parents,
+        source_map._key_spans,
+        source_map._value_spans,
+        source_map._child_offsets,
+        source_map._child_counts,
+        source_map._children,
+        key_lengths,
+    ):
+        parts.append(_int_bytes(column))
+    parts += [bytes(source_map._kinds), bytes(source_map._ordered), bytes(key_data), filename]
+    return b"".join(parts)
+
+
+def loads(buffer, source_hash: bytes | None = None) -> CompiledSourceMap:
+    """Deserialize a compiled source map.
+
+    The columns of the source map refer directly to `buffer` wherever possible, rather than being copied.
+
+    Args:
+        buffer: A bytes-like object holding a serialized source map.
+        source_hash (bytes | None): The `content_hash()` of the current source, or None to skip the check.
+
+    Returns:
+        CompiledSourceMap: The deserialized source map.
+
+    Raises:
+        SourceMapFormatError: If the buffer does not hold a serialized source map of a supported version.
+        StaleSourceMapError: If the source map was built from a source other than the one with `source_hash`.
+    """
+    view = memoryview(buffer)
+    if len(view) < _HEADER.size:
+        raise SourceMapFormatError("Truncated source map header")
+
+    magic, version, _, stored_hash, rows, child_count, keys_size, filename_size = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SourceMapFormatError("Not a stored source map")
+    if version != VERSION:
+        raise SourceMapFormatError(f"Unsupported source map format version {version}")
+    if source_hash is not None and source_hash != stored_hash:
+        raise StaleSourceMapError("The source map was built from a different source")
+
+    expected_size = _HEADER.size + (rows * 12 + child_count) * 4 + rows * 2 + keys_size + filename_size
+    if len(view) != expected_size:
+        raise SourceMapFormatError(f"Source map has {len(view)} bytes, expected {expected_size}")
+
+    offset = _HEADER.size
+
+    def take(count, fmt):
+        nonlocal offset
+        size = count * (4 if fmt == "i" else 1)
+        section = view[offset : offset + size]
+        offset += size
+        if fmt == "i" and sys.byteorder != "little":  # pragma: no cover
+            column = array(fmt, section.tobytes())
+            column.byteswap()
+            return column
+        return section.cast(fmt)
+
+    parents = take(rows, "i")
+    key_spans = take(rows * 4, "i")
+    value_spans = take(rows * 4, "i")
+    child_offsets = take(rows, "i")
+    child_counts = take(rows, "i")
+    children = take(child_count, "i")
+    key_lengths = take(rows, "i")
+    kinds = take(rows, "b")
+    ordered = take(rows, "b")
+    key_data = take(keys_size, "B")
+    filename = take(filename_size, "B")
+
+    keys = []
+    key_offset = 0
+    for length in key_lengths:
+        if length < 0:
+            keys.append(None)
+        else:
+            keys.append(str(key_data[key_offset : key_offset + length], "utf-8", "surrogatepass"))
+            key_offset += length
+
+    source_map = CompiledSourceMap(
+        kinds, parents, keys, key_spans, value_spans, child_offsets, child_counts, children, ordered
+    )
+    if filename_size:
+        source_map.filename = str(filename, "utf-8", "surrogatepass")
+    return source_map
+
+
+def save(source_map: CompiledSourceMap, path: str | os.PathLike, source_hash: bytes = bytes(16)):
+    """Store a compiled source map in a file.
+
+    The file is replaced atomically, so concurrent readers never see a partially written source map.
+
+    Args:
+        source_map (CompiledSourceMap): The source map to store.
+        path (str | os.PathLike): The path of the file to store it in.
+        source_hash (bytes): The `content_hash()` of the source the map was built from.
+    """
+    data = dumps(source_map, source_hash)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as stream:
+            stream.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def load(path: str | os.PathLike, source_hash: bytes | None = None) -> CompiledSourceMap:
+    """Load a compiled source map from a file.
+
+    The file is memory-mapped, and the source map's columns refer to the mapped file.
+
+    Args:
+        path (str | os.PathLike): The path of the stored source map.
+        source_hash (bytes | None): The `content_hash()` of the current source, or None to skip the check.
+
+    Returns:
+        CompiledSourceMap: The stored source map.
+
+    Raises:
+        SourceMapFormatError: If the file does not hold a stored source map of a supported version.
+        StaleSourceMapError: If the source map was built from a source other than the one with `source_hash`.
+    """
+    with open(path, "rb") as stream:
+        if os.fstat(stream.fileno()).st_size == 0:
+            raise SourceMapFormatError("Truncated source map header")
+        mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(mapped, source_hash)
+
+
+def load_or_compile(path: str | os.PathLike, cache_path: str | os.PathLike) -> CompiledSourceMap:
+    """Get the compiled source map for a YAML file, using a stored source map when it is up to date.
+
+    If `cache_path` holds a source map built from the current contents of `path` it is loaded. Otherwise the YAML file
+    is parsed and its compiled source map is stored in `cache_path`.
+
+    Args:
+        path (str | os.PathLike): The path of the YAML file.
+        cache_path (str | os.PathLike): The path of the stored source map.
+
+    Returns:
+        CompiledSourceMap: The compiled source map for the YAML file.
+    """
+    with open(path, "rb") as stream:
+        source = stream.read()
+    source_hash = content_hash(source)
+
+    try:
+        return load(cache_path, source_hash)
+    except (OSError, SourceMapFormatError, StaleSourceMapError):
+        pass
+
+    source_map = CompiledSourceMap.from_string(source)
+    source_map.filename = os.fspath(path)
+    save(source_map, cache_path, source_hash)
+    return source_map
+
+
+def _int_bytes(column) -> bytes:
+    "Get the little-endian bytes of a column of 32-bit integers."
+    if sys.byteorder == "little":
+        return bytes(column)
+
+    column = array("i", column)  # pragma: no cover
+    column.byteswap()  # pragma: no cover
+    return column.tobytes()  # pragma: no cover
@@ -0,0 +1,39 @@
+"""Generators of synthetic YAML sources whose shape is controlled by their arguments.
+
+The benchmarks use them to measure how source maps scale with the width, length and depth of documents. The same
+arguments always produce the same source.
+"""
+
+
+def wide_mapping(width: int) -> str:
+    "A block mapping with `width` scalar entries."
+    return "".join(f"key_{idx}: value {idx}\n" for idx in range(width))
+
+
+def long_sequence(length: int, flow: bool = False) -> str:
+    "A block sequence of `length` scalars, or a flow sequence with an element per line if `flow` is set."
+    if flow:
+        return "[\n" + "".join(f"  item {idx},\n" for idx in range(length)) + "]\n"
+    return "".join(f"- item {idx}\n" for idx in range(length))
+
+
+def deep_nesting(depth: int) -> str:
+    "Block mappings nested `depth` levels deep. Every level has a scalar entry besides the nested mapping."
+    lines = []
+    for level in range(depth):
+        indent = "  " * level
+        lines.append(f"{indent}sibling_{level}: {level}\n")
+        lines.append(f"{indent}level_{level}:\n")
+    lines.append(f"{'  ' * depth}leaf: bottom\n")
+    return "".join(lines)
+
+
+def block_scalar(lines: int, width: int = 80) -> str:
+    "A literal block scalar of `lines` lines, each `width` characters long, between two scalar entries."
+    line = ("lorem ipsum dolor sit amet " * (width // 27 + 1))[:width]
+    return "before: 1\ntext: |\n" + "".join(f"  {line}\n" for _ in range(lines)) + "after: 2\n"
+
+
+def document_stream(count: int, width: int = 10) -> str:
+    "A stream of `count` documents, each a block mapping with `width` scalar entries."
+    return "".join(f"---\n{wide_mapping(width)}" for _ in range(count))
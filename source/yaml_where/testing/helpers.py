@@ -16,3 +16,11 @@ def clean_yaml(s: str) -> str:
 
 def extent(start_line: int, start_col: int, length: int):
     return Range.from_parts(start_line, start_col, start_line, start_col + length)
+
+
+def positions(s: str):
+    "Every position in a string, including the ends of lines and one line past the end."
+    lines = s.split("\n")
+    for line_number, line in enumerate(lines + [""]):
+        for column in range(len(line) + 2):
+            yield Position(line_number, column)
@@ -0,0 +1,73 @@
+"""Helpers for matching path patterns while walking a document.
+
+The source maps walk different trees, but advance through a pattern and match its components against the elements of
+a sequence in the same way.
+"""
+
+from collections.abc import Sequence
+from typing import Any
+
+from yaml_where.path import AnyIndex, Descendants, Index, Token, YAMLPath, YAMLPathComponent
+
+
+def pattern_reach(pattern: tuple) -> list[tuple[int, ...]]:
+    """Get the pattern positions which each position of a pattern stands for.
+
+    A position stands for itself and, because `Descendants` can match no steps at all, for the positions after the
+    `Descendants` components which start at it.
+    """
+    reach = []
+    for idx in range(len(pattern) + 1):
+        end = idx
+        while end < len(pattern) and isinstance(pattern[end], Descendants):
+            end += 1
+        reach.append(tuple(range(idx, end + 1)))
+    return reach
+
+
+def sequence_index(component: YAMLPathComponent) -> int | None:
+    "Get the index in a sequence a component refers to, or None if it doesn't refer to an element of a sequence."
+    if isinstance(component, Index):
+        return component.value()
+    if isinstance(component, Token):
+        return component.index()
+    return None
+
+
+def find_in_sequence(
+    pattern: tuple, positions: list[int], path: YAMLPath, elements: Sequence
+) -> list[tuple[YAMLPath, Any, list[int]]]:
+    "Get the (path, element, pattern positions) of the elements of a sequence which match the pattern positions."
+    if any(isinstance(pattern[idx], (AnyIndex, Descendants)) for idx in positions):
+        indexes = range(len(elements))
+    else:
+        indexes = sorted(
+            {
+                normalize_index(sequence_index(pattern[idx]), len(elements))
+                for idx in positions
+                if sequence_index(pattern[idx]) is not None
+            }
+            - {None}
+        )
+
+    states = []
+    for index in indexes:
+        child_positions = []
+        for idx in positions:
+            component = pattern[idx]
+            if isinstance(component, Descendants):
+                child_positions.append(idx)
+            elif isinstance(component, AnyIndex) or (
+                sequence_index(component) is not None
+                and normalize_index(sequence_index(component), len(elements)) == index
+            ):
+                child_positions.append(idx + 1)
+        states.append((path + (Index(index),), elements[index], child_positions))
+    return states
+
+
+def normalize_index(index: int, count: int) -> int | None:
+    "Get the non-negative equivalent of a sequence index, or None if it is out of range."
+    if -count <= index < count:
+        return index % count
+    return None
@@ -1,14 +1,43 @@
 """Main implementation of source map calculation.
 """
 
+import asyncio
+import mmap
+import os
 from abc import ABC, abstractmethod
-from collections.abc import Iterable
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor
 from functools import singledispatch
+from typing import IO, TextIO
 
 from ruamel.yaml import YAML, MappingNode, Node, ScalarNode, SequenceNode
-from yaml_where.exceptions import MissingKeyError, NoSuchPathError, UndefinedAccessError, UnsupportedNodeTypeError
-from yaml_where.path import Index, Item, Key, YAMLPath, YAMLPathComponent, Value
+
+from yaml_where import aio, engines, instrumentation
+from yaml_where.compiled import NEAREST_BIASES, CompiledSourceMap
+from yaml_where.exceptions import (
+    MissingKeyError,
+    NoSuchPathError,
+    UndefinedAccessError,
+    UnsupportedNodeTypeError,
+    YAMLWhereException,
+)
+from yaml_where.incremental import patch_node_tree
+from yaml_where.intervals import IntervalIndex
+from yaml_where.lines import LineIndex
+from yaml_where.path import (
+    AnyKey,
+    Descendants,
+    Index,
+    Item,
+    Key,
+    Value,
+    YAMLPath,
+    YAMLPathComponent,
+)
 from yaml_where.range import Position, Range
+from yaml_where.storage import content_hash
+from yaml_where.traversal import find_in_sequence, pattern_reach, sequence_index
 
 
 class YAMLWhere(ABC):
@@ -17,23 +46,379 @@ class YAMLWhere(ABC):
     This defines the interface for all source map calculators, but is itself abstract.
     """
 
+    #: The path of the file the source map was read from, if any. This is only set on the root of a document.
+    filename: str | None = None
+
+    #: The YAML string the source map was created from, if any. This is only set on the root of a document.
+    source: str | None = None
+
     @classmethod
-    def from_string(cls, source: str):
+    def from_string(cls, source: str, engine: str = "python"):
         """Create a YAMLWhere from a YAML string.
 
         Args:
             source (str): The YAML string to parse.
+            engine (str): The parsing engine to use: "python", or "c" to parse with libyaml if it is installed. The
+                engines produce the same source maps.
 
         Returns:
             YAMLWhere: The YAMLWhere instance with source map information.
+
+        Raises:
+            ValueError: If the engine is unknown.
+        """
+        source_map = _from_node(engines.compose(source, engine))
+        if isinstance(source, str):
+            source_map.source = source
+        return source_map
+
+    @classmethod
+    async def afrom_string(cls, source: str, engine: str = "python", executor: Executor | None = None):
+        """Create a YAMLWhere from a YAML string without blocking the event loop.
+
+        The string is parsed in an executor. Concurrent calls for the same string and engine share a single parse, and
+        so return the same source map, which must then not be modified with `apply_edit()`. Cancelling a call cancels
+        the parse once no other calls are waiting for it.
+
+        Args:
+            source (str): The YAML string to parse.
+            engine (str): The parsing engine to use, as for `from_string()`.
+            executor (Executor | None): The executor to parse in, or None for the event loop's default executor.
+
+        Returns:
+            YAMLWhere: The YAMLWhere instance with source map information.
+        """
+        key = (cls, content_hash(source), engine)
+        return await aio.run_coalesced(key, executor, cls.from_string, source, engine)
+
+    @classmethod
+    def from_file(cls, stream: IO):
+        """Create a YAMLWhere from a file object.
+
+        The stream is read incrementally while the document is composed, rather than being read into a string first.
+
+        Args:
+            stream (IO): A text or binary stream to read the YAML document from. If the stream has a `name`, it is
+                recorded as the `filename` of the source map.
+
+        Returns:
+            YAMLWhere: The YAMLWhere instance with source map information.
+        """
+        source_map = _from_node(engines.compose(stream))
+        name = getattr(stream, "name", None)
+        if isinstance(name, str):
+            source_map.filename = name
+        return source_map
+
+    @classmethod
+    def from_path(cls, path: str | os.PathLike):
+        """Create a YAMLWhere from a file.
+
+        The file is memory-mapped and read incrementally, so the file's contents are never held in memory as a whole.
+
+        Args:
+            path (str | os.PathLike): The path of the YAML file.
+
+        Returns:
+            YAMLWhere: The YAMLWhere instance with source map information, with `filename` set to `path`.
+        """
+        with open(path, "rb") as stream:
+            if os.fstat(stream.fileno()).st_size == 0:
+                # Empty files can not be memory-mapped
+                source_map = cls.from_file(stream)
+            else:
+                with _MappedFile(stream) as mapped:
+                    source_map = cls.from_file(mapped)
+
+        source_map.filename = os.fspath(path)
+        return source_map
+
+    @classmethod
+    def iter_documents(cls, source: str | TextIO) -> Iterator["YAMLWhere"]:
+        """Create a YAMLWhere for each document in a YAML stream.
+
+        Documents are composed one at a time as the iterator is advanced, so only the node tree of the current
+        document needs to be held in memory. Positions are relative to the start of the stream, not of the document.
+
+        Args:
+            source (str | TextIO): The YAML string or text stream to parse.
+
+        Returns:
+            Iterator[YAMLWhere]: The YAMLWhere instances for the documents, in stream order. When the source is a
+                string, it is the `source` of each of them.
         """
         y = YAML(typ="rt")
-        node = y.compose(source)
-        return _from_node(node)
+        for node in y.compose_all(source):
+            source_map = _from_node(node)
+            if isinstance(source, str):
+                source_map.source = source
+            yield source_map
 
     def __init__(self, node: Node):
         self.node = node
 
+        # Calculators for the nodes of the document, keyed by node identity. This is shared between the root calculator
+        # and all of its descendants, and the node tree keeps the ids stable.
+        self._cache: dict[int, YAMLWhere] = {}
+
+        # The text of the source, read from `filename` for source maps read from files, and its line index, built on
+        # first use.
+        self._text: str | None = None
+        self._lines: LineIndex | None = None
+
+        # The interval index of the elements' ranges, built on first use.
+        self._intervals: IntervalIndex | None = None
+
+    def _child(self, node: Node) -> "YAMLWhere":
+        """Get the source map calculator for a child node.
+
+        Calculators are created on first use and kept in the document's cache, so repeated queries neither re-dispatch
+        on node types nor rebuild the indexes that calculators keep.
+        """
+        try:
+            return self._cache[id(node)]
+        except KeyError:
+            child = self._cache[id(node)] = _from_node(node)
+            child._cache = self._cache
+            return child
+
+    def compile(self) -> CompiledSourceMap:
+        """Compile this source map into a compact, array-backed form.
+
+        The compiled source map answers the same queries as this one but does not refer to the YAML node graph, so
+        the YAMLWhere can be discarded afterwards.
+
+        Returns:
+            CompiledSourceMap: The compiled source map.
+        """
+        compiled = CompiledSourceMap.from_node(self.node)
+        compiled.filename = self.filename
+        compiled.source = self.source
+        return compiled
+
+    def apply_edit(self, rng: Range, new_text: str) -> "YAMLWhere":
+        """Update the source map for an edit to its source.
+
+        Only the entry of the innermost block mapping or block sequence containing the edit is parsed again, and the
+        positions of everything after it are shifted. If the edit can't be isolated to such an entry, for example
+        because it changes the structure around it, touches anchored nodes or is next to an empty value, whose position
+        depends on what follows it, the whole source is parsed again.
+
+        Args:
+            rng (Range): The range of the source to replace.
+            new_text (str): The text to replace the range with.
+
+        Returns:
+            YAMLWhere: The source map for the edited source. This is either this source map, updated in place, or a new
+                source map.
+
+        Raises:
+            ValueError: If the source map was not created from a string, or the range is not in the source.
+        """
+        if self.source is None:
+            raise ValueError("apply_edit() requires a source map created with from_string()")
+
+        lines = self.lines
+        start = lines.offset(rng.start)
+        end = lines.offset(rng.end)
+        new_source = self.source[:start] + new_text + self.source[end:]
+
+        if not patch_node_tree(self.node, lines, start, end, new_text):
+            source_map = YAMLWhere.from_string(new_source)
+            source_map.filename = self.filename
+            return source_map
+
+        self.source = new_source
+        self._lines = None
+        self._intervals = None
+        self._cache.clear()
+        self._reset()
+        return self
+
+    @property
+    def lines(self) -> LineIndex:
+        """The line index of the source, for converting between positions, offsets, byte offsets and UTF-16 columns.
+
+        The index is built the first time it is used. The source of a source map read from a file is read from the
+        file, as UTF-8, at the same time, so the file must not have changed since.
+
+        Raises:
+            ValueError: If the source map was created from neither a string nor a named file.
+            OSError: If the file can't be read.
+        """
+        if self._lines is None:
+            text = self._source_text()
+            with instrumentation.measure(instrumentation.INDEX, "line index"):
+                self._lines = LineIndex(text)
+        return self._lines
+
+    def _source_text(self) -> str:
+        "Get the text of the source, reading it from `filename` if the source map was read from a file."
+        if self.source is not None:
+            return self.source
+
+        if self._text is None:
+            if self.filename is None:
+                raise ValueError("The line index requires a source map created from a string or a named file")
+            with open(self.filename, "rb") as stream:
+                self._text = stream.read().decode("utf-8")
+        return self._text
+
+    def walk(
+        self, *root: YAMLPathComponent, max_depth: int | None = None
+    ) -> Iterator[tuple[YAMLPath, Range | None, Range]]:
+        """Walk the elements of the document, or of an element of it, in document order.
+
+        Every entry of a mapping and every element of a sequence below the root is yielded. The walk is iterative, and
+        reads the node tree directly rather than creating calculators for the elements it passes. Entries with complex
+        keys can't be addressed by paths, so they are skipped along with their values. Aliases are followed, except
+        into a node which contains the alias, whose elements are not walked again.
+
+        Args:
+            *root (YAMLPathComponent): The path of the element to walk the elements of. By default the whole document
+                is walked.
+            max_depth (int | None): The number of levels below the root to walk, or None to walk every level.
+
+        Returns:
+            Iterator[tuple[YAMLPath, Range | None, Range]]: The path, key range and value range of each element, in
+                document order. Paths start with the root path, and the key range is None for sequence elements.
+
+        Raises:
+            ValueError: If `max_depth` is negative.
+            MissingKeyError: If a component of the root path is missing from its element.
+            UndefinedAccessError: If a component of the root path is of an inappropriate type for its element.
+        """
+        if max_depth is not None and max_depth < 0:
+            raise ValueError(f"max_depth must not be negative, not {max_depth}")
+
+        calculator = self
+        for component in root:
+            if not isinstance(calculator, _YAMLWhereCollection):
+                raise UndefinedAccessError(f"Can not access {component} in an element which is not a collection")
+            calculator = calculator._child(calculator._child_node(component))
+
+        return _walk(calculator.node, tuple(root), max_depth)
+
+    def find_ranges(self, pattern: Iterable[YAMLPathComponent]) -> Iterator[tuple[YAMLPath, Range]]:
+        """Find the elements matching a pattern.
+
+        A pattern is a path which can also hold the wildcard components `AnyKey` and `AnyIndex`, and `Descendants`,
+        which matches any number of steps down the document. The document is traversed once, lazily, following every
+        way the pattern can match at the same time. Mappings are only scanned for wildcards: concrete keys are looked
+        up in the mappings' key indexes. Unlike `get_range()`, components which don't match, for example because a key
+        is missing, simply give no matches.
+
+        Args:
+            pattern (Iterable[YAMLPathComponent]): The pattern to match.
+
+        Returns:
+            Iterator[tuple[YAMLPath, Range]]: The (path, range) pairs of the matches, in document order. The paths hold
+                only concrete components, and their ranges are those of the elements the paths refer to.
+        """
+        pattern = tuple(pattern)
+        reach = pattern_reach(pattern)
+
+        # Traversal states, as (path, node, pattern positions, anchored nodes on the path), or (path, range, None, None)
+        # for matches of keys and items, which are yielded in turn
+        stack: list[tuple] = [((), self.node, (0,), ())]
+        while stack:
+            path, node, positions, anchored = stack.pop()
+            if positions is None:
+                yield path, node
+                continue
+
+            if node is None:
+                continue
+
+            positions = {reached for idx in positions for reached in reach[idx]}
+            if len(pattern) in positions:
+                yield path, Range.from_node(node)
+                positions.discard(len(pattern))
+
+            if any(node is ancestor for ancestor in anchored):
+                # Aliases can make a node its own descendant, and the descendants of such a node are not searched again
+                positions = {idx for idx in positions if not isinstance(pattern[idx], Descendants)}
+            elif node.anchor is not None:
+                anchored += (node,)
+
+            if not positions:
+                continue
+
+            if isinstance(node, MappingNode):
+                states = self._find_in_mapping(pattern, sorted(positions), path, node, anchored)
+            elif isinstance(node, SequenceNode):
+                states = [
+                    (*state, anchored) for state in find_in_sequence(pattern, sorted(positions), path, node.value)
+                ]
+            else:
+                states = []
+            stack.extend(reversed(states))
+
+    def _find_in_mapping(
+        self, pattern: tuple, positions: list[int], path: YAMLPath, node: MappingNode, anchored: tuple
+    ) -> list[tuple]:
+        "Get the traversal states for the entries of a mapping which match the pattern positions."
+        # The entries that concrete components refer to
+        found = {
+            idx: self._child(node)._lookup(pattern[idx].value()) for idx in positions if isinstance(pattern[idx], Item)
+        }
+        if any(isinstance(pattern[idx], (AnyKey, Descendants)) for idx in positions):
+            entries = node.value
+        else:
+            entries = {id(entry[0]): entry for entry in found.values() if entry is not None}.values()
+            entries = sorted(entries, key=lambda entry: (entry[0].start_mark.line, entry[0].start_mark.column))
+
+        states = []
+        for key_node, value_node in entries:
+            scalar_key = isinstance(key_node, ScalarNode)
+            children: dict[YAMLPathComponent, list[int]] = {}
+            for idx in positions:
+                component = pattern[idx]
+                if isinstance(component, Descendants):
+                    if scalar_key:
+                        children.setdefault(Value(key_node.value), []).append(idx)
+                    continue
+
+                if isinstance(component, AnyKey):
+                    if not scalar_key:
+                        continue
+                    component = component.value()(key_node.value)
+                elif found.get(idx) is None or found[idx][0] is not key_node or found[idx][1] is not value_node:
+                    continue
+
+                if idx + 1 == len(pattern) and isinstance(component, Key):
+                    states.append((path + (component,), Range.from_node(key_node), None, None))
+                elif idx + 1 == len(pattern) and not isinstance(component, Value):
+                    states.append((path + (component,), _item_range(key_node, value_node), None, None))
+                else:
+                    children.setdefault(component, []).append(idx + 1)
+
+            for component, child_positions in children.items():
+                states.append((path + (component,), value_node, child_positions, anchored))
+
+        return states
+
+    def get_text(self, *path: YAMLPathComponent) -> str:
+        """Get the source text of an element.
+
+        Args:
+            *path (YAMLPathComponent): The path of the element, as for `get_range()`.
+
+        Returns:
+            str: The text of the source in the element's range.
+
+        Raises:
+            ValueError: If the source map was created from neither a string nor a named file.
+            OSError: If the source map's file can't be read.
+        """
+        rng = self.get_range(*path)
+        lines = self.lines
+        return self._source_text()[lines.offset(rng.start) : lines.offset(rng.end)]
+
+    def _reset(self):
+        "Discard any indexes of the node's children, after the node tree has been modified."
+
+    @instrumentation.measured(instrumentation.QUERY, "get_path", lambda self, pos: pos)
     def get_path(self, pos: Position) -> YAMLPath:
         """Get the path corresponding to a position in the document.
 
@@ -45,10 +430,147 @@ class YAMLWhere(ABC):
         """
         return tuple(self._get_path(pos))
 
+    @instrumentation.measured(instrumentation.QUERY, "get_nearest_path", lambda self, pos, bias="enclosing": pos)
+    def get_nearest_path(self, pos: Position, bias: str = "enclosing") -> YAMLPath:
+        """Get the path of the element nearest to a position, which need not be in any element.
+
+        Positions in indentation, comments, sequence entry markers and the separators of mappings don't belong to an
+        element, so `get_path()` can't resolve them. If the position is in an element this gives the same path as
+        `get_path()`. Otherwise `bias` selects which element is nearest:
+
+        - "enclosing": the innermost collection containing the position.
+        - "before": the innermost element ending at or before the position, in the innermost collection containing it.
+        - "after": the innermost element starting after the position, in the innermost collection containing it.
+
+        If there is no element before or after the position in that collection, the collection is nearest. Each level
+        of the document is searched once, by bisecting the spans of its children.
+
+        Args:
+            pos (Position): The position to get the path for.
+            bias (str): "enclosing", "before" or "after".
+
+        Returns:
+            YAMLPath: The path of the nearest element. The path of the document's root is empty.
+
+        Raises:
+            ValueError: If the bias is unknown.
+            NoSuchPathError: If the document is empty.
+        """
+        if bias not in NEAREST_BIASES:
+            raise ValueError(f"Unknown bias {bias!r}, expected one of {', '.join(NEAREST_BIASES)}")
+
+        path = []
+        calculator = self
+        ancestors = {id(self.node)}
+        instrumentation.visit()
+        while isinstance(calculator, _YAMLWhereCollection):
+            spans = calculator._spans()
+            idx = spans.locate(pos)
+            if idx is None:
+                # Once the walk leaves the position, this finds the last or first child of each collection
+                idx = None if bias == "enclosing" else spans.nearest(pos, bias)
+                if idx is None:
+                    break
+
+            path.append(spans.components[idx])
+            child = spans.children[idx]
+            if child is None or id(child) in ancestors:
+                # Recursive aliases are not followed back into the collections containing them
+                break
+            ancestors.add(id(child))
+            calculator = calculator._child(child)
+            instrumentation.visit()
+
+        if isinstance(calculator, YAMLWhereNull):
+            raise NoSuchPathError("Can not resolve a path in a null node")
+        return tuple(path)
+
+    @instrumentation.measured(instrumentation.QUERY, "get_paths_overlapping", lambda self, rng: rng)
+    def get_paths_overlapping(self, rng: Range) -> list[YAMLPath]:
+        """Get the paths of the elements overlapping a range, such as the lines of a hunk of a diff.
+
+        Elements are the document's root, the keys and values of mappings, and the elements of sequences, as for
+        `get_path()`. Two ranges overlap if either contains the start of the other, so an empty range overlaps the
+        elements containing its position. The elements are found in an interval index of their ranges, which is built
+        the first time either this or `get_paths_within()` is called.
+
+        Args:
+            rng (Range): The range to find the elements overlapping.
+
+        Returns:
+            list[YAMLPath]: The paths of the elements, ordered by the starts of their ranges, outer elements first. The
+                paths of keys end with a `Key`.
+        """
+        return self._interval_index().overlapping(rng)
+
+    @instrumentation.measured(instrumentation.QUERY, "get_paths_within", lambda self, rng: rng)
+    def get_paths_within(self, rng: Range) -> list[YAMLPath]:
+        """Get the paths of the elements within a range, i.e. whose ranges are `<=` it.
+
+        Elements are those of `get_paths_overlapping()`, which describes the index they are found in.
+
+        Args:
+            rng (Range): The range to find the elements within.
+
+        Returns:
+            list[YAMLPath]: The paths of the elements, ordered by the starts of their ranges, outer elements first. The
+                paths of keys end with a `Key`.
+        """
+        return self._interval_index().within(rng)
+
+    def _interval_index(self) -> IntervalIndex:
+        "Get the interval index of the elements' ranges, building it on first use."
+        if self._intervals is None:
+            with instrumentation.measure(instrumentation.INDEX, "interval index"):
+                self._intervals = IntervalIndex(_element_ranges(self.node))
+        return self._intervals
+
     @abstractmethod
     def _get_path(self, pos: Position) -> Iterable[YAMLPathComponent]:
         """Get the path corresponding to a Range."""
 
+    def get_paths(self, positions: Iterable[Position]) -> list[YAMLPath | NoSuchPathError]:
+        """Get the paths corresponding to many positions in the document.
+
+        The positions are sorted and the document is swept once, with positions that fall into the same element
+        resolved together.
+
+        Args:
+            positions (Iterable[Position]): The positions to get paths for.
+
+        Returns:
+            list[YAMLPath | NoSuchPathError]: For each position, in input order, its path or the error that
+                `get_path()` would raise for it.
+        """
+        batch = sorted(enumerate(positions), key=lambda item: (item[1].line, item[1].column))
+        results = [None] * len(batch)
+        with instrumentation.measure(instrumentation.QUERY, "get_paths", len(batch)):
+            self._get_paths(batch, (), results)
+        return results
+
+    def _get_paths(self, batch: list[tuple[int, Position]], prefix: YAMLPath, results: list):
+        "Store the paths for a sorted batch of (result index, position) pairs in `results`."
+        for idx, pos in batch:
+            try:
+                results[idx] = prefix + tuple(self._get_path(pos))
+            except NoSuchPathError as err:
+                results[idx] = err
+
+    async def aget_paths(
+        self, positions: Iterable[Position], executor: Executor | None = None
+    ) -> list[YAMLPath | NoSuchPathError]:
+        """Get the paths of a batch of positions, as `get_paths()` does, without blocking the event loop.
+
+        Args:
+            positions (Iterable[Position]): The positions to look up.
+            executor (Executor | None): The executor to run the lookups in, or None for the event loop's default
+                executor.
+
+        Returns:
+            list[YAMLPath | NoSuchPathError]: The path for each position, in order.
+        """
+        return await asyncio.get_running_loop().run_in_executor(executor, self.get_paths, list(positions))
+
     @abstractmethod
     def get_range(self, *path: YAMLPathComponent) -> Range:
         """Get the range for an entire entry.
@@ -64,157 +586,503 @@ class YAMLWhere(ABC):
                 used to access a sequence element.
         """
 
+    def get_ranges(self, paths: Iterable[YAMLPath]) -> list[Range | YAMLWhereException]:
+        """Get the ranges for many paths at once.
+
+        Paths are grouped by the elements they pass through, so a prefix shared by several paths is only walked once.
+
+        Args:
+            paths (Iterable[YAMLPath]): The paths to get ranges for.
+
+        Returns:
+            list[Range | YAMLWhereException]: For each path, in input order, its range or the error that `get_range()`
+                would raise for it.
+        """
+        batch = [(idx, tuple(path)) for idx, path in enumerate(paths)]
+        results = [None] * len(batch)
+        with instrumentation.measure(instrumentation.QUERY, "get_ranges", len(batch)):
+            self._get_ranges(batch, 0, results)
+        return results
+
+    async def aget_ranges(
+        self, paths: Iterable[YAMLPath], executor: Executor | None = None
+    ) -> list[Range | YAMLWhereException]:
+        """Get the ranges for many paths at once, as `get_ranges()` does, without blocking the event loop.
+
+        Args:
+            paths (Iterable[YAMLPath]): The paths to get ranges for.
+            executor (Executor | None): The executor to run the lookups in, or None for the event loop's default
+                executor.
+
+        Returns:
+            list[Range | YAMLWhereException]: For each path, in input order, its range or the error that `get_range()`
+                would raise for it.
+        """
+        return await asyncio.get_running_loop().run_in_executor(executor, self.get_ranges, list(paths))
+
+    def _get_ranges(self, batch: list[tuple[int, YAMLPath]], depth: int, results: list):
+        "Store the ranges for a batch of (result index, path) pairs, whose first `depth` components lead here."
+        for idx, path in batch:
+            try:
+                results[idx] = self.get_range(*path[depth:])
+            except YAMLWhereException as err:
+                results[idx] = err
+
 class YAMLWhereScalar(YAMLWhere):
     "Source map calculator for scalar nodes."
 
     def __init__(self, node: ScalarNode):
         if not isinstance(node, ScalarNode):
-            raise ValueError(f"YAMLWhereScalar can not be constructed with a {type(node).__name__}")
+            raise TypeError(f"YAMLWhereScalar can not be constructed with a {type(node).__name__}")
         super().__init__(node)
 
     def _get_path(self, rng: Range) -> Iterable[YAMLPathComponent]:
+        instrumentation.visit()
         return []
 
+    @instrumentation.measured(instrumentation.QUERY, "get_range", lambda self, *path: path)
     def get_range(self, *path: YAMLPathComponent) -> Range:
+        instrumentation.visit()
         if path:
             raise UndefinedAccessError("get_range() path must be empty for scalars")
 
         return Range.from_node(self.node)
 
 
-class YAMLWhereSequence(YAMLWhere):
+class _ChildSpans:
+    """The spans of a collection's children, in document order.
+
+    Spans are stored as parallel lists of `(line, column)` start and end tuples. When the spans are sorted and disjoint
+    a position is located by bisecting the start positions. Aliases can refer back to nodes earlier in the document,
+    so when that is not the case every span is checked in order instead.
+    """
+
+    def __init__(self, entries: Iterable[tuple[Node, YAMLPathComponent, Node | None]]):
+        self.starts: list[tuple[int, int]] = []
+        self.ends: list[tuple[int, int]] = []
+        self.components: list[YAMLPathComponent] = []
+        self.children: list[Node | None] = []
+        for node, component, child in entries:
+            self.starts.append((node.start_mark.line, node.start_mark.column))
+            self.ends.append((node.end_mark.line, node.end_mark.column))
+            self.components.append(component)
+            self.children.append(child)
+
+        self.ordered = all(end <= start for end, start in zip(self.ends, self.starts[1:]))
+
+    def locate(self, pos: Position) -> int | None:
+        "Get the index of the span containing `pos`, or None if no span contains it."
+        point = (pos.line, pos.column)
+        if self.ordered:
+            idx = bisect_right(self.starts, point) - 1
+            candidates = (idx,) if idx >= 0 else ()
+        else:
+            candidates = range(len(self.starts))
+
+        for idx in candidates:
+            if self.starts[idx] <= point < self.ends[idx]:
+                if not self.ordered:
+                    instrumentation.visit(idx + 1)
+                return idx
+
+        if not self.ordered:
+            instrumentation.visit(len(self.starts))
+        return None
+
+    def nearest(self, pos: Position, bias: str) -> int | None:
+        """Get the index of the span nearest to `pos`, which is in no span, or None if there is none.
+
+        With the "before" bias this is the span ending last at or before `pos`, and with the "after" bias the span
+        starting first after it.
+        """
+        point = (pos.line, pos.column)
+        if self.ordered:
+            idx = bisect_right(self.starts, point) - 1
+            if bias == "after":
+                idx += 1
+            return idx if 0 <= idx < len(self.starts) else None
+
+        instrumentation.visit(len(self.starts))
+        if bias == "before":
+            candidates = [idx for idx, end in enumerate(self.ends) if end <= point]
+            return max(candidates, key=lambda idx: self.ends[idx], default=None)
+        candidates = [idx for idx, start in enumerate(self.starts) if start > point]
+        return min(candidates, key=lambda idx: self.starts[idx], default=None)
+
+
+class _YAMLWhereCollection(YAMLWhere):
+    "Base for source map calculators of nodes with children."
+
+    def __init__(self, node: Node):
+        super().__init__(node)
+        self._child_spans: _ChildSpans | None = None
+
+    @abstractmethod
+    def _span_entries(self) -> Iterable[tuple[Node, YAMLPathComponent, Node | None]]:
+        """Get the (span node, path component, child node) entries for each addressable child, in document order.
+
+        The child node is the node to continue a path lookup in, or None if the path ends at the span.
+        """
+
+    def _spans(self) -> _ChildSpans:
+        if self._child_spans is None:
+            with instrumentation.measure(instrumentation.INDEX, "child spans"):
+                self._child_spans = _ChildSpans(self._span_entries())
+        return self._child_spans
+
+    def _reset(self):
+        self._child_spans = None
+
+    def _get_path(self, pos: Position) -> Iterable[YAMLPathComponent]:
+        instrumentation.visit()
+        spans = self._spans()
+        idx = spans.locate(pos)
+        if idx is None:
+            raise NoSuchPathError(f"Can not resolve the range {pos} to a path in {self.node.value}")
+
+        yield spans.components[idx]
+        child = spans.children[idx]
+        if child is not None:
+            yield from self._child(child)._get_path(pos)
+
+    def _get_paths(self, batch: list[tuple[int, Position]], prefix: YAMLPath, results: list):
+        instrumentation.visit()
+        spans = self._spans()
+
+        # The batch is sorted, so positions in the same child are adjacent
+        groups: list[tuple[int, list[tuple[int, Position]]]] = []
+        for idx, pos in batch:
+            span_idx = spans.locate(pos)
+            if span_idx is None:
+                results[idx] = NoSuchPathError(f"Can not resolve the range {pos} to a path in {self.node.value}")
+            elif groups and groups[-1][0] == span_idx:
+                groups[-1][1].append((idx, pos))
+            else:
+                groups.append((span_idx, [(idx, pos)]))
+
+        for span_idx, group in groups:
+            path = prefix + (spans.components[span_idx],)
+            child = spans.children[span_idx]
+            if child is None:
+                for idx, _ in group:
+                    results[idx] = path
+            else:
+                self._child(child)._get_paths(group, path, results)
+
+    @abstractmethod
+    def _child_node(self, component: YAMLPathComponent) -> Node:
+        """Get the node that a path continues in after `component`.
+
+        Raises:
+            MissingKeyError: If there is no child for the component.
+            UndefinedAccessError: If the component is of an inappropriate type for this collection.
+        """
+
+    def _get_ranges(self, batch: list[tuple[int, YAMLPath]], depth: int, results: list):
+        instrumentation.visit()
+        groups: dict[int, tuple[Node, list[tuple[int, YAMLPath]]]] = {}
+        for idx, path in batch:
+            try:
+                if len(path) - depth > 1:
+                    node = self._child_node(path[depth])
+                    groups.setdefault(id(node), (node, []))[1].append((idx, path))
+                else:
+                    results[idx] = self.get_range(*path[depth:])
+            except YAMLWhereException as err:
+                results[idx] = err
+
+        for node, group in groups.values():
+            self._child(node)._get_ranges(group, depth + 1, results)
+
+
+class YAMLWhereSequence(_YAMLWhereCollection):
     "Source map calculator for sequence nodes."
 
     def __init__(self, node: SequenceNode):
         if not isinstance(node, SequenceNode):
-            raise ValueError(
+            raise TypeError(
                 f"YAMLWhereSequence can not be constructed with a {type(node).__name__}"
             )
 
         super().__init__(node)
 
-    def _get_path(self, pos: Position) -> Iterable[YAMLPathComponent]:
+    def _span_entries(self) -> Iterable[tuple[Node, YAMLPathComponent, Node | None]]:
         for idx, child in enumerate(self.node.value):
-            if pos in Range.from_node(child):
-                yield Index(idx)
-                yield from _from_node(child).get_path(pos)
-                return
-        raise NoSuchPathError(f"Can not resolve the range {pos} to a path in {self.node.value}")
+            yield child, Index(idx), child
 
+    @instrumentation.measured(instrumentation.QUERY, "get_range", lambda self, *path: path)
     def get_range(self, *path: YAMLPathComponent) -> Range:
+        instrumentation.visit()
         if not path:
             raise UndefinedAccessError(
                 "get_range() with empty path is not defined for sequence elements"
             )
 
         head, tail = path[0], path[1:]
+        value_node = self._child_node(head)
+        if tail:
+            return self._child(value_node).get_range(*tail)
+
+        return Range.from_node(value_node)
 
-        if not isinstance(head, Index):
-            raise UndefinedAccessError(f"Can not access a sequence with non-index component {head}")
+    def _child_node(self, component: YAMLPathComponent) -> Node:
+        idx = sequence_index(component)
+        if idx is None:
+            raise UndefinedAccessError(f"Can not access a sequence with non-index component {component}")
 
         try:
-            value_node = self.node.value[head.value()]
+            return self.node.value[idx]
         except IndexError as err:
-            raise MissingKeyError(head) from err
-
-        if tail:
-            return _from_node(value_node).get_range(*tail)
-
-        return Range.from_node(value_node)
+            raise MissingKeyError(component) from err
 
 
-class YAMLWhereMapping(YAMLWhere):
+class YAMLWhereMapping(_YAMLWhereCollection):
     "Source map calculator for mapping nodes."
 
     def __init__(self, node: MappingNode):
         if not isinstance(node, MappingNode):
-            raise ValueError(
+            raise TypeError(
                 f"YAMLWhereMapping can not be constructed with a {type(node).__name__}"
             )
 
         super().__init__(node)
+        self._key_index: dict | None = None
 
-    def _get_path(self, pos: Position) -> Iterable[YAMLPathComponent]:
-        for key_node, value_node in self.node.value:
-            # Check if we're looking at the key
-            if pos in Range.from_node(key_node):
-                yield Key(key_node.value)
-                # yield from _from_node(value_node).get_path(pos)
-                return
-
-            elif pos in Range.from_node(value_node):
-                yield Value(key_node.value)
-                yield from _from_node(value_node).get_path(pos)
-                return
+    def _reset(self):
+        super()._reset()
+        self._key_index = None
 
-        raise NoSuchPathError(f"Can not resolve the range {pos} to a path in {self.node.value}")
+    def _span_entries(self) -> Iterable[tuple[Node, YAMLPathComponent, Node | None]]:
+        for key_node, value_node in self.node.value:
+            # Paths which land on a key end there
+            yield key_node, Key(key_node.value), None
+            yield value_node, Value(key_node.value), value_node
 
+    @instrumentation.measured(instrumentation.QUERY, "get_range", lambda self, *path: path)
     def get_range(self, *path: YAMLPathComponent) -> Range:
+        instrumentation.visit()
         if not path:
             raise UndefinedAccessError(
                 "get_range() with no arguments is not defined for sequence elements"
             )
 
         head, tail = path[0], path[1:]
+        child_key, child_value = self._entry(head)
+        if tail:
+            return self._child(child_value).get_range(*tail)
 
-        if not isinstance(head, Item):
-            raise UndefinedAccessError(f"Can not access a mapping with non-item component {head}")
+        elif isinstance(head, Key):
+            return Range.from_node(child_key)
 
-        for child_key, child_value in self.node.value:
-            if child_key.value == head.value():
-                if tail:
-                    return _from_node(child_value).get_range(*tail)
+        elif isinstance(head, Value):
+            return Range.from_node(child_value)
+
+        else:
+            assert isinstance(head, Item)
+            return _item_range(child_key, child_value)
+
+    def _child_node(self, component: YAMLPathComponent) -> Node:
+        return self._entry(component)[1]
+
+    def _entry(self, component: YAMLPathComponent) -> tuple[Node, Node]:
+        "Get the (key node, value node) pair referred to by `component`."
+        if not isinstance(component, Item):
+            raise UndefinedAccessError(f"Can not access a mapping with non-item component {component}")
+
+        entry = self._lookup(component.value())
+        if entry is None:
+            raise MissingKeyError(component)
+
+        return entry
+
+    def _lookup(self, key) -> tuple[Node, Node] | None:
+        """Find the first (key node, value node) pair whose key equals `key`.
+
+        Lookups go through a hash index of the mapping's keys which is built on first use. Keys which can not be
+        hashed (e.g. the node lists of complex keys) are not indexed and are found by a linear scan instead.
+        """
+        if self._key_index is None:
+            with instrumentation.measure(instrumentation.INDEX, "key index"):
+                self._key_index = self._build_key_index()
 
-                elif isinstance(head, Key):
-                    return Range.from_node(child_key)
+        try:
+            return self._key_index.get(key)
+        except TypeError:
+            pass
 
-                elif isinstance(head, Value):
-                    return Range.from_node(child_value)
+        for key_node, value_node in self.node.value:
+            if key_node.value == key:
+                return key_node, value_node
 
-                else: 
-                    assert isinstance(head, Item)
-                    return Range(
-                        Position(child_key.start_mark.line, child_key.start_mark.column),
-                        Position(child_value.end_mark.line, child_value.end_mark.column),
-                    )
+        return None
 
-        raise MissingKeyError(head)
+    def _build_key_index(self) -> dict:
+        "Index the mapping's entries by their hashable keys, keeping the first entry for each key."
+        index = {}
+        for key_node, value_node in self.node.value:
+            try:
+                index.setdefault(key_node.value, (key_node, value_node))
+            except TypeError:
+                pass
+        return index
 
 
 class YAMLWhereNull(YAMLWhere):
     "Source map calculator for null nodes."
 
     def _get_path(self, pos: Position) -> Iterable[YAMLPathComponent]:
+        instrumentation.visit()
         raise NoSuchPathError("Can not resolve a path in a null node")
 
+    @instrumentation.measured(instrumentation.QUERY, "get_range", lambda self, *path: path)
     def get_range(self, *path) -> Range:
+        instrumentation.visit()
         raise UndefinedAccessError("get() is not defined for null nodes")
 
 
-@singledispatch
+class _MappedFile:
+    "A read-only memory map of a binary file, which can be read like the file itself."
+
+    def __init__(self, stream: IO[bytes]):
+        self.name = stream.name
+        self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._map.read(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._map.close()
+
+
+def _walk(node: Node | None, root: YAMLPath, max_depth: int | None) -> Iterator[tuple[YAMLPath, Range | None, Range]]:
+    "Walk the elements below a node, as `YAMLWhere.walk()` does."
+    if max_depth == 0 or not isinstance(node, (MappingNode, SequenceNode)):
+        return
+
+    # The collections being walked, with their paths, iterators over their remaining children, and the anchored
+    # collections containing them, which aren't walked again if an alias refers to them
+    stack = [(root, isinstance(node, MappingNode), enumerate(node.value), (node,) if node.anchor is not None else ())]
+    while stack:
+        path, is_mapping, children, anchored = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            continue
+
+        index, entry = child
+        if is_mapping:
+            key_node, value_node = entry
+            if not isinstance(key_node, ScalarNode):
+                continue
+            child_path = path + (Value(key_node.value),)
+            yield child_path, Range.from_node(key_node), Range.from_node(value_node)
+        else:
+            value_node = entry
+            child_path = path + (Index(index),)
+            yield child_path, None, Range.from_node(value_node)
+
+        if (
+            isinstance(value_node, (MappingNode, SequenceNode))
+            and (max_depth is None or len(stack) < max_depth)
+            and not any(value_node is ancestor for ancestor in anchored)
+        ):
+            if value_node.anchor is not None:
+                anchored += (value_node,)
+            stack.append((child_path, isinstance(value_node, MappingNode), enumerate(value_node.value), anchored))
+
+
+def _element_ranges(node: Node | None) -> Iterator[tuple[YAMLPath, Range, YAMLPath | None]]:
+    """Generate the elements of a document, in document order, for an interval index.
+
+    Each collection is traversed once. An alias to a collection which was traversed is an element with the path of the
+    collection, which the interval index finds the elements under the alias from.
+
+    Yields:
+        (path, range, target) tuples, where the target is the path of the collection an alias refers to, or None.
+    """
+    if node is None:
+        return
+
+    yield (), Range.from_node(node), None
+    if not isinstance(node, (MappingNode, SequenceNode)):
+        return
+
+    # The paths of the anchored collections traversed
+    anchored = {id(node): ()} if node.anchor is not None else {}
+    stack = [((), node, enumerate(node.value))]
+    while stack:
+        path, collection, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            continue
+
+        index, entry = child
+        if isinstance(collection, MappingNode):
+            key_node, value_node = entry
+            if not isinstance(key_node, ScalarNode):
+                continue
+            yield path + (Key(key_node.value),), Range.from_node(key_node), None
+            child_path = path + (Value(key_node.value),)
+        else:
+            value_node = entry
+            child_path = path + (Index(index),)
+
+        if id(value_node) in anchored:
+            yield child_path, Range.from_node(value_node), anchored[id(value_node)]
+        else:
+            yield child_path, Range.from_node(value_node), None
+            if isinstance(value_node, (MappingNode, SequenceNode)):
+                if value_node.anchor is not None:
+                    anchored[id(value_node)] = child_path
+                stack.append((child_path, value_node, enumerate(value_node.value)))
+
+
+def _item_range(key_node: Node, value_node: Node) -> Range:
+    """Get the range of a mapping entry, from the start of its key to the end of its value.
+
+    The value of an alias is where its anchor is, which can be before the key. The entry then ends where its key does.
+    """
+    end = max(
+        (key_node.end_mark.line, key_node.end_mark.column),
+        (value_node.end_mark.line, value_node.end_mark.column),
+    )
+    return Range._trusted(Position(key_node.start_mark.line, key_node.start_mark.column), Position(*end))
+
+
+@instrumentation.measured(instrumentation.COMPOSE, "dispatch", lambda node: type(node).__name__)
 def _from_node(node: Node) -> YAMLWhere:
+    "Construct a YAMLWhere based on the type of the node."
+    return _dispatch(node)
+
+
+@singledispatch
+def _dispatch(node: Node) -> YAMLWhere:
     "Construct a YAMLWhere based on the type of the node."
     raise UnsupportedNodeTypeError(
         f"Unsupported node type {type(node).__name__}"
     )  # pragma: no cover
 
 
-@_from_node.register(ScalarNode)
+@_dispatch.register(ScalarNode)
 def _(node):
     return YAMLWhereScalar(node)
 
 
-@_from_node.register(MappingNode)
+@_dispatch.register(MappingNode)
 def _(node):
     return YAMLWhereMapping(node)
 
 
-@_from_node.register(SequenceNode)
+@_dispatch.register(SequenceNode)
 def _(node):
     return YAMLWhereSequence(node)
 
 
-@_from_node.register(type(None))
+@_dispatch.register(type(None))
 def _(node):
     return YAMLWhereNull(node)
 
@@ -0,0 +1,64 @@
+"""Check that compiled source maps give the same answers as the source maps they are compiled from."""
+
+import pytest
+from yaml_where import YAMLWhere
+from yaml_where.exceptions import YAMLWhereException
+from yaml_where.path import Item, Key, Value
+from yaml_where.testing.helpers import clean_yaml, positions
+
+DOCUMENTS = [
+    "",
+    "42",
+    "a: 1\nb: 42",
+    "[1,\n a, foo,\n\n     indented]\n",
+    """
+    a:
+        b: 42
+        c:
+            - 4
+            - d: hola
+              e: [1, {f: 2}]
+    """,
+    """
+    - a: 1
+      b:
+    - [{c: 3}]
+    -
+    - |
+      block
+      scalar
+    """,
+    """
+    a: &x
+        - 1
+    b: *x
+    c: [*x, 2]
+    a: duplicate
+    """,
+]
+
+
+def _query(query, *args):
+    try:
+        return query(*args)
+    except YAMLWhereException as err:
+        return type(err)
+
+
+@pytest.mark.parametrize("source", [clean_yaml(doc) if doc.strip() else doc for doc in DOCUMENTS])
+def test_equivalence(source):
+    source_map = YAMLWhere.from_string(source)
+    compiled = source_map.compile()
+
+    assert _query(compiled.get_range) == _query(source_map.get_range)
+
+    for pos in positions(source):
+        path = _query(source_map.get_path, pos)
+        assert _query(compiled.get_path, pos) == path
+
+        if isinstance(path, tuple) and path:
+            variants = [path]
+            if isinstance(path[-1], (Key, Value)):
+                variants += [path[:-1] + (cls(path[-1].value()),) for cls in (Item, Key, Value)]
+            for variant in variants:
+                assert _query(compiled.get_range, *variant) == _query(source_map.get_range, *variant)
@@ -0,0 +1,70 @@
+"""Check that source maps built from parser events match those built from composed nodes."""
+
+import pytest
+from ruamel.yaml import YAML
+from ruamel.yaml.composer import ComposerError
+from yaml_where import CompiledSourceMap
+
+DOCUMENTS = [
+    "",
+    "42",
+    "---\n",
+    "a: 1\nb: [1, {c: d}]\n",
+    "a:\n  b: 42\n  c:\n    - 4\n    - d: hola\n      e: [1, {f: 2}]\n",
+    "- a: 1\n  b:\n- [{c: 3}]\n-\n- |\n  block\n  scalar\n",
+    "? - complex\n  - key\n: value\n? {x: y}\n? [[nested]]\n: 1\n",
+]
+
+ALIASES = [
+    "- &x {a: 1}\n- *x\n- b: *x\n- {*x : 2}\n",
+    "&x [1, *x, 2]",
+    "&r {a: *r, *r : 1}",
+    "? [a, &k b]\n: *k\n? {x: y}\n: 2\n*k : 3\n",
+    "a: &x\n  b: &y [*y, 1]\n  c: *x\nd: *x\n",
+    "a: &y 1\nb: &x [*y]\nc: &y 2\nd: *x\n",
+    "[&a [&a 'q'], *a]",
+    "&a [&b [*a, *b], *b]",
+    "{&a [*a]: &b {*b : *a}}",
+    "- &s !tag x\n- *s\n- !!map {a: 1}\n",
+    "- &a [&b [*a]]\n- *b\n",
+    "? &k [1, 2]\n: v\nw: *k\nz: *k\n",
+    "a: &x {}\nb: *x\nc: &y [*x]\nd: *y\n",
+]
+
+
+def _columns(source_map: CompiledSourceMap):
+    return (
+        bytes(source_map._kinds),
+        list(source_map._parents),
+        source_map._keys,
+        list(source_map._key_spans),
+        list(source_map._value_spans),
+        list(source_map._child_offsets),
+        list(source_map._child_counts),
+        list(source_map._children),
+        bytes(source_map._ordered),
+    )
+
+
+@pytest.mark.parametrize("source", DOCUMENTS + ALIASES)
+@pytest.mark.filterwarnings("ignore::ruamel.yaml.error.ReusedAnchorWarning")
+def test_same_as_composed(source):
+    from_events = CompiledSourceMap.from_events(YAML(typ="rt").parse(source))
+    from_node = CompiledSourceMap.from_node(YAML(typ="rt").compose(source))
+    assert _columns(from_events) == _columns(from_node)
+
+
+def test_from_string_uses_events():
+    assert _columns(CompiledSourceMap.from_string(ALIASES[4])) == _columns(
+        CompiledSourceMap.from_node(YAML(typ="rt").compose(ALIASES[4]))
+    )
+
+
+def test_several_documents():
+    with pytest.raises(ComposerError):
+        CompiledSourceMap.from_string("a: 1\n---\nb: 2\n")
+
+
+def test_undefined_alias():
+    with pytest.raises(ComposerError):
+        CompiledSourceMap.from_string("a: *x\n")
@@ -0,0 +1,97 @@
+import pytest
+from yaml_where import CompiledSourceMap
+from yaml_where.exceptions import MissingKeyError, UndefinedAccessError
+from yaml_where.path import Index, Item, Key, Value
+from yaml_where.range import Position, Range
+from yaml_where.testing.helpers import clean_yaml
+
+
+class TestMapping:
+    yaml = """
+    a:
+        b: 42
+        c: [1, 2]
+    """
+    source_map = CompiledSourceMap.from_string(clean_yaml(yaml))
+
+    def test_key(self):
+        assert self.source_map.get_range(Value("a"), Key("b")) == Range.from_parts(1, 4, 1, 5)
+
+    def test_value(self):
+        assert self.source_map.get_range(Value("a"), Value("b")) == Range.from_parts(1, 7, 1, 9)
+
+    def test_item(self):
+        assert self.source_map.get_range(Value("a"), Item("b")) == Range.from_parts(1, 4, 1, 9)
+
+    def test_index(self):
+        assert self.source_map.get_range(Value("a"), Value("c"), Index(1)) == Range.from_parts(2, 11, 2, 12)
+
+    def test_negative_index(self):
+        assert self.source_map.get_range(Value("a"), Value("c"), Index(-1)) == Range.from_parts(2, 11, 2, 12)
+
+    def test_missing_key(self):
+        with pytest.raises(MissingKeyError):
+            self.source_map.get_range(Value("a"), Value("d"))
+
+    def test_unhashable_key(self):
+        with pytest.raises(MissingKeyError):
+            self.source_map.get_range(Value(["a"]))
+
+    def test_missing_index(self):
+        with pytest.raises(MissingKeyError):
+            self.source_map.get_range(Value("a"), Value("c"), Index(2))
+
+    def test_index_into_mapping(self):
+        with pytest.raises(UndefinedAccessError):
+            self.source_map.get_range(Index(0))
+
+    def test_key_into_sequence(self):
+        with pytest.raises(UndefinedAccessError):
+            self.source_map.get_range(Value("a"), Value("c"), Value("x"))
+
+    def test_path_through_scalar(self):
+        with pytest.raises(UndefinedAccessError):
+            self.source_map.get_range(Value("a"), Value("b"), Value("x"))
+
+
+def test_null_document():
+    source_map = CompiledSourceMap.from_string("")
+    with pytest.raises(UndefinedAccessError):
+        source_map.get_range(Value("a"))
+
+
+def test_complex_keys_are_recorded_as_none():
+    yaml = """
+    ? [1]
+    : x
+    """
+    source_map = CompiledSourceMap.from_string(clean_yaml(yaml))
+    assert source_map.get_path(Position(0, 3)) == (Key(None),)
+    with pytest.raises(MissingKeyError):
+        source_map.get_range(Key(None))
+
+
+def test_recursive_alias_is_not_expanded():
+    source_map = CompiledSourceMap.from_string("&a [1, *a]")
+    assert source_map.get_range(Index(1)) == Range.from_parts(0, 0, 0, 10)
+    with pytest.raises(MissingKeyError):
+        source_map.get_range(Index(1), Index(0))
+
+
+def test_aliases_share_the_rows_of_their_anchors():
+    yaml = "a0: &a0 [x]\n" + "".join(f"a{i}: &a{i} [{', '.join([f'*a{i - 1}'] * 10)}]\n" for i in range(1, 10))
+    source_map = CompiledSourceMap.from_string(yaml)
+    assert len(source_map._kinds) < 200
+    assert source_map.get_range(Value("a9"), *[Index(9)] * 9, Index(0)) == Range.from_parts(0, 9, 0, 10)
+
+
+def test_keys_of_aliased_mappings():
+    source_map = CompiledSourceMap.from_string("a: &x {b: 1}\nc: [*x]\nd: {}\n")
+    assert source_map.get_range(Value("c"), Index(0), Value("b")) == Range.from_parts(0, 10, 0, 11)
+    with pytest.raises(MissingKeyError):
+        source_map.get_range(Value("d"), Value("b"))
+
+
+def test_item_whose_value_is_an_earlier_anchor():
+    source_map = CompiledSourceMap.from_string("- &x {a: 1}\n- b: *x\n")
+    assert source_map.get_range(Index(1), Item("b")) == Range.from_parts(1, 2, 1, 3)
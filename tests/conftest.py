@@ -1 +1,9 @@
+import pytest
+from yaml_where import YAMLWhere
 
+
+@pytest.fixture(params=["yaml_where", "compiled"])
+def source_map(request):
+    "The source map of the test module's SOURCE, as a YAMLWhere and as a CompiledSourceMap."
+    source_map = YAMLWhere.from_string(request.module.SOURCE)
+    return source_map.compile() if request.param == "compiled" else source_map
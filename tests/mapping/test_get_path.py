@@ -94,7 +94,7 @@ class TestNested:
         r = self.source_map.get_range(Value("a"), Value("c"), Item("d"))
         assert self.source_map.get_path(r.start) == (
             Value("a"),
-            Key("c"),
+            Value("c"),
             Key("d"),
         )
 
@@ -103,7 +103,7 @@ class TestNested:
         r = self.source_map.get_range(Item("a"), Item("c"), Item("d"))
         assert self.source_map.get_path(r.start) == (
             Value("a"),
-            Key("c"),
+            Value("c"),
             Key("d"),
         )
 
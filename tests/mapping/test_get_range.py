@@ -1,6 +1,6 @@
 import pytest
 from yaml_where.path import Index, Item, Key, Value
-from yaml_where.range import Range
+from yaml_where.range import Position, Range
 from yaml_where.yaml_where import YAMLWhereMapping
 from yaml_where.testing.helpers import clean_yaml
 from yaml_where import YAMLWhere
@@ -65,7 +65,7 @@ def test_nested_missing_key():
 
 
 def test_constructor_checks_node_type():
-    with pytest.raises(ValueError):
+    with pytest.raises(TypeError):
         YAMLWhereMapping(None)
 
 
@@ -90,4 +90,60 @@ def test_with_index():
     """
     source_map = YAMLWhere.from_string(clean_yaml(yaml))
     with pytest.raises(UndefinedAccessError):
-        source_map.get_range(Index(0))
\ No newline at end of file
+        source_map.get_range(Index(0))
+
+
+def test_duplicate_keys_resolve_to_first_entry():
+    source_map = YAMLWhere.from_string("a: 1\nb: 2\na: 3")
+    assert source_map.get_range(Value("a")) == Range.from_parts(0, 3, 0, 4)
+
+
+def test_complex_key_does_not_prevent_lookup():
+    yaml = """
+    ? [1, 2]
+    : x
+    b: 42
+    """
+    source_map = YAMLWhere.from_string(clean_yaml(yaml))
+    assert source_map.get_range(Value("b")) == Range.from_parts(2, 3, 2, 5)
+
+    complex_key = source_map.node.value[0][0].value
+    assert source_map.get_range(Value(complex_key)) == Range.from_parts(1, 2, 1, 3)
+
+
+def test_unhashable_key_lookup():
+    source_map = YAMLWhere.from_string("a: 1")
+    with pytest.raises(MissingKeyError):
+        source_map.get_range(Value(["a"]))
+
+
+def test_nested_lookups_reuse_child_calculators():
+    yaml = """
+    a:
+        b: 42
+    """
+    source_map = YAMLWhere.from_string(clean_yaml(yaml))
+    source_map.get_range(Value("a"), Value("b"))
+    child = source_map._child(source_map.node.value[0][1])
+    assert child._key_index is not None
+    assert source_map.get_range(Value("a"), Value("b")) == Range.from_parts(1, 7, 1, 9)
+    assert source_map._child(source_map.node.value[0][1]) is child
+
+
+def test_calculators_are_shared_across_the_document():
+    yaml = """
+    a:
+        b:
+            c: 1
+    """
+    source_map = YAMLWhere.from_string(clean_yaml(yaml))
+    source_map.get_range(Value("a"), Value("b"), Value("c"))
+    source_map.get_path(Position(2, 11))
+    cache_size = len(source_map._cache)
+    source_map.get_range(Value("a"), Value("b"), Key("c"))
+    source_map.get_path(Position(2, 11))
+    assert len(source_map._cache) == cache_size
+
+    b_node = source_map.node.value[0][1].value[0][1]
+    a_child = source_map._child(source_map.node.value[0][1])
+    assert a_child._child(b_node) is source_map._child(b_node)
@@ -1,6 +1,9 @@
+import pytest
+from yaml_where.exceptions import NoSuchPathError
 from yaml_where.path import Index, Key, Value
 from yaml_where.testing.helpers import clean_yaml
 from yaml_where import YAMLWhere
+from yaml_where.range import Position
 
 
 class TestGetSeqInMap:
@@ -50,3 +53,46 @@ class TestGetMapInSeq:
         r = self.source_map.get_range(Index(1), Index(0), Value("c"))
         assert self.source_map.get_path(r.start) == (Index(1), Index(0), Value('c'))
 
+
+
+class TestAliases:
+    yaml = """
+    a: &x
+        - 1
+    b: *x
+    c: [*x, 2]
+    """
+    source_map = YAMLWhere.from_string(clean_yaml(yaml))
+
+    def test_anchor(self):
+        assert self.source_map.get_path(Position(1, 6)) == (Value("a"), Index(0))
+
+    def test_alias_in_sequence(self):
+        with pytest.raises(NoSuchPathError):
+            self.source_map.get_path(Position(3, 4))
+
+    def test_unresolvable_alias(self):
+        with pytest.raises(NoSuchPathError):
+            self.source_map.get_path(Position(2, 3))
+
+    def test_after_alias(self):
+        assert self.source_map.get_path(Position(3, 8)) == (Value("c"), Index(1))
+
+
+class TestEmptyValues:
+    yaml = """
+    a:
+    b:
+    c: 1
+    """
+    source_map = YAMLWhere.from_string(clean_yaml(yaml))
+
+    def test_key_after_empty_value(self):
+        assert self.source_map.get_path(Position(1, 0)) == (Key("b"),)
+
+    def test_value_after_empty_values(self):
+        assert self.source_map.get_path(Position(2, 3)) == (Value("c"),)
+
+    def test_separator(self):
+        with pytest.raises(NoSuchPathError):
+            self.source_map.get_path(Position(2, 1))
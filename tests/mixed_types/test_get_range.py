@@ -1,4 +1,5 @@
 from yaml_where.path import Index, Item, Value
+from yaml_where.range import Range
 from yaml_where.testing.helpers import clean_yaml, extent
 from yaml_where import YAMLWhere
 
@@ -42,3 +43,12 @@ class TestGetMapInSeq:
 
     def test_3(self):
         assert self.source_map.get_range(Index(1), Index(0), Item("c")) == extent(2, 4, 4)
+
+
+def test_item_whose_value_is_an_earlier_anchor():
+    # The value's range is the anchor's, which ends before the key starts, so the item's range is the key's
+    source_map = YAMLWhere.from_string("- &x {a: 1}\n- b: *x\n")
+    assert source_map.get_range(Index(1), Item("b")) == Range.from_parts(1, 2, 1, 3)
+    assert list(source_map.find_ranges([Index(1), Item("b")])) == [
+        ((Index(1), Item("b")), Range.from_parts(1, 2, 1, 3))
+    ]
@@ -12,4 +12,13 @@ def test_same_values():
     p1 = Position(0, 0)
     p2 = Position(0, 0)
     assert p1 == p2
-    assert p2 == p1
\ No newline at end of file
+    assert p2 == p1
+
+def test_other_types():
+    assert Position(0, 0) != (0, 0)
+    assert Position(0, 0) != "0:0"
+
+
+def test_hash():
+    assert hash(Position(1, 2)) == hash(Position(1, 2))
+    assert len({Position(1, 2), Position(1, 2), Position(2, 1)}) == 2
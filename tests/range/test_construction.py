@@ -1,5 +1,8 @@
+import pickle
+
 import pytest
-from yaml_where.range import Range
+from ruamel.yaml import YAML
+from yaml_where.range import Position, Range
 
 
 def test_range_beginning():
@@ -20,4 +23,27 @@ def test_range_beginning_with_arg():
 
 def test_positions_out_of_order():
     with pytest.raises(ValueError):
-        Range.from_parts(1, 1, 0, 0)
\ No newline at end of file
+        Range.from_parts(1, 1, 0, 0)
+
+def test_trusted_construction():
+    r = Range._trusted(Position(1, 2), Position(3, 4))
+    assert r == Range.from_parts(1, 2, 3, 4)
+    assert hash(r) == hash(Range.from_parts(1, 2, 3, 4))
+
+
+def test_from_node():
+    node = YAML(typ="rt").compose("a: [1, 2]\n")
+    assert Range.from_node(node.value[0][1]) == Range.from_parts(0, 3, 0, 9)
+
+
+def test_immutable():
+    r = Range.beginning()
+    with pytest.raises(AttributeError):
+        r.start = Position(1, 1)
+    with pytest.raises((AttributeError, TypeError)):
+        r.other = 1
+
+
+def test_pickle():
+    r = Range.from_parts(1, 2, 3, 4)
+    assert pickle.loads(pickle.dumps(r)) == r
@@ -33,5 +33,5 @@ def test_get_key():
 
 
 def test_constructor_checks_node_type():
-    with pytest.raises(ValueError):
+    with pytest.raises(TypeError):
         YAMLWhereScalar(None)
\ No newline at end of file
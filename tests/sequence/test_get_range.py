@@ -89,5 +89,5 @@ def test_get_non_integer_key():
 
 
 def test_constructor_checks_node_type():
-    with pytest.raises(ValueError):
+    with pytest.raises(TypeError):
         YAMLWhereSequence(None)
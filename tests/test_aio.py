@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from yaml_where import YAMLWhere
+from yaml_where.aio import LatestVersions, run_coalesced
+from yaml_where.exceptions import MissingKeyError, NoSuchPathError
+from yaml_where.path import Index, Key, Value
+from yaml_where.range import Position, Range
+
+YAML = "a: 1\nb: [x, y]\n"
+
+
+def test_afrom_string():
+    source_map = asyncio.run(YAMLWhere.afrom_string(YAML))
+    assert source_map.get_range(Value("b"), Index(1)) == Range.from_parts(1, 7, 1, 8)
+    assert source_map.source == YAML
+
+
+def test_afrom_string_with_executor():
+    with ThreadPoolExecutor(1) as executor:
+        source_map = asyncio.run(YAMLWhere.afrom_string(YAML, engine="c", executor=executor))
+    assert source_map.get_range(Key("a")) == Range.from_parts(0, 0, 0, 1)
+
+
+def test_concurrent_calls_are_coalesced():
+    async def main():
+        return await asyncio.gather(
+            YAMLWhere.afrom_string(YAML), YAMLWhere.afrom_string(YAML), YAMLWhere.afrom_string("c: 3\n")
+        )
+
+    first, second, other = asyncio.run(main())
+    assert first is second
+    assert other is not first
+
+
+def test_sequential_calls_are_not_coalesced():
+    async def main():
+        return await YAMLWhere.afrom_string(YAML), await YAMLWhere.afrom_string(YAML)
+
+    first, second = asyncio.run(main())
+    assert first is not second
+
+
+class Gate:
+    "A function which blocks its executor thread until it is released, counting its calls."
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, value):
+        self.calls += 1
+        self.started.set()
+        self.release.wait()
+        return value
+
+
+def test_cancelling_one_caller_keeps_the_call():
+    gate = Gate()
+
+    async def main():
+        first = asyncio.ensure_future(run_coalesced("key", None, gate, 42))
+        second = asyncio.ensure_future(run_coalesced("key", None, gate, 42))
+        await asyncio.to_thread(gate.started.wait)
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.release.set()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == (42, True)
+    assert gate.calls == 1
+
+
+def test_cancelling_every_caller_cancels_the_call():
+    gate = Gate()
+    queued = Gate()
+
+    async def main():
+        with ThreadPoolExecutor(1) as executor:
+            running = asyncio.ensure_future(run_coalesced("running", executor, gate, 1))
+            waiting = asyncio.ensure_future(run_coalesced("waiting", executor, queued, 2))
+            await asyncio.to_thread(gate.started.wait)
+            waiting.cancel()
+            while not waiting.done():
+                await asyncio.sleep(0)
+            # Lets the cancellation reach the executor
+            await asyncio.sleep(0)
+
+            # The cancelled call is started again by the next caller
+            again = asyncio.ensure_future(run_coalesced("waiting", executor, queued, 3))
+            gate.release.set()
+            queued.release.set()
+            return await running, await again, waiting.cancelled()
+
+    assert asyncio.run(main()) == (1, 3, True)
+    assert queued.calls == 1
+
+
+def test_errors_reach_every_caller():
+    def fail():
+        raise ValueError("failed")
+
+    async def main():
+        return await asyncio.gather(
+            run_coalesced("fail", None, fail), run_coalesced("fail", None, fail), return_exceptions=True
+        )
+
+    first, second = asyncio.run(main())
+    assert isinstance(first, ValueError) and first is second
+
+
+def test_aget_paths():
+    source_map = YAMLWhere.from_string(YAML)
+    paths = asyncio.run(source_map.aget_paths(iter([Position(1, 7), Position(5, 0)])))
+    assert paths[0] == (Value("b"), Index(1))
+    assert isinstance(paths[1], NoSuchPathError)
+
+
+def test_aget_ranges():
+    source_map = YAMLWhere.from_string(YAML)
+    ranges = asyncio.run(source_map.aget_ranges(iter([(Value("a"),), (Value("c"),)])))
+    assert ranges[0] == Range.from_parts(0, 3, 0, 4)
+    assert isinstance(ranges[1], MissingKeyError)
+
+
+class TestLatestVersions:
+    def test_newer_version_cancels_older(self):
+        async def main():
+            latest = LatestVersions()
+            old = asyncio.ensure_future(latest.run("doc", 1, asyncio.sleep(10, "old")))
+            await asyncio.sleep(0)
+            new = await latest.run("doc", 2, asyncio.sleep(0, "new"))
+            with pytest.raises(asyncio.CancelledError):
+                await old
+            return new, latest._tasks
+
+        assert asyncio.run(main()) == ("new", {})
+
+    def test_older_version_is_cancelled(self):
+        async def main():
+            latest = LatestVersions()
+            new = asyncio.ensure_future(latest.run("doc", 2, asyncio.sleep(0.01, "new")))
+            await asyncio.sleep(0)
+            with pytest.raises(asyncio.CancelledError):
+                await latest.run("doc", 1, asyncio.sleep(0, "old"))
+            return await new
+
+        assert asyncio.run(main()) == "new"
+
+    def test_documents_are_independent(self):
+        async def main():
+            latest = LatestVersions()
+            return await asyncio.gather(
+                latest.run("a", 1, YAMLWhere.afrom_string("a: 1\n")), latest.run("b", 1, asyncio.sleep(0, "b"))
+            )
+
+        source_map, other = asyncio.run(main())
+        assert source_map.get_range(Key("a")) == Range.from_parts(0, 0, 0, 1)
+        assert other == "b"
@@ -0,0 +1,82 @@
+import pytest
+from yaml_where import CompiledSourceMap, YAMLWhere
+from yaml_where.exceptions import MissingKeyError, NoSuchPathError, UndefinedAccessError
+from yaml_where.path import Index, Item, Key, Value
+from yaml_where.range import Position, Range
+from yaml_where.testing.helpers import clean_yaml, positions
+
+YAML = clean_yaml("""
+a:
+    b: 42
+    c:
+        - 4
+        - d: hola
+b: [1, 2]
+""")
+
+PATHS = [
+    (Value("a"), Value("c"), Index(1), Key("d")),
+    (Value("b"), Index(0)),
+    (Value("a"), Value("x"), Index(0)),
+    (Value("a"), Item("b")),
+    (Value("a"), Value("c"), Index(5)),
+    (Value("b"), Value("c")),
+    (Index(0), Index(1)),
+    (Value("a"), Value("b"), Value("c")),
+    (),
+    (Value("a"), Value("c"), Index(0)),
+]
+
+
+@pytest.fixture(params=[YAMLWhere.from_string, CompiledSourceMap.from_string])
+def source_map(request):
+    return request.param(YAML)
+
+
+def test_get_ranges(source_map):
+    results = source_map.get_ranges(PATHS)
+    assert results[0] == Range.from_parts(4, 10, 4, 11)
+    assert results[1] == Range.from_parts(5, 4, 5, 5)
+    assert isinstance(results[2], MissingKeyError)
+    assert results[3] == Range.from_parts(1, 4, 1, 9)
+    assert isinstance(results[4], MissingKeyError)
+    assert isinstance(results[5], UndefinedAccessError)
+    assert isinstance(results[6], UndefinedAccessError)
+    assert isinstance(results[7], UndefinedAccessError)
+    assert isinstance(results[8], UndefinedAccessError)
+    assert results[9] == Range.from_parts(3, 10, 3, 11)
+
+
+def test_get_ranges_matches_get_range(source_map):
+    for path, result in zip(PATHS, source_map.get_ranges(iter(PATHS))):
+        if isinstance(result, Range):
+            assert source_map.get_range(*path) == result
+        else:
+            with pytest.raises(type(result)):
+                source_map.get_range(*path)
+
+
+def test_get_ranges_empty(source_map):
+    assert source_map.get_ranges([]) == []
+
+
+def test_get_paths_matches_get_path(source_map):
+    all_positions = list(positions(YAML))[::-1]
+    for pos, result in zip(all_positions, source_map.get_paths(all_positions)):
+        if isinstance(result, tuple):
+            assert source_map.get_path(pos) == result
+        else:
+            assert isinstance(result, NoSuchPathError)
+            with pytest.raises(NoSuchPathError):
+                source_map.get_path(pos)
+
+
+def test_get_paths_in_scalar_document():
+    source_map = YAMLWhere.from_string("42")
+    assert source_map.get_paths([Position(0, 1), Position(0, 0)]) == [(), ()]
+
+
+def test_get_paths_in_null_document():
+    source_map = YAMLWhere.from_string("")
+    [result] = source_map.get_paths([Position(0, 0)])
+    assert isinstance(result, NoSuchPathError)
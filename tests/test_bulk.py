@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import pickle
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from ruamel.yaml.error import YAMLError
+from yaml_where import CompiledSourceMap, bulk, index_files
+from yaml_where.path import Index, Value
+from yaml_where.range import Range
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"doc{i}.yaml"
+        path.write_text(f"a: {i}\nb: [x, y]\n")
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_index_files(files, workers):
+    results = dict(index_files(files, workers=workers))
+    assert set(results) == set(files)
+    for path, source_map in results.items():
+        assert isinstance(source_map, CompiledSourceMap)
+        assert source_map.filename == str(path)
+        assert source_map.get_range(Value("b"), Index(1)) == Range.from_parts(1, 7, 1, 8)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_errors_are_reported_per_file(files, tmp_path, workers):
+    invalid = tmp_path / "invalid.yaml"
+    invalid.write_text("a: [1\n")
+    missing = tmp_path / "missing.yaml"
+
+    results = dict(index_files([invalid, *files, missing], workers=workers))
+    assert isinstance(results[invalid], YAMLError)
+    assert isinstance(results[missing], FileNotFoundError)
+    assert all(isinstance(results[path], CompiledSourceMap) for path in files)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_other_errors_are_raised(files, workers):
+    with pytest.raises(TypeError):
+        list(index_files([*files, None], workers=workers))
+
+
+def _index_or_crash(path, engine):
+    if path.name == "crash.yaml":
+        os._exit(1)
+    return _index_file(path, engine)
+
+
+_index_file = bulk._index_file
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="Workers must be forked")
+def test_files_are_indexed_after_a_worker_dies(files, tmp_path, monkeypatch):
+    # Forked workers inherit the patched module, while spawned workers would import it afresh
+    monkeypatch.setattr(bulk, "_index_file", _index_or_crash)
+    crash = tmp_path / "crash.yaml"
+    results = dict(index_files([crash, *files], workers=1, mp_context=multiprocessing.get_context("fork")))
+    assert set(results) == {crash, *files}
+    assert isinstance(results[crash], BrokenProcessPool)
+    assert all(isinstance(results[path], (CompiledSourceMap, BrokenProcessPool)) for path in files)
+    assert isinstance(results[files[-1]], CompiledSourceMap)
+
+
+def test_lazy_paths(files):
+    assert len(list(index_files(iter(files * 3), workers=1))) == 30
+
+
+def test_default_workers(files):
+    assert len(list(index_files(files[:2]))) == 2
+
+
+def test_non_utf8_file(tmp_path):
+    path = tmp_path / "utf16.yaml"
+    path.write_text("a: [1, 2]\n", encoding="utf-16")
+    [(_, source_map)] = index_files([path], workers=0, engine="c")
+    assert source_map.get_range(Value("a"), Index(1)) == Range.from_parts(0, 7, 0, 8)
+
+
+def test_invalid_arguments(files):
+    with pytest.raises(ValueError):
+        list(index_files(files, workers=-1))
+    with pytest.raises(ValueError):
+        list(index_files(files, engine="rust"))
+
+
+def test_pickle():
+    source_map = CompiledSourceMap.from_string("a: 1\nb: [x, y]\n")
+    source_map.filename = "doc.yaml"
+    copy = pickle.loads(pickle.dumps(source_map))
+    assert copy.filename == "doc.yaml"
+    assert copy.get_range(Value("b"), Index(1)) == Range.from_parts(1, 7, 1, 8)
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+from yaml_where import CacheStats, SourceMapCache
+from yaml_where.cache import default_cache
+from yaml_where.path import Value
+from yaml_where.range import Range
+
+
+def test_hit_for_same_content():
+    cache = SourceMapCache()
+    first = cache.from_string("a: 1\n")
+    second = cache.from_string("a: " + "1\n")
+    assert second is first
+    assert cache.stats == CacheStats(hits=1, misses=1, evictions=0, entries=1, size=5)
+
+
+def test_miss_for_different_content():
+    cache = SourceMapCache()
+    first = cache.from_string("a: 1\n")
+    second = cache.from_string("a: 2\n")
+    assert second is not first
+    assert second.get_range(Value("a")) == Range.from_parts(0, 3, 0, 4)
+    assert cache.stats.misses == 2
+
+
+def test_entry_bound_evicts_least_recently_used():
+    cache = SourceMapCache(max_entries=2)
+    a = cache.from_string("a: 1")
+    cache.from_string("b: 1")
+    cache.from_string("a: 1")
+    cache.from_string("c: 1")
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+    assert cache.from_string("a: 1") is a
+    cache.from_string("b: 1")
+    assert cache.stats.misses == 4
+
+
+def test_size_bound():
+    cache = SourceMapCache(max_size=10)
+    cache.from_string("a: 1")
+    cache.from_string("b: 1")
+    cache.from_string("c: 1")
+    assert cache.stats.size == 8
+    assert cache.stats.evictions == 1
+
+
+def test_oversized_sources_are_not_cached():
+    cache = SourceMapCache(max_size=3)
+    cache.from_string("a: 1")
+    assert len(cache) == 0
+
+
+def test_zero_entries_disables_caching():
+    cache = SourceMapCache(max_entries=0)
+    cache.from_string("a: 1")
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("kwargs", [{"max_entries": -1}, {"max_size": -1}])
+def test_invalid_bounds(kwargs):
+    with pytest.raises(ValueError):
+        SourceMapCache(**kwargs)
+
+
+def test_clear():
+    cache = SourceMapCache()
+    cache.from_string("a: 1")
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats.size == 0
+    assert cache.stats.misses == 1
+
+
+def test_from_path(tmp_path):
+    cache = SourceMapCache()
+    path = tmp_path / "doc.yaml"
+    path.write_text("a: 1\n")
+    first = cache.from_path(path)
+    assert cache.from_path(str(path)) is first
+
+    path.write_text("a: 22\n")
+    second = cache.from_path(path)
+    assert second is not first
+    assert second.get_range(Value("a")) == Range.from_parts(0, 3, 0, 5)
+
+
+def test_from_path_unchanged_size(tmp_path):
+    cache = SourceMapCache()
+    path = tmp_path / "doc.yaml"
+    path.write_text("a: 1\n")
+    first = cache.from_path(path)
+
+    path.write_text("a: 2\n")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.from_path(path) is not first
+    assert cache.stats.evictions == 0
+
+
+def test_default_cache():
+    assert isinstance(default_cache, SourceMapCache)
+
+
+def test_concurrently_built_entries_are_kept_once():
+    cache = SourceMapCache()
+    first = cache.from_string("a: 1")
+    cache._put(next(iter(cache._entries)), object(), 4)
+    assert cache.from_string("a: 1") is first
+    assert cache.stats.size == 4
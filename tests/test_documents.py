@@ -0,0 +1,47 @@
+import io
+
+import pytest
+from ruamel.yaml.error import YAMLError
+from yaml_where import YAMLWhere
+from yaml_where.path import Index, Key, Value
+from yaml_where.range import Position, Range
+from yaml_where.testing.helpers import clean_yaml
+
+YAML = clean_yaml("""
+a: 1
+---
+- x
+- y
+---
+b:
+    c: 2
+""")
+
+
+def test_each_document_gets_a_source_map():
+    source_maps = list(YAMLWhere.iter_documents(YAML))
+    assert len(source_maps) == 3
+
+
+def test_positions_are_absolute():
+    first, second, third = YAMLWhere.iter_documents(YAML)
+    assert first.get_range(Value("a")) == Range.from_parts(0, 3, 0, 4)
+    assert second.get_range(Index(1)) == Range.from_parts(3, 2, 3, 3)
+    assert third.get_range(Value("b"), Key("c")) == Range.from_parts(6, 4, 6, 5)
+    assert third.get_path(Position(6, 7)) == (Value("b"), Value("c"))
+
+
+def test_from_stream():
+    source_maps = list(YAMLWhere.iter_documents(io.StringIO(YAML)))
+    assert source_maps[1].get_range(Index(0)) == Range.from_parts(2, 2, 2, 3)
+
+
+def test_documents_are_composed_lazily():
+    documents = YAMLWhere.iter_documents("a: 1\n---\n[unclosed")
+    assert next(documents).get_range(Key("a")) == Range.from_parts(0, 0, 0, 1)
+    with pytest.raises(YAMLError):
+        next(documents)
+
+
+def test_empty_stream():
+    assert list(YAMLWhere.iter_documents("")) == []
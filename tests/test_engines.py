@@ -0,0 +1,129 @@
+"""Check that the "c" engine produces the same source maps as the "python" engine."""
+
+import pytest
+from ruamel.yaml import YAML
+from ruamel.yaml.composer import ComposerError
+from yaml_where import CompiledSourceMap, YAMLWhere, engines
+from yaml_where.path import Key, Value
+from yaml_where.range import Position, Range
+
+requires_c = pytest.mark.skipif(not engines.c_engine_available(), reason="libyaml is not installed")
+
+DOCUMENTS = [
+    "42",
+    "a: 1\nb: [1, {c: d}]\n",
+    "a:\n  b: 42\n  c:\n    - 4\n    - d: hola\n      e: [1, {f: 2}]\n",
+    "- a: 1\n  b:\n- [{c: 3}]\n-\n- |\n  block\n  scalar\n",
+    "? - complex\n  - key\n: value\n? {x: y}\n? [[nested]]\n: 1\n",
+    "- &x {a: 1}\n- *x\n- b: *x\n- {*x : 2}\n",
+    "a: &y 1\nb: &x [*y]\nc: &y 2\nd: *x\n",
+    "- &s !tag x\n- *s\n- !!map {a: 1}\n",
+    "---\na: 'single'\nb: \"double\"\nc: >-\n  folded\n...\n",
+    "a: 1\r\nb:\r\n  - x\r\n",
+    "\ufeffa: 1\nb: 2",
+    "a: caf\u00e9 \U0001f600\nb: [\u00e9]\n",
+    # Empty mapping values, which the parsers place differently
+    "a:\nb:\n",
+    "a:",
+    "a:   \nb:",
+    "a:  # comment\nb: 1\n",
+    "a:\n# comment\nb:\n",
+    "a:  # comment\n\n# trailing",
+    "x:\n  a:\n  b: 1\nc:\n",
+    "a:\n? b\n: c\n",
+    "{a: , b: }",
+    "[a: ]",
+    "{a: 1, b:\n}",
+    "{a, b: c, d }",
+    "? {x: y}\n? [[nested]]\n: 1\n",
+    "- a:\n  ? b\n  : c\n",
+    "&m\nk: &v\nl:\n",
+]
+
+FALLBACKS = [
+    # YAML 1.1 line breaks
+    "a: x\x85y\n",
+    "a: x\u2028y\n",
+    # Byte order marks after the start
+    "a: [1,\n\ufeff 2]\n",
+    # Errors, which the "python" engine reports
+    "a: 1\n---\nb: 2\n",
+    "a: *x\n",
+    "a: [1\n",
+    # Empty values which libyaml doesn't place unambiguously
+    "a:\n?\n  b\n: c\n",
+]
+
+
+def _columns(source_map: CompiledSourceMap):
+    return (
+        bytes(source_map._kinds),
+        list(source_map._parents),
+        source_map._keys,
+        list(source_map._key_spans),
+        list(source_map._value_spans),
+        list(source_map._child_offsets),
+        list(source_map._child_counts),
+        list(source_map._children),
+        bytes(source_map._ordered),
+    )
+
+
+def _compiled(source: str, engine: str):
+    return CompiledSourceMap.from_node(engines.compose(source, engine))
+
+
+@requires_c
+@pytest.mark.parametrize("source", DOCUMENTS)
+@pytest.mark.filterwarnings("ignore::ruamel.yaml.error.ReusedAnchorWarning")
+def test_same_as_python(source):
+    # The document is parsed by libyaml, rather than falling back
+    engines._compose_c(source)
+    assert _columns(_compiled(source, "c")) == _columns(_compiled(source, "python"))
+
+
+@requires_c
+@pytest.mark.parametrize("source", FALLBACKS[:3] + FALLBACKS[-1:])
+def test_falls_back(source):
+    assert _columns(_compiled(source, "c")) == _columns(_compiled(source, "python"))
+
+
+@pytest.mark.parametrize("source", FALLBACKS[3:5])
+def test_errors_from_python_engine(source):
+    with pytest.raises(ComposerError):
+        engines.compose(source, "c")
+
+
+def test_empty_source():
+    assert engines.compose("", "c") is None
+
+
+def test_bytes_source():
+    assert _columns(_compiled(b"a: [1]\n", "c")) == _columns(_compiled("a: [1]\n", "python"))
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        engines.compose("a: 1", "rust")
+    with pytest.raises(ValueError):
+        CompiledSourceMap.from_string("a: 1", engine="rust")
+
+
+def test_from_string():
+    source = "a:\n  b: [1, 2]\nc:\n"
+    source_map = YAMLWhere.from_string(source, engine="c")
+    assert source_map.get_range(Value("c")) == YAMLWhere.from_string(source).get_range(Value("c"))
+    assert source_map.get_path(Position(1, 9)) == YAMLWhere.from_string(source).get_path(Position(1, 9))
+
+
+def test_compiled_from_string():
+    source = "a:\n  b: [1, 2]\nc:\n"
+    assert _columns(CompiledSourceMap.from_string(source, engine="c")) == _columns(
+        CompiledSourceMap.from_node(YAML(typ="rt").compose(source))
+    )
+
+
+def test_apply_edit():
+    source_map = YAMLWhere.from_string("a:\n  b: 1\nc: 2\n", engine="c")
+    updated = source_map.apply_edit(Range(Position(1, 5), Position(1, 6)), "[1,\n    2]")
+    assert updated.get_range(Key("c")) == Range(Position(3, 0), Position(3, 1))
@@ -0,0 +1,54 @@
+import io
+
+from yaml_where import YAMLWhere
+from yaml_where.path import Index, Value
+from yaml_where.range import Range
+
+
+def test_from_path(tmp_path):
+    path = tmp_path / "doc.yaml"
+    path.write_text("a: 1\nb: [x, y]\n")
+    source_map = YAMLWhere.from_path(path)
+    assert source_map.get_range(Value("b"), Index(1)) == Range.from_parts(1, 7, 1, 8)
+    assert source_map.filename == str(path)
+
+
+def test_from_path_with_str(tmp_path):
+    path = tmp_path / "doc.yaml"
+    path.write_text("a: 1\n")
+    assert YAMLWhere.from_path(str(path)).filename == str(path)
+
+
+def test_from_path_non_ascii(tmp_path):
+    path = tmp_path / "doc.yaml"
+    path.write_text("ä: ö\nb: 2\n", encoding="utf-8")
+    source_map = YAMLWhere.from_path(path)
+    assert source_map.get_range(Value("ä")) == Range.from_parts(0, 3, 0, 4)
+    assert source_map.get_range(Value("b")) == Range.from_parts(1, 3, 1, 4)
+
+
+def test_from_empty_path(tmp_path):
+    path = tmp_path / "empty.yaml"
+    path.write_text("")
+    assert YAMLWhere.from_path(path).filename == str(path)
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / "doc.yaml"
+    path.write_text("a: 1\n")
+    with open(path) as stream:
+        source_map = YAMLWhere.from_file(stream)
+    assert source_map.get_range(Value("a")) == Range.from_parts(0, 3, 0, 4)
+    assert source_map.filename == str(path)
+
+
+def test_from_unnamed_file():
+    source_map = YAMLWhere.from_file(io.StringIO("a: 1\n"))
+    assert source_map.get_range(Value("a")) == Range.from_parts(0, 3, 0, 4)
+    assert source_map.filename is None
+
+
+def test_compile_keeps_filename(tmp_path):
+    path = tmp_path / "doc.yaml"
+    path.write_text("a: 1\n")
+    assert YAMLWhere.from_path(path).compile().filename == str(path)
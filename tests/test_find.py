@@ -0,0 +1,159 @@
+import pytest
+from yaml_where import CompiledSourceMap, YAMLWhere
+from yaml_where.path import AnyIndex, AnyKey, Descendants, Index, Item, Key, Value
+from yaml_where.range import Range
+
+SOURCE = """\
+spec:
+  containers:
+    - name: app
+      image: app:1
+    - name: sidecar
+      image: proxy:2
+  init: {image: busybox}
+image: top
+"""
+
+
+def find(source_map, *pattern):
+    return list(source_map.find_ranges(pattern))
+
+
+def test_concrete_pattern_matches_get_range(source_map):
+    path = (Value("spec"), Value("containers"), Index(1), Value("image"))
+    assert find(source_map, *path) == [(path, source_map.get_range(*path))]
+
+
+def test_descendants(source_map):
+    assert [path for path, _ in find(source_map, Descendants(), Value("image"))] == [
+        (Value("spec"), Value("containers"), Index(0), Value("image")),
+        (Value("spec"), Value("containers"), Index(1), Value("image")),
+        (Value("spec"), Value("init"), Value("image")),
+        (Value("image"),),
+    ]
+
+
+def test_descendants_ranges(source_map):
+    for path, rng in find(source_map, Descendants(), AnyKey(Key)):
+        assert rng == source_map.get_range(*path)
+
+
+def test_descendants_matches_every_element(source_map):
+    paths = [path for path, _ in find(source_map, Descendants())]
+    assert paths[:3] == [(), (Value("spec"),), (Value("spec"), Value("containers"))]
+    assert len(paths) == 12
+
+
+def test_any_index(source_map):
+    assert find(source_map, Value("spec"), Value("containers"), AnyIndex(), Value("name")) == [
+        ((Value("spec"), Value("containers"), Index(0), Value("name")), Range.from_parts(2, 12, 2, 15)),
+        ((Value("spec"), Value("containers"), Index(1), Value("name")), Range.from_parts(4, 12, 4, 19)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "component, expected",
+    [
+        (Value, Range.from_parts(6, 16, 6, 23)),
+        (Key, Range.from_parts(6, 9, 6, 14)),
+        (Item, Range.from_parts(6, 9, 6, 23)),
+    ],
+)
+def test_any_key(source_map, component, expected):
+    assert find(source_map, Value("spec"), Value("init"), AnyKey(component)) == [
+        ((Value("spec"), Value("init"), component("image")), expected)
+    ]
+
+
+def test_terminal_item(source_map):
+    assert find(source_map, Value("spec"), Item("init")) == [
+        ((Value("spec"), Item("init")), Range.from_parts(6, 2, 6, 24))
+    ]
+
+
+def test_negative_index_is_normalized(source_map):
+    assert [path for path, _ in find(source_map, Value("spec"), Value("containers"), Index(-1))] == [
+        (Value("spec"), Value("containers"), Index(1))
+    ]
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        (Value("missing"),),
+        (Value("spec"), Value("containers"), Index(2)),
+        (Index(0),),
+        (AnyIndex(),),
+        (Value("image"), AnyKey()),
+        (Value("image"), Value("x")),
+        (Descendants(), Value("image"), Descendants(), Index(0)),
+    ],
+)
+def test_no_matches(source_map, pattern):
+    assert find(source_map, *pattern) == []
+
+
+def test_matches_are_lazy():
+    source_map = YAMLWhere.from_string(SOURCE)
+    matches = source_map.find_ranges([Descendants(), Value("image")])
+    assert next(matches)[0] == (Value("spec"), Value("containers"), Index(0), Value("image"))
+
+
+@pytest.mark.parametrize("source_map", [YAMLWhere.from_string(""), CompiledSourceMap.from_string("")])
+def test_empty_document(source_map):
+    assert find(source_map, Descendants()) == []
+
+
+@pytest.mark.parametrize("factory", [YAMLWhere.from_string, CompiledSourceMap.from_string])
+def test_complex_keys_are_skipped(factory):
+    source_map = factory("? [a]\n: 1\nb: 2\n")
+    assert [path for path, _ in find(source_map, AnyKey())] == [(Value("b"),)]
+    assert [path for path, _ in find(source_map, Descendants())] == [(), (Value("b"),)]
+
+
+@pytest.mark.parametrize("factory", [YAMLWhere.from_string, CompiledSourceMap.from_string])
+def test_recursive_aliases(factory):
+    source_map = factory("a: &x [1, *x]\n")
+    assert [path for path, _ in find(source_map, Descendants())] == [
+        (),
+        (Value("a"),),
+        (Value("a"), Index(0)),
+        (Value("a"), Index(1)),
+    ]
+
+
+def test_any_key_str():
+    assert str(AnyKey()) == "value/*"
+    assert str(AnyKey(Item)) == "item/*"
+    assert str(AnyIndex()) == "index/*"
+    assert str(Descendants()) == "**"
+
+
+def test_wildcards_compare_by_type():
+    assert AnyKey() == AnyKey(Value)
+    assert AnyKey() != AnyKey(Key)
+    assert AnyIndex() == AnyIndex()
+    assert Descendants() != AnyIndex()
+    assert len({AnyKey(), AnyKey(Value), AnyIndex(), Descendants()}) == 3
+
+
+def test_any_key_requires_item_type():
+    with pytest.raises(TypeError):
+        AnyKey(Index)
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        (Descendants(),),
+        (Descendants(), AnyKey(Item)),
+        (Descendants(), AnyIndex(), Descendants()),
+        (AnyKey(), Descendants(), Index(-1)),
+        (Descendants(), Value("a"), Descendants(), Value("c")),
+    ],
+)
+def test_compiled_matches(pattern):
+    source = "a:\n  b: [1, {c: 2}]\n  c: [[3], {a: {c: 4}}]\nd: {a: [5]}\n"
+    expected = list(YAMLWhere.from_string(source).find_ranges(pattern))
+    assert expected
+    assert list(CompiledSourceMap.from_string(source).find_ranges(pattern)) == expected
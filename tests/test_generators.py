@@ -0,0 +1,33 @@
+import pytest
+from yaml_where import YAMLWhere
+from yaml_where.path import Index, Value
+from yaml_where.testing import documents
+
+
+def test_wide_mapping():
+    source_map = YAMLWhere.from_string(documents.wide_mapping(3))
+    assert source_map.get_text(Value("key_2")) == "value 2"
+
+
+@pytest.mark.parametrize("flow", [False, True])
+def test_long_sequence(flow):
+    source_map = YAMLWhere.from_string(documents.long_sequence(3, flow=flow))
+    assert source_map.get_text(Index(-1)) == "item 2"
+
+
+def test_deep_nesting():
+    source_map = YAMLWhere.from_string(documents.deep_nesting(3))
+    assert source_map.get_text(Value("level_0"), Value("level_1"), Value("level_2"), Value("leaf")) == "bottom"
+    assert source_map.get_text(Value("level_0"), Value("sibling_1")) == "1"
+
+
+def test_block_scalar():
+    source = documents.block_scalar(2, width=30)
+    assert YAMLWhere.from_string(source).get_text(Value("after")) == "2"
+    assert source.splitlines()[2] == "  lorem ipsum dolor sit amet lor"
+
+
+def test_document_stream():
+    source_maps = list(YAMLWhere.iter_documents(documents.document_stream(3, width=2)))
+    assert len(source_maps) == 3
+    assert source_maps[2].get_range(Value("key_1")).start.line == 8
@@ -0,0 +1,192 @@
+import pytest
+from yaml_where import YAMLWhere
+from yaml_where.exceptions import YAMLWhereException
+from yaml_where.lines import LineIndex
+from yaml_where.path import Index, Key, Value
+from yaml_where.range import Position, Range
+from yaml_where.testing.helpers import clean_yaml, positions
+
+YAML = clean_yaml("""
+a: 1
+b:
+  c: 2
+  d:
+    - x
+    - y: 3
+      z: 4
+e: [1, 2]
+f: end
+""")
+
+
+def edit(source: str, start: int, end: int, text: str):
+    "Apply an edit, given by offsets, and check the result against a source map built from the edited source."
+    source_map = YAMLWhere.from_string(source)
+    lines = LineIndex(source)
+    updated = source_map.apply_edit(Range(lines.position(start), lines.position(end)), text)
+
+    expected = YAMLWhere.from_string(source[:start] + text + source[end:])
+    assert updated.source == expected.source
+    for pos in positions(expected.source):
+        assert _path(updated, pos) == _path(expected, pos)
+    assert list(updated.walk()) == list(expected.walk())
+    return source_map, updated
+
+
+def _path(source_map, pos):
+    try:
+        return source_map.get_path(pos)
+    except YAMLWhereException as err:
+        return type(err)
+
+
+def test_edit_of_scalar_is_applied_in_place():
+    start = YAML.index("3")
+    source_map, updated = edit(YAML, start, start + 1, "300")
+    assert updated is source_map
+    assert updated.get_range(Value("b"), Value("d"), Index(1), Value("y")) == Range.from_parts(5, 9, 5, 12)
+
+
+def test_lines_after_edit_are_shifted():
+    start = YAML.index("c: 2") + 4
+    source_map, updated = edit(YAML, start, start, "\n  new: 5\n  more: 6")
+    assert updated is source_map
+    assert updated.get_range(Value("b"), Key("new")) == Range.from_parts(3, 2, 3, 5)
+    assert updated.get_range(Value("f")) == Range.from_parts(10, 3, 10, 6)
+    assert updated.get_path(Position(10, 4)) == (Value("f"),)
+
+
+def test_lines_can_be_removed():
+    start = YAML.index("    - y")
+    end = YAML.index("e:")
+    source_map, updated = edit(YAML, start, end, "")
+    assert updated is source_map
+    assert updated.get_range(Key("e")) == Range.from_parts(5, 0, 5, 1)
+
+
+def test_edits_can_be_chained():
+    source_map = YAMLWhere.from_string(YAML)
+    updated = source_map.apply_edit(Range.from_parts(0, 3, 0, 4), "one")
+    updated = updated.apply_edit(Range.from_parts(6, 10, 6, 10), "\n    - w")
+    assert updated is source_map
+    assert updated.get_range(Value("a")) == Range.from_parts(0, 3, 0, 6)
+    assert updated.get_range(Value("b"), Value("d"), Index(2)) == Range.from_parts(7, 6, 7, 7)
+
+
+def test_edit_of_last_entry():
+    source = "a:\n  b: 1\n  c: 2"
+    source_map, updated = edit(source, len(source), len(source), "345\n  d: [6]")
+    assert updated is source_map
+    assert updated.get_range(Value("a")) == Range.from_parts(1, 2, 3, 8)
+
+
+def test_edit_of_first_entry_on_line_of_parent():
+    source = "- a: 1\n  b: 2\n- c\n"
+    source_map, updated = edit(source, 2, 2, "z: 0\n  ")
+    assert updated is source_map
+    assert updated.get_range(Index(0), Key("a")) == Range.from_parts(1, 2, 1, 3)
+
+
+def test_edit_before_nested_collection():
+    source_map, updated = edit("- a: 1\n  b: 2\n", 0, 1, "-")
+    assert updated is source_map
+
+
+def test_edit_of_null_value():
+    source = "a:\nb: 1\n"
+    source_map, updated = edit(source, 2, 2, " 0")
+    assert updated is source_map
+
+
+def test_edit_after_empty_collection():
+    source_map, updated = edit("a: {}\nb: 1\n", 9, 10, "2")
+    assert updated is source_map
+
+
+def test_edit_of_flow_collection_in_block_entry():
+    start = YAML.index("[1") + 1
+    source_map, updated = edit(YAML, start, start + 1, "3, 4")
+    assert updated is source_map
+
+
+def test_edit_of_comment_between_entries():
+    source_map, updated = edit("a:\n  b: 1\n# comment\nc: 2\n", 12, 12, "x")
+    assert updated is source_map
+
+
+def test_edit_of_block_scalar_which_ends_an_entry():
+    source = "x:\n  z: |+\n    keep\n\n  w: 2\n"
+    _, updated = edit(source, 20, 21, "")
+    assert updated.get_range(Value("x"), Value("z")) == Range.from_parts(1, 5, 3, 0)
+
+
+def test_edit_which_dedents_entry_is_applied_to_parent():
+    source = "a:\n  b: 1\n  c: 2\n"
+    source_map, updated = edit(source, 10, 12, "")
+    assert updated is source_map
+    assert updated.get_range(Value("c")) == Range.from_parts(2, 3, 2, 4)
+
+
+@pytest.mark.parametrize(
+    "source, start, end, text",
+    [
+        # Edits which change the type of the root
+        ("a: 1\nb: 2\n", 0, 10, "- 1\n"),
+        # Edits which could be mistaken for the end of the document
+        ("a: 1\nb: 2\n", 5, 5, "---x: 3\n"),
+        # Edits which don't parse on their own
+        ("a: &x 1\nb: 2\n", 11, 12, "*x"),
+        # Edits which run into the next line
+        ("- 1\n- 2\n", 2, 4, "1\n  "),
+        # Edits of anchors, anchored nodes and nodes before aliases
+        ("a: &x 1\nb: *x\n", 6, 7, "2"),
+        ("a: 1\nb: 2\n", 8, 9, "&x 3"),
+        ("a: 1\nb: &x 2\nc: *x\n", 3, 4, "5"),
+        # Entries which don't start their line
+        ("? a\n: 1\nb: 2\n", 2, 3, "z"),
+        ("a: 1\n? b\n: 2\n", 1, 1, "z"),
+        ("- # comment\n  a: 1\n", 17, 18, "2"),
+        ("- a\n- # comment\n  b\n", 2, 3, "z"),
+        # Edits of entries ending in values which are placed by what follows them
+        ("a:  # comment\nb: 1\n", 1, 1, "x"),
+        ("a:  # comment\nb: 1\n", 14, 15, ""),
+        # Edits before the first entry
+        ("# comment\na: 1\n", 0, 1, "##"),
+        # Documents without block collections
+        ("[1, 2]", 1, 2, "3"),
+        ("1", 0, 1, "a: 2"),
+        ("", 0, 0, "a: 2"),
+    ],
+)
+def test_edit_that_can_not_be_isolated_rebuilds_the_source_map(source, start, end, text):
+    source_map, updated = edit(source, start, end, text)
+    assert updated is not source_map
+
+
+def test_rebuilt_source_map_keeps_filename():
+    source_map = YAMLWhere.from_string(YAML)
+    source_map.filename = "config.yaml"
+    updated = source_map.apply_edit(Range(Position(0, 0), Position(len(YAML.splitlines()) - 1, 6)), "- 1")
+    assert updated.filename == "config.yaml"
+
+
+def test_rebuild_leaves_source_map_unchanged():
+    source_map = YAMLWhere.from_string("a: 1\nb: 2\n")
+    source_map.apply_edit(Range.from_parts(0, 0, 2, 0), "- 1\n")
+    assert source_map.get_path(Position(1, 3)) == (Value("b"),)
+
+    updated = source_map.apply_edit(Range.from_parts(1, 3, 1, 4), "3")
+    assert updated is source_map
+    assert updated.source == "a: 1\nb: 3\n"
+
+
+def test_source_map_without_source_can_not_be_edited():
+    source_map = YAMLWhere.from_string(YAML.encode())
+    with pytest.raises(ValueError):
+        source_map.apply_edit(Range.from_parts(0, 0, 0, 0), "")
+
+
+def test_edit_outside_source():
+    source_map = YAMLWhere.from_string(YAML)
+    with pytest.raises(ValueError):
+        source_map.apply_edit(Range.from_parts(20, 0, 20, 0), "")
@@ -0,0 +1,227 @@
+import logging
+import threading
+
+import pytest
+from yaml_where import CompiledSourceMap, LazySourceMap, YAMLWhere, instrumentation
+from yaml_where.exceptions import MissingKeyError, NoSuchPathError
+from yaml_where.instrumentation import COMPOSE, INDEX, PARSE, QUERY, Instrumentation, Measurement, instrumented
+from yaml_where.path import Index, Key, Value
+from yaml_where.range import Position, Range
+from yaml_where.yaml_where import YAMLWhereMapping
+
+SOURCE = "a: 1\nb:\n  c: [x, y]\n"
+
+
+@pytest.fixture(params=[YAMLWhere, CompiledSourceMap])
+def source_map_type(request):
+    return request.param
+
+
+def test_disabled_by_default():
+    assert instrumentation.active is None
+
+
+def test_phases_are_measured(source_map_type):
+    measurements = []
+    with instrumented(callback=measurements.append) as inst:
+        source_map = source_map_type.from_string(SOURCE)
+        source_map.get_range(Value("b"), Value("c"), Index(1))
+        source_map.get_path(Position(2, 6))
+
+    assert instrumentation.active is None
+    stats = inst.stats()
+    assert stats.phases[COMPOSE].count >= 1
+    assert stats.phases[INDEX].count >= 1
+    assert stats.phases[QUERY].count == 2
+    assert stats.phases[QUERY].seconds > 0
+    assert sum(phase.count for phase in stats.phases.values()) == len(measurements)
+
+    queries = [measurement for measurement in measurements if measurement.phase == QUERY]
+    assert [(query.operation, query.detail) for query in queries] == [
+        ("get_range", (Value("b"), Value("c"), Index(1))),
+        ("get_path", Position(2, 6)),
+    ]
+    assert [query.nodes_visited for query in queries] == [3, 4]
+    assert stats.nodes_visited == 7
+
+
+def test_parse_phase():
+    with instrumented() as inst:
+        YAMLWhere.from_string(SOURCE)
+    assert inst.stats().phases[PARSE].count == 1
+
+
+def test_batch_queries(source_map_type):
+    measurements = []
+    source_map = source_map_type.from_string(SOURCE)
+    with instrumented(callback=measurements.append):
+        source_map.get_ranges([(Key("a"),), (Value("b"), Value("c"))])
+        source_map.get_paths([Position(0, 0), Position(2, 7)])
+
+    queries = [(m.operation, m.detail) for m in measurements if m.phase == QUERY]
+    assert queries == [("get_ranges", 2), ("get_paths", 2)]
+
+
+def test_failed_queries_are_measured(source_map_type):
+    source_map = source_map_type.from_string(SOURCE)
+    with instrumented() as inst, pytest.raises(MissingKeyError):
+        source_map.get_range(Value("missing"))
+    assert inst.stats().phases[QUERY].count == 1
+
+
+def test_linear_scans_count_visits():
+    # The alias makes the spans of the sequence out of order, so they are scanned
+    source_map = YAMLWhere.from_string("- &x [1, 2]\n- a\n- *x\n")
+    compiled = source_map.compile()
+    for query in (source_map, compiled):
+        with instrumented() as inst:
+            query.get_path(Position(1, 2))
+        assert inst.stats().nodes_visited == 4
+
+        with instrumented() as inst, pytest.raises(NoSuchPathError):
+            query.get_path(Position(5, 0))
+        assert inst.stats().nodes_visited == 4
+
+
+def test_line_index_is_measured():
+    source_map = YAMLWhere.from_string(SOURCE)
+    with instrumented() as inst:
+        source_map.get_text(Value("a"))
+    assert inst.stats().phases[INDEX].count >= 1
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_slow_queries_are_logged():
+    source_map = YAMLWhere.from_string(SOURCE)
+    records = Records()
+    logging.getLogger("yaml_where.instrumentation").addHandler(records)
+    try:
+        with instrumented(slow_query_threshold=0) as inst:
+            source_map.get_range(Key("a"))
+    finally:
+        logging.getLogger("yaml_where.instrumentation").removeHandler(records)
+    assert inst.stats().slow_queries == 1
+    assert len(records.messages) == 1
+    assert records.messages[0].startswith("Slow query get_range((Key(value=a),))")
+
+
+def test_fast_queries_are_not_logged():
+    source_map = YAMLWhere.from_string(SOURCE)
+    with instrumented(slow_query_threshold=60) as inst:
+        source_map.get_range(Key("a"))
+    assert inst.stats().slow_queries == 0
+
+
+def test_enable_and_disable():
+    inst = instrumentation.enable()
+    try:
+        assert instrumentation.active is inst
+        YAMLWhere.from_string(SOURCE).get_range(Key("a"))
+    finally:
+        instrumentation.disable()
+    assert instrumentation.active is None
+    assert inst.stats().phases[QUERY].count == 1
+
+
+def test_instrumented_restores_previous():
+    with instrumented() as outer:
+        with instrumented() as inner:
+            assert instrumentation.active is inner
+        assert instrumentation.active is outer
+
+
+def test_reset():
+    with instrumented() as inst:
+        YAMLWhere.from_string(SOURCE)
+    inst.reset()
+    assert inst.stats().phases[PARSE].count == 0
+
+
+def test_nested_measurements_add_visits():
+    inst = Instrumentation()
+    with inst.measure(QUERY, "outer"):
+        inst.visit()
+        with inst.measure(QUERY, "inner"):
+            inst.visit(2)
+    assert inst.stats().nodes_visited == 2 + 3
+
+
+def test_visits_outside_queries_are_ignored():
+    inst = Instrumentation()
+    inst.visit()
+    inst.record(Measurement(INDEX, "index", 0.5))
+    assert inst.stats().nodes_visited == 0
+    assert inst.stats().phases[INDEX].seconds == 0.5
+
+
+def test_threads_count_their_own_visits():
+    inst = Instrumentation()
+    started = threading.Barrier(2)
+
+    def query(count):
+        with inst.measure(QUERY, "query", count):
+            started.wait()
+            inst.visit(count)
+
+    threads = [threading.Thread(target=query, args=(count,)) for count in (1, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert inst.stats().nodes_visited == 11
+
+
+def test_compiling_is_measured():
+    source_map = YAMLWhere.from_string(SOURCE)
+    measurements = []
+    with instrumented(callback=measurements.append):
+        source_map.compile()
+    assert [(m.phase, m.operation) for m in measurements] == [(COMPOSE, "from_node")]
+
+
+def test_nested_queries_are_part_of_the_outer_query(source_map_type):
+    measurements = []
+    source_map = source_map_type.from_string(SOURCE)
+    with instrumented(callback=measurements.append):
+        source_map.get_ranges([(Value("b"), Value("c"), Index(0))])
+    assert [m.operation for m in measurements if m.phase == QUERY] == ["get_ranges"]
+
+
+def test_lazy_queries_are_measured_once():
+    measurements = []
+    source_map = LazySourceMap.from_string(SOURCE)
+    with instrumented(callback=measurements.append):
+        source_map.get_range(Value("b"), Value("c"))
+        source_map.get_path(Position(2, 6))
+    assert [m.operation for m in measurements if m.phase == QUERY] == ["get_range", "get_path"]
+
+
+def test_measured_functions_are_measured_while_enabled():
+    @instrumentation.measured(INDEX, "double", lambda value: value)
+    def double(value):
+        return value * 2
+
+    measurements = []
+    assert double(1) == 2
+    with instrumented(callback=measurements.append):
+        assert double(2) == 4
+    assert [(m.phase, m.operation, m.detail) for m in measurements] == [(INDEX, "double", 2)]
+
+
+def test_subclasses_override_get_range():
+    class Fixed(YAMLWhereMapping):
+        def get_range(self, *path):
+            return Range(Position(0, 0), Position(0, 1))
+
+    source_map = Fixed(YAMLWhere.from_string(SOURCE).node)
+    with instrumented():
+        assert source_map.get_range(Key("a")) == Range(Position(0, 0), Position(0, 1))
+        assert source_map.get_ranges([(Key("a"),)]) == [Range(Position(0, 0), Position(0, 1))]
@@ -0,0 +1,237 @@
+import pytest
+from ruamel.yaml.error import YAMLError
+from yaml_where import LazySourceMap, YAMLWhere
+from yaml_where.exceptions import MissingKeyError, NoSuchPathError, UndefinedAccessError, YAMLWhereException
+from yaml_where.instrumentation import INDEX, QUERY, instrumented
+from yaml_where.path import AnyKey, Descendants, Index, Item, Key, Value
+from yaml_where.range import Position, Range
+from yaml_where.testing.helpers import positions
+
+MAPPING = """\
+# A comment before the first entry
+---
+a: 1
+# A comment between entries
+
+b:
+  c: [1,
+    2]
+  d: |
+    text
+'e f':
+- 1
+- g: h
+  i: j
+"""
+
+SEQUENCE = """\
+- a
+-
+- b: c
+  d: e
+- - 1
+  - 2
+"""
+
+# Documents which are composed as a whole, because of their top level or their entries
+WHOLE = [
+    "[1,\n 2]\n",
+    "42\n",
+    "a: &x 1\nb: *x\n",
+    "a: [1,\n2]\n",
+    '- "a\nb"\n',
+    "? a\n: 1\n",
+    "%YAML 1.2\n---\na: 1\n",
+    "--- !!map\na: 1\n",
+    "a: 1\n...\n",
+    "",
+]
+
+
+def _query(query, *args):
+    try:
+        return query(*args)
+    except YAMLWhereException as err:
+        return type(err)
+
+
+def _paths(source_map):
+    paths = [path for path, _ in source_map.find_ranges([Descendants()])]
+    paths += [path for path, _ in source_map.find_ranges([Descendants(), AnyKey(Key)])]
+    paths += [path for path, _ in source_map.find_ranges([Descendants(), AnyKey(Item)])]
+    return paths + [(Value("missing"),), (Index(0),), (Index(-1),), (Index(9),), (), (Value("a"), Value("x"))]
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        MAPPING,
+        SEQUENCE,
+        "a: |\nb: c\n",
+        "a: 1\r\nb:\r\n  c: 2\r\n",
+        "\ufeffa: 1\nb: 2\n",
+        # Empty values and block scalars at the ends of entries, which are placed by the start of the next entry
+        "a:  # comment\nb: 1\n",
+        "- a:  # comment\n- b\n",
+        "a:\n  b: >-\n    x\n\n# comment\nc: |+\n  y\n\nd:  # comment\n",
+    ],
+)
+@pytest.mark.parametrize("max_subtrees", [16, 1, 0])
+def test_same_as_yaml_where(source, max_subtrees):
+    expected = YAMLWhere.from_string(source)
+    source_map = LazySourceMap.from_string(source, max_subtrees=max_subtrees)
+    for path in _paths(expected):
+        assert _query(source_map.get_range, *path) == _query(expected.get_range, *path)
+    for pos in positions(source):
+        assert _query(source_map.get_path, pos) == _query(expected.get_path, pos)
+    assert source_map.lazy
+
+
+@pytest.mark.parametrize("source", WHOLE)
+def test_composed_as_a_whole(source):
+    expected = YAMLWhere.from_string(source)
+    source_map = LazySourceMap.from_string(source)
+    for path in _paths(expected):
+        assert _query(source_map.get_range, *path) == _query(expected.get_range, *path)
+    for pos in positions(source):
+        assert _query(source_map.get_path, pos) == _query(expected.get_path, pos)
+    assert not source_map.lazy
+
+
+def test_only_queried_entries_are_composed():
+    source_map = LazySourceMap.from_string(MAPPING)
+    assert source_map.stats.misses == 0
+    assert source_map.get_range(Value("b"), Value("d")) == Range.from_parts(8, 5, 10, 0)
+    assert source_map.get_path(Position(7, 4)) == (Value("b"), Value("c"), Index(1))
+    stats = source_map.stats
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+    assert stats.size == len("b:\n  c: [1,\n    2]\n  d: |\n    text\n")
+
+
+def test_plain_keys_are_found_without_composing_other_entries():
+    source_map = LazySourceMap.from_string("a: 1\nb: 2\nc: 3\n")
+    assert source_map.get_range(Value("c")) == Range.from_parts(2, 3, 2, 4)
+    with pytest.raises(MissingKeyError):
+        source_map.get_range(Value("d"))
+    assert source_map.stats.misses == 1
+
+
+def test_entries_with_unknown_keys_are_composed_in_order():
+    source_map = LazySourceMap.from_string("'a': 1\n\"b\": 2\nb: 3\n")
+    assert source_map.get_range(Value("b")) == Range.from_parts(1, 5, 1, 6)
+    assert source_map.stats.misses == 2
+    assert source_map.get_range(Value("b")) == Range.from_parts(1, 5, 1, 6)
+    assert source_map.stats.misses == 2
+
+
+def test_unknown_keys_after_known_duplicates():
+    source_map = LazySourceMap.from_string("b: 1\n'b': 2\n")
+    with pytest.raises(MissingKeyError):
+        source_map.get_range(Value("c"))
+    assert source_map.get_range(Value("b")) == Range.from_parts(0, 3, 0, 4)
+
+
+def test_duplicate_keys_resolve_to_the_first():
+    source_map = LazySourceMap.from_string("a: 1\n'a': 2\na: 3\n")
+    assert source_map.get_range(Value("a")) == Range.from_parts(0, 3, 0, 4)
+
+
+def test_complex_keys():
+    source_map = LazySourceMap.from_string("[a]: 1\nb: 2\n")
+    assert source_map.get_range(Value("b")) == Range.from_parts(1, 3, 1, 4)
+    with pytest.raises(MissingKeyError):
+        source_map.get_range(Value(["a"]))
+    assert source_map.lazy
+
+
+def test_aliases_within_an_entry():
+    source_map = LazySourceMap.from_string("a: 1\nb: [&x 1, *x]\n")
+    assert source_map.get_range(Value("b"), Index(1)) == Range.from_parts(1, 4, 1, 8)
+    assert source_map.lazy
+
+
+def test_positions_in_entries_which_do_not_compose_on_their_own():
+    source_map = LazySourceMap.from_string("a: &x 1\nb: *x\n")
+    assert source_map.get_path(Position(1, 0)) == (Key("b"),)
+    assert not source_map.lazy
+
+
+def test_eviction():
+    source_map = LazySourceMap.from_string("a: 1\nb: 2\nc: 3\n", max_subtrees=2)
+    for key in "abca":
+        source_map.get_range(Value(key))
+    stats = source_map.stats
+    assert (stats.hits, stats.misses, stats.evictions, stats.entries) == (0, 4, 2, 2)
+    source_map.get_range(Value("a"))
+    assert source_map.stats.hits == 1
+
+
+def test_no_entries_are_kept():
+    source_map = LazySourceMap.from_string("a: 1\nb: 2\n", max_subtrees=0)
+    source_map.get_range(Value("a"))
+    source_map.get_range(Value("a"))
+    stats = source_map.stats
+    assert (stats.hits, stats.misses, stats.entries, stats.size) == (0, 2, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "path, error",
+    [((), UndefinedAccessError), ((Index(0),), UndefinedAccessError), ((Value("x"),), MissingKeyError)],
+)
+def test_mapping_errors(path, error):
+    with pytest.raises(error):
+        LazySourceMap.from_string(MAPPING).get_range(*path)
+
+
+@pytest.mark.parametrize(
+    "path, error",
+    [((), UndefinedAccessError), ((Value("a"),), UndefinedAccessError), ((Index(4),), MissingKeyError)],
+)
+def test_sequence_errors(path, error):
+    with pytest.raises(error):
+        LazySourceMap.from_string(SEQUENCE).get_range(*path)
+
+
+def test_sequence_items():
+    source_map = LazySourceMap.from_string(SEQUENCE)
+    assert source_map.get_range(Index(-1), Index(1)) == Range.from_parts(5, 4, 5, 5)
+    assert source_map.get_path(Position(3, 5)) == (Index(2), Value("d"))
+    with pytest.raises(NoSuchPathError):
+        source_map.get_path(Position(1, 0))
+
+
+def test_errors_are_raised_by_queries_which_reach_them():
+    source_map = LazySourceMap.from_string("a: 1\nb: [\n")
+    assert source_map.get_range(Value("a")) == Range.from_parts(0, 3, 0, 4)
+    with pytest.raises(YAMLError):
+        source_map.get_range(Value("b"))
+
+
+def test_c_engine():
+    source_map = LazySourceMap.from_string(MAPPING, engine="c")
+    assert source_map.get_range(Value("e f"), Index(1), Value("i")) == Range.from_parts(13, 5, 13, 6)
+
+
+def test_from_path(tmp_path):
+    path = tmp_path / "doc.yaml"
+    path.write_text("ä: ö\nb: 2\n", encoding="utf-8")
+    source_map = LazySourceMap.from_path(path)
+    assert source_map.get_range(Value("b")) == Range.from_parts(1, 3, 1, 4)
+    assert source_map.filename == str(path)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        LazySourceMap.from_string("a: 1\n", engine="rust")
+    with pytest.raises(ValueError):
+        LazySourceMap.from_string("a: 1\n", max_subtrees=-1)
+
+
+def test_is_instrumented():
+    with instrumented() as inst:
+        source_map = LazySourceMap.from_string(MAPPING)
+        source_map.get_range(Value("a"))
+        source_map.get_path(Position(2, 0))
+    stats = inst.stats()
+    assert stats.phases[INDEX].count >= 1
+    assert stats.phases[QUERY].count == 2
@@ -0,0 +1,163 @@
+import io
+
+import pytest
+from yaml_where import CompiledSourceMap, LazySourceMap, YAMLWhere, storage
+from yaml_where.lines import LineIndex
+from yaml_where.path import Index, Item, Value
+from yaml_where.range import Position
+
+
+def test_line_starts():
+    lines = LineIndex("a: 1\nb: 2\r\nc: 3\rd: 4")
+    assert list(lines.line_starts) == [0, 5, 11, 16]
+    assert len(lines) == 4
+
+
+@pytest.mark.parametrize("offset", range(21))
+def test_offset_and_position_round_trip(offset):
+    lines = LineIndex("a: 1\nb: 2\n\nc:\n  - 3\n")
+    assert lines.offset(lines.position(offset)) == offset
+
+
+@pytest.mark.parametrize("source", ["a: 1\r\nb: 2\r\n", "\u00e9: 1\r\nb: 2\r\n"])
+def test_position_within_line_break_is_at_end_of_line(source):
+    lines = LineIndex(source)
+    assert lines.position(5) == Position(0, 4)
+    assert lines.offset(lines.position(5)) == 4
+    assert lines.position_at_byte(len(source[:5].encode())) == Position(0, 4)
+
+
+def test_line_end_excludes_line_break():
+    source = "ab\r\ncd\nef"
+    lines = LineIndex(source)
+    assert [lines.line_end(line) for line in range(len(lines))] == [2, 6, 9]
+
+
+def test_byte_order_mark_is_not_counted_in_columns():
+    lines = LineIndex("\ufeffa: 1\nb: 2")
+    assert lines.offset(Position(0, 0)) == 1
+    assert lines.position(1) == Position(0, 0)
+    assert lines.offset(Position(1, 1)) == 7
+
+
+@pytest.mark.parametrize("pos", [Position(-1, 0), Position(2, 0), Position(0, -1), Position(0, 5)])
+def test_offset_of_position_outside_source(pos):
+    with pytest.raises(ValueError):
+        LineIndex("a: 1\nb: 2").offset(pos)
+
+
+@pytest.mark.parametrize("offset", [-1, 10])
+def test_position_of_offset_outside_source(offset):
+    with pytest.raises(ValueError):
+        LineIndex("a: 1\nb: 2").position(offset)
+
+
+MIXED = "\ufeffa: \u00e9t\u00e9\r\nb: [\U0001f600, x]\nc: plain\r\u4e2d: \U0001f600\U0001f601z\n"
+
+
+def _positions(source):
+    lines = LineIndex(source)
+    for line in range(len(lines)):
+        for column in range(lines.line_end(line) - lines.line_starts[line] + 1):
+            yield Position(line, column)
+
+
+@pytest.mark.parametrize("source", [MIXED, "a: 1\nb: 2", "", "\u00e9"])
+def test_byte_offsets(source):
+    lines = LineIndex(source)
+    for pos in _positions(source):
+        expected = len(source[: lines.offset(pos)].encode("utf-8"))
+        assert lines.byte_offset(pos) == expected
+        assert lines.position_at_byte(expected) == pos
+
+
+def test_byte_offset_inside_character():
+    lines = LineIndex("a: \u00e9\n")
+    with pytest.raises(ValueError):
+        lines.position_at_byte(4)
+
+
+@pytest.mark.parametrize("offset", [-1, 7])
+def test_position_of_byte_offset_outside_source(offset):
+    with pytest.raises(ValueError):
+        LineIndex("a: \u00e9\n").position_at_byte(offset)
+
+
+def test_byte_offset_of_byte_order_mark():
+    assert LineIndex("\ufeffa").position_at_byte(1) == Position(0, 0)
+
+
+@pytest.mark.parametrize("source", [MIXED, "a: 1\nb: \u00e9"])
+def test_utf16_columns(source):
+    lines = LineIndex(source)
+    for pos in _positions(source):
+        start = lines.line_starts[pos.line]
+        expected = len(source[start : lines.offset(pos)].encode("utf-16-le")) // 2
+        assert lines.utf16_column(pos) == expected
+        assert lines.position_at_utf16(pos.line, expected) == pos
+
+
+def test_utf16_column_inside_character():
+    with pytest.raises(ValueError):
+        LineIndex("a: \U0001f600\n").position_at_utf16(0, 4)
+
+
+@pytest.mark.parametrize("line, column", [(0, 6), (0, 9), (2, 0), (-1, 0)])
+def test_utf16_column_outside_source(line, column):
+    with pytest.raises(ValueError):
+        LineIndex("a: \U0001f600\n").position_at_utf16(line, column)
+
+
+def test_get_text():
+    source_map = YAMLWhere.from_string("a: \U0001f600\nb:\n  - [x, y]\n  - 'z'\n")
+    assert source_map.get_text(Value("a")) == "\U0001f600"
+    assert source_map.get_text(Value("b"), Index(0)) == "[x, y]"
+    assert source_map.get_text(Item("b")) == "b:\n  - [x, y]\n  - 'z'\n"
+    assert source_map.lines is source_map.lines
+
+
+def test_get_text_requires_source():
+    source_map = YAMLWhere.from_file(io.StringIO("a: 1\n"))
+    with pytest.raises(ValueError):
+        source_map.get_text(Value("a"))
+
+
+def test_get_text_of_documents_in_a_stream():
+    documents = list(YAMLWhere.iter_documents("a: 1\n---\nb: [x, y]\n"))
+    assert documents[1].get_text(Value("b"), Index(1)) == "y"
+
+
+def _from_file(path):
+    with open(path, "rb") as stream:
+        return YAMLWhere.from_file(stream)
+
+
+@pytest.mark.parametrize("create", [YAMLWhere.from_path, _from_file])
+def test_get_text_reads_files(tmp_path, create):
+    path = tmp_path / "doc.yaml"
+    path.write_bytes("a: \U0001f600\nb: [x, y]\n".encode("utf-8"))
+    source_map = create(path)
+    assert source_map.source is None
+    assert source_map.get_text(Value("b"), Index(0)) == "x"
+    assert source_map.lines.position(5) == Position(1, 0)
+
+
+@pytest.mark.parametrize("source_map_type", [CompiledSourceMap, LazySourceMap])
+def test_get_text_of_other_source_maps(source_map_type):
+    source_map = source_map_type.from_string("a: \U0001f600\nb:\n  - [x, y]\n  - 'z'\n")
+    assert source_map.get_text(Value("a")) == "\U0001f600"
+    assert source_map.get_text(Value("b"), Index(1)) == "'z'"
+    assert source_map.lines is source_map.lines
+
+
+def test_compiled_source_maps_keep_the_source():
+    source = "a: [x, y]\n"
+    assert YAMLWhere.from_string(source).compile().get_text(Value("a"), Index(0)) == "x"
+    assert CompiledSourceMap.from_string(source, engine="c").get_text(Value("a")) == "[x, y]"
+
+
+def test_stored_source_maps_have_no_source():
+    source_map = storage.loads(storage.dumps(CompiledSourceMap.from_string("a: 1\n")))
+    assert source_map.source is None
+    with pytest.raises(ValueError):
+        source_map.get_text(Value("a"))
@@ -0,0 +1,110 @@
+import pytest
+from yaml_where import CompiledSourceMap, YAMLWhere
+from yaml_where.exceptions import NoSuchPathError
+from yaml_where.instrumentation import QUERY, instrumented
+from yaml_where.path import Index, Key, Value
+from yaml_where.range import Position
+from yaml_where.testing.helpers import positions
+
+SOURCE = """\
+# leading comment
+a:
+  b: 1
+  # comment
+  c: [1, 2]
+d:
+  - x
+  -  y
+"""
+
+
+@pytest.mark.parametrize(
+    "pos, enclosing, before, after",
+    [
+        # Separator
+        (Position(1, 1), (), (Key("a"),), (Value("a"), Key("b"))),
+        # Comment inside a mapping
+        (Position(3, 4), (Value("a"),), (Value("a"), Value("b")), (Value("a"), Key("c"))),
+        # Indentation
+        (Position(4, 0), (Value("a"),), (Value("a"), Value("b")), (Value("a"), Key("c"))),
+        # Inside a flow sequence
+        (
+            Position(4, 8),
+            (Value("a"), Value("c")),
+            (Value("a"), Value("c"), Index(0)),
+            (Value("a"), Value("c"), Index(1)),
+        ),
+        # Sequence entry markers
+        (Position(6, 2), (Value("d"),), (Value("d"),), (Value("d"), Index(0))),
+        (Position(7, 3), (Value("d"),), (Value("d"), Index(0)), (Value("d"), Index(1))),
+        # Before and after the document's elements
+        (Position(0, 3), (), (), (Key("a"),)),
+        (Position(9, 0), (), (Value("d"), Index(1)), ()),
+    ],
+)
+def test_positions_between_elements(source_map, pos, enclosing, before, after):
+    with pytest.raises(NoSuchPathError):
+        source_map.get_path(pos)
+    assert source_map.get_nearest_path(pos) == enclosing
+    assert source_map.get_nearest_path(pos, bias="before") == before
+    assert source_map.get_nearest_path(pos, bias="after") == after
+
+
+@pytest.mark.parametrize("bias", ["enclosing", "before", "after"])
+def test_positions_in_elements(source_map, bias):
+    for pos in positions(SOURCE):
+        try:
+            path = source_map.get_path(pos)
+        except NoSuchPathError:
+            continue
+        assert source_map.get_nearest_path(pos, bias) == path
+
+
+@pytest.mark.parametrize("bias", ["before", "after"])
+def test_empty_collection(bias):
+    source_map = YAMLWhere.from_string("a: {}\nb: 1\n")
+    assert source_map.get_nearest_path(Position(0, 4), bias) == (Value("a"),)
+
+
+def test_scalar_document():
+    assert YAMLWhere.from_string("  42  ").get_nearest_path(Position(0, 0)) == ()
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+def test_empty_document(source_map_type):
+    with pytest.raises(NoSuchPathError):
+        source_map_type.from_string("").get_nearest_path(Position(0, 0), bias="after")
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+def test_unknown_bias(source_map_type):
+    with pytest.raises(ValueError):
+        source_map_type.from_string(SOURCE).get_nearest_path(Position(0, 0), bias="nearest")
+
+
+@pytest.mark.parametrize("source", ["- &x [1, 2]\n- a\n-  *x\n", "a: &m\n  b: *m\n", "&s [1, *s, 2]\n"])
+def test_aliases(source):
+    source_map = YAMLWhere.from_string(source)
+    compiled = source_map.compile()
+    for pos in positions(source):
+        for bias in ("enclosing", "before", "after"):
+            assert source_map.get_nearest_path(pos, bias) == compiled.get_nearest_path(pos, bias)
+
+
+def test_recursive_alias_is_not_followed():
+    source_map = YAMLWhere.from_string("a: &m\n  b: *m\n")
+    assert source_map.get_nearest_path(Position(2, 0), bias="before") == (Value("a"), Value("b"))
+
+
+def test_is_one_query(source_map):
+    with instrumented() as inst:
+        source_map.get_nearest_path(Position(3, 4), bias="after")
+    assert inst.stats().phases[QUERY].count == 1
+
+
+def test_linear_scans_count_visits():
+    source_map = YAMLWhere.from_string("- &x [1, 2]\n- a\n-  *x\n")
+    for query in (source_map, source_map.compile()):
+        with instrumented() as inst:
+            assert query.get_nearest_path(Position(1, 0), bias="after") == (Index(1),)
+        assert inst.stats().nodes_visited == 8
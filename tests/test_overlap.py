@@ -0,0 +1,177 @@
+import pytest
+from yaml_where import CompiledSourceMap, YAMLWhere
+from yaml_where.exceptions import NoSuchPathError
+from yaml_where.instrumentation import INDEX, QUERY, instrumented
+from yaml_where.path import AnyKey, Descendants, Index, Key, Value
+from yaml_where.range import Position, Range
+from yaml_where.testing.helpers import positions
+
+SOURCE = """\
+a:
+  b: 1
+  c: [1, 2]
+d:
+  - x
+  - {e: y}
+"""
+
+
+def test_overlapping_lines(source_map):
+    assert source_map.get_paths_overlapping(Range.from_parts(2, 0, 4, 0)) == [
+        (),
+        (Value("a"),),
+        (Value("a"), Key("c")),
+        (Value("a"), Value("c")),
+        (Value("a"), Value("c"), Index(0)),
+        (Value("a"), Value("c"), Index(1)),
+        (Key("d"),),
+    ]
+
+
+def test_overlapping_part_of_an_element(source_map):
+    assert source_map.get_paths_overlapping(Range.from_parts(5, 8, 5, 9)) == [
+        (),
+        (Value("d"),),
+        (Value("d"), Index(1)),
+        (Value("d"), Index(1), Value("e")),
+    ]
+
+
+def test_empty_range_overlaps_the_elements_containing_it(source_map):
+    for pos in positions(SOURCE):
+        paths = source_map.get_paths_overlapping(Range(pos, pos))
+        try:
+            path = source_map.get_path(pos)
+        except NoSuchPathError:
+            assert not paths or paths[-1] == source_map.get_nearest_path(pos)
+        else:
+            assert paths[-1] == path
+
+
+def test_within(source_map):
+    assert source_map.get_paths_within(Range.from_parts(2, 2, 5, 0)) == [
+        (Value("a"), Key("c")),
+        (Value("a"), Value("c")),
+        (Value("a"), Value("c"), Index(0)),
+        (Value("a"), Value("c"), Index(1)),
+        (Key("d"),),
+        (Value("d"), Index(0)),
+    ]
+
+
+def test_within_element_range(source_map):
+    rng = source_map.get_range(Value("a"), Value("c"))
+    assert source_map.get_paths_within(rng) == [
+        (Value("a"), Value("c")),
+        (Value("a"), Value("c"), Index(0)),
+        (Value("a"), Value("c"), Index(1)),
+    ]
+
+
+def test_range_between_elements(source_map):
+    assert source_map.get_paths_overlapping(Range.from_parts(1, 0, 1, 2)) == [()]
+    assert source_map.get_paths_within(Range.from_parts(1, 0, 1, 2)) == []
+
+
+def test_matches_brute_force(source_map):
+    elements = [*source_map.find_ranges([Descendants()]), *source_map.find_ranges([Descendants(), AnyKey(Key)])]
+    points = list(positions(SOURCE))
+    for start in points[::3]:
+        for end in points[::5]:
+            if end < start:
+                continue
+            rng = Range(start, end)
+            overlapping = {path for path, element in elements if element.start in rng or rng.start in element}
+            assert set(source_map.get_paths_overlapping(rng)) == overlapping
+            assert set(source_map.get_paths_within(rng)) == {path for path, element in elements if element <= rng}
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+def test_empty_document(source_map_type):
+    source_map = source_map_type.from_string("")
+    assert source_map.get_paths_overlapping(Range.from_parts(0, 0, 1, 0)) == []
+    assert source_map.get_paths_within(Range.from_parts(0, 0, 1, 0)) == []
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+def test_scalar_document(source_map_type):
+    source_map = source_map_type.from_string("x\n")
+    assert source_map.get_paths_overlapping(Range.from_parts(0, 0, 1, 0)) == [()]
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+def test_empty_values(source_map_type):
+    source_map = source_map_type.from_string("a:\nb: 1\n")
+    assert source_map.get_paths_within(Range.from_parts(0, 0, 1, 0)) == [(Key("a"),), (Value("a"),)]
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+def test_aliases_have_the_range_of_their_anchor(source_map_type):
+    source_map = source_map_type.from_string("a: &x [1]\nb: *x\n? [c]\n: 2\n")
+    assert source_map.get_paths_within(Range.from_parts(0, 3, 0, 9)) == [
+        (Value("a"),),
+        (Value("b"),),
+        (Value("a"), Index(0)),
+        (Value("b"), Index(0)),
+    ]
+    assert source_map.get_paths_overlapping(Range.from_parts(2, 0, 3, 3)) == [()]
+
+
+ALIASES = "x: &q1 {y: &q2 {z: 1}, u: *q2}\nv: *q1\nw: &r [*r, *q2]\n"
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+def test_paths_under_aliases_of_aliases(source_map_type):
+    source_map = source_map_type.from_string(ALIASES)
+    elements = [*source_map.find_ranges([Descendants()]), *source_map.find_ranges([Descendants(), AnyKey(Key)])]
+    end = Position(3, 0)
+    for start in positions(ALIASES):
+        if end < start:
+            continue
+        rng = Range(start, end)
+        overlapping = {path for path, element in elements if element.start in rng or rng.start in element}
+        assert set(source_map.get_paths_overlapping(rng)) == overlapping
+        assert set(source_map.get_paths_within(rng)) == {path for path, element in elements if element <= rng}
+
+    assert source_map.get_paths_within(Range.from_parts(0, 11, 0, 21)) == [
+        (Value("x"), Value("y")),
+        (Value("x"), Value("u")),
+        (Value("v"), Value("y")),
+        (Value("v"), Value("u")),
+        (Value("w"), Index(1)),
+        (Value("x"), Value("y"), Key("z")),
+        (Value("x"), Value("u"), Key("z")),
+        (Value("v"), Value("y"), Key("z")),
+        (Value("v"), Value("u"), Key("z")),
+        (Value("w"), Index(1), Key("z")),
+        (Value("x"), Value("y"), Value("z")),
+        (Value("x"), Value("u"), Value("z")),
+        (Value("v"), Value("y"), Value("z")),
+        (Value("v"), Value("u"), Value("z")),
+        (Value("w"), Index(1), Value("z")),
+    ]
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+def test_aliases_are_indexed_once(source_map_type):
+    source = "a0: &a0 [x]\n" + "".join(f"a{i}: &a{i} [{', '.join([f'*a{i - 1}'] * 10)}]\n" for i in range(1, 10))
+    source_map = source_map_type.from_string(source)
+    assert source_map.get_paths_overlapping(Range.from_parts(9, 0, 9, 2)) == [(), (Key("a9"),)]
+    assert len(source_map._interval_index().paths) < 200
+
+
+def test_index_is_rebuilt_after_edits():
+    source_map = YAMLWhere.from_string(SOURCE)
+    assert (Value("a"), Value("b")) in source_map.get_paths_within(Range.from_parts(1, 0, 2, 0))
+    source_map = source_map.apply_edit(Range.from_parts(1, 2, 1, 3), "f")
+    assert (Value("a"), Value("f")) in source_map.get_paths_within(Range.from_parts(1, 0, 2, 0))
+
+
+def test_queries_are_measured(source_map):
+    with instrumented() as inst:
+        source_map.get_paths_overlapping(Range.from_parts(2, 0, 4, 0))
+        source_map.get_paths_within(Range.from_parts(2, 0, 4, 0))
+    stats = inst.stats()
+    assert stats.phases[QUERY].count == 2
+    assert stats.phases[INDEX].count >= 1
+    assert stats.nodes_visited > 0
@@ -1,4 +1,8 @@
-from yaml_where import path
+import pickle
+
+import pytest
+from yaml_where import CompiledSourceMap, LazySourceMap, Range, YAMLWhere, path
+from yaml_where.exceptions import PathSyntaxError
 
 
 def test_key_repr():
@@ -27,3 +31,151 @@ def test_index_repr():
 
 def test_index_str():
     assert str(path.Index(0)) == "index/0"
+
+
+def test_equality_depends_on_type():
+    assert path.Key("a") == path.Key("a")
+    assert path.Key("a") != path.Value("a")
+    assert path.Item("a") != path.Key("a")
+    assert path.Index(0) != path.Value(0)
+    assert path.Key("a") != "a"
+
+
+def test_hashable():
+    paths = {(path.Value("a"), path.Index(0)): 1, (path.Value("a"), path.Index(1)): 2}
+    assert paths[(path.Value("a"), path.Index(0))] == 1
+    assert len({path.Key("a"), path.Key("a"), path.Value("a")}) == 2
+
+
+def test_intern():
+    component = path.Key.intern("a")
+    assert path.Key.intern("a") is component
+    assert path.Key.intern("a") == component
+    assert component == path.Key("a")
+    assert path.Value.intern("a") is not component
+    assert path.Index.intern(1) is not path.Index.intern(True)
+
+
+def test_slots():
+    with pytest.raises(AttributeError):
+        path.Key("a").other = 1
+
+
+def test_pickle():
+    components = (path.Item("a"), path.Key("b"), path.Value("c"), path.Index(1))
+    assert pickle.loads(pickle.dumps(components)) == components
+
+
+POINTERS = {
+    "": (),
+    "/spec/containers/0/image": (path.Value("spec"), path.Value("containers"), path.Token("0"), path.Value("image")),
+    "/a~1b/~0/01/-/": (path.Value("a/b"), path.Value("~"), path.Value("01"), path.Value("-"), path.Value("")),
+}
+
+DOTTED = {
+    "": (),
+    "spec.containers[0].image": (path.Value("spec"), path.Value("containers"), path.Index(0), path.Value("image")),
+    "[1][2]": (path.Index(1), path.Index(2)),
+    'labels["app.kubernetes.io/name"]["a \\"b\\""][""]': (
+        path.Value("labels"),
+        path.Value("app.kubernetes.io/name"),
+        path.Value('a "b"'),
+        path.Value(""),
+    ),
+}
+
+
+@pytest.mark.parametrize("text, expected", POINTERS.items())
+def test_json_pointer(text, expected):
+    pointer = path.JSONPointer.parse(text)
+    assert pointer == expected
+    assert str(pointer) == text
+    assert path.JSONPointer.parse(text) is pointer
+
+
+@pytest.mark.parametrize("text", ["a/b", "/a~2", "/a~"])
+def test_invalid_json_pointer(text):
+    with pytest.raises(PathSyntaxError):
+        path.JSONPointer.parse(text)
+
+
+@pytest.mark.parametrize("text, expected", DOTTED.items())
+def test_dotted_path(text, expected):
+    dotted = path.DottedPath.parse(text)
+    assert dotted == expected
+    assert str(dotted) == text
+    assert path.DottedPath.parse(text) is dotted
+
+
+def test_dotted_path_canonical_form():
+    dotted = path.DottedPath.parse('["a"]["0"]')
+    assert dotted == (path.Value("a"), path.Value("0"))
+    assert str(dotted) == "a.0"
+
+
+@pytest.mark.parametrize("text", ["a..b", ".a", "a.", "a b", "a[01]", "a[x]", "a[0", 'a["\\q"]', "a[0]b", "a['b']"])
+def test_invalid_dotted_path(text):
+    with pytest.raises(PathSyntaxError):
+        path.DottedPath.parse(text)
+
+
+def test_from_path():
+    components = (path.Value("a.b/c"), path.Index(3))
+    assert str(path.JSONPointer.from_path(components)) == "/a.b~1c/3"
+    assert str(path.DottedPath.from_path(components)) == '["a.b/c"][3]'
+
+
+@pytest.mark.parametrize("syntax", [path.JSONPointer, path.DottedPath])
+@pytest.mark.parametrize("component", [path.Key("a"), path.Item("a"), path.Value(None)])
+def test_unwritable_paths(syntax, component):
+    with pytest.raises(ValueError):
+        syntax.from_path((path.Value("a"), component))
+
+
+OPENAPI = """\
+paths:
+  /pets:
+    get:
+      responses:
+        200:
+          description: A list of pets
+"""
+
+
+TOKENS = [
+    (OPENAPI, "/paths/~1pets/get/responses/200/description", Range.from_parts(5, 23, 5, 37)),
+    ("env: {0: zero}\n", "/env/0", Range.from_parts(0, 9, 0, 13)),
+    ("env: [zero, one]\n", "/env/1", Range.from_parts(0, 12, 0, 15)),
+    ("- a: [x, {0: y}]\n", "/0/a/1/0", Range.from_parts(0, 13, 0, 14)),
+]
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap, LazySourceMap])
+@pytest.mark.parametrize("source, pointer, expected", TOKENS)
+def test_json_pointer_tokens_are_resolved_against_their_collections(source_map_type, source, pointer, expected):
+    source_map = source_map_type.from_string(source)
+    assert source_map.get_range(*path.JSONPointer.parse(pointer)) == expected
+
+
+@pytest.mark.parametrize("source_map_type", [YAMLWhere, CompiledSourceMap])
+@pytest.mark.parametrize("source, pointer, expected", TOKENS)
+def test_json_pointers_as_patterns(source_map_type, source, pointer, expected):
+    source_map = source_map_type.from_string(source)
+    assert [rng for _, rng in source_map.find_ranges(path.JSONPointer.parse(pointer))] == [expected]
+
+
+def test_token():
+    token = path.Token("0")
+    assert token.value() == "0"
+    assert token.index() == 0
+    assert str(token) == "token/0"
+    assert token != path.Value("0")
+    assert token != path.Index(0)
+
+
+def test_expressions_as_paths():
+    source_map = YAMLWhere.from_string("spec:\n  containers:\n    - image: x\n")
+    expected = source_map.get_range(path.Value("spec"), path.Value("containers"), path.Index(0), path.Value("image"))
+    assert source_map.get_range(*path.JSONPointer.parse("/spec/containers/0/image")) == expected
+    assert source_map.get_ranges([path.DottedPath.parse("spec.containers[0].image")]) == [expected]
+    assert {path.DottedPath.parse("spec"): 1}[(path.Value("spec"),)] == 1
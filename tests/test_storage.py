@@ -0,0 +1,141 @@
+import pytest
+from yaml_where import YAMLWhere, storage
+from yaml_where.compiled import CompiledSourceMap
+from yaml_where.exceptions import SourceMapFormatError, StaleSourceMapError, UndefinedAccessError
+from yaml_where.path import Index, Key, Value
+from yaml_where.range import Position, Range
+from yaml_where.testing.helpers import clean_yaml, positions
+
+YAML = clean_yaml("""
+a:
+    b: 42
+    ä: [1, {c: 2}]
+? [complex]
+: x
+d: &x [3]
+e: *x
+""")
+
+
+def _queries(source_map):
+    results = source_map.get_paths(positions(YAML))
+    results += source_map.get_ranges([(Value("a"), Value("ä"), Index(1), Key("c")), (Value("e"), Index(0))])
+    return [result if isinstance(result, (tuple, Range)) else type(result) for result in results]
+
+
+def test_round_trip():
+    compiled = YAMLWhere.from_string(YAML).compile()
+    loaded = storage.loads(storage.dumps(compiled))
+    assert _queries(loaded) == _queries(compiled)
+    assert loaded.filename is None
+
+
+def test_save_and_load(tmp_path):
+    compiled = YAMLWhere.from_string(YAML).compile()
+    compiled.filename = "dir/doc.yaml"
+    path = tmp_path / "doc.ywsm"
+    storage.save(compiled, path, storage.content_hash(YAML))
+
+    loaded = storage.load(path, storage.content_hash(YAML))
+    assert _queries(loaded) == _queries(compiled)
+    assert loaded.filename == "dir/doc.yaml"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_null_document():
+    loaded = storage.loads(storage.dumps(CompiledSourceMap.from_string("")))
+    with pytest.raises(UndefinedAccessError):
+        loaded.get_range(Value("a"))
+
+
+def test_stale_source():
+    data = storage.dumps(YAMLWhere.from_string(YAML).compile(), storage.content_hash(YAML))
+    with pytest.raises(StaleSourceMapError):
+        storage.loads(data, storage.content_hash(YAML + "f: 1\n"))
+
+
+def test_without_hash_check():
+    data = storage.dumps(YAMLWhere.from_string(YAML).compile(), storage.content_hash(YAML))
+    assert storage.loads(data).get_path(Position(1, 4)) == (Value("a"), Key("b"))
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda data: data[:10],
+        lambda data: b"XXXX" + data[4:],
+        lambda data: data[:4] + b"\x02\x00" + data[6:],
+        lambda data: data[:-1],
+    ],
+)
+def test_malformed_data(mutate):
+    data = storage.dumps(YAMLWhere.from_string(YAML).compile())
+    with pytest.raises(SourceMapFormatError):
+        storage.loads(mutate(data))
+
+
+def test_load_empty_file(tmp_path):
+    path = tmp_path / "empty.ywsm"
+    path.write_bytes(b"")
+    with pytest.raises(SourceMapFormatError):
+        storage.load(path)
+
+
+def test_invalid_source_hash():
+    with pytest.raises(ValueError):
+        storage.dumps(CompiledSourceMap.from_string("a: 1"), b"short")
+
+
+def test_non_string_keys_can_not_be_stored():
+    compiled = CompiledSourceMap.from_string("a: 1")
+    compiled._keys[1] = 1
+    with pytest.raises(ValueError):
+        storage.dumps(compiled)
+
+
+def test_failed_save_leaves_no_files(tmp_path):
+    with pytest.raises(IsADirectoryError):
+        storage.save(CompiledSourceMap.from_string("a: 1"), tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+class TestLoadOrCompile:
+    def test_compiles_and_stores(self, tmp_path):
+        path = tmp_path / "doc.yaml"
+        path.write_text(YAML)
+        cache_path = tmp_path / "doc.ywsm"
+
+        source_map = storage.load_or_compile(path, cache_path)
+        assert source_map.filename == str(path)
+        assert storage.load(cache_path, storage.content_hash(YAML)).filename == str(path)
+
+    def test_loads_stored(self, tmp_path, monkeypatch):
+        path = tmp_path / "doc.yaml"
+        path.write_text(YAML)
+        cache_path = tmp_path / "doc.ywsm"
+        storage.load_or_compile(path, cache_path)
+
+        def fail(*args):
+            raise AssertionError("Source was parsed")
+
+        monkeypatch.setattr(YAMLWhere, "from_string", fail)
+        source_map = storage.load_or_compile(path, cache_path)
+        assert source_map.get_range(Value("a"), Key("b")) == Range.from_parts(1, 4, 1, 5)
+
+    def test_recompiles_changed_source(self, tmp_path):
+        path = tmp_path / "doc.yaml"
+        path.write_text(YAML)
+        cache_path = tmp_path / "doc.ywsm"
+        storage.load_or_compile(path, cache_path)
+
+        path.write_text("z: 1\n")
+        source_map = storage.load_or_compile(path, cache_path)
+        assert source_map.get_range(Key("z")) == Range.from_parts(0, 0, 0, 1)
+        assert storage.load(cache_path).get_range(Key("z")) == Range.from_parts(0, 0, 0, 1)
+
+    def test_replaces_malformed_cache(self, tmp_path):
+        path = tmp_path / "doc.yaml"
+        path.write_text("z: 1\n")
+        cache_path = tmp_path / "doc.ywsm"
+        cache_path.write_bytes(b"garbage")
+        assert storage.load_or_compile(path, cache_path).get_range(Key("z")) == Range.from_parts(0, 0, 0, 1)
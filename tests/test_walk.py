@@ -0,0 +1,124 @@
+import pytest
+from yaml_where import YAMLWhere
+from yaml_where.exceptions import MissingKeyError, UndefinedAccessError
+from yaml_where.path import Index, Key, Value
+from yaml_where.range import Range
+
+SOURCE = """\
+a: 1
+b:
+  c: [x, {d: y}]
+e:
+  - f
+"""
+
+
+def paths(walk):
+    return [path for path, _, _ in walk]
+
+
+def test_walk_in_document_order():
+    assert paths(YAMLWhere.from_string(SOURCE).walk()) == [
+        (Value("a"),),
+        (Value("b"),),
+        (Value("b"), Value("c")),
+        (Value("b"), Value("c"), Index(0)),
+        (Value("b"), Value("c"), Index(1)),
+        (Value("b"), Value("c"), Index(1), Value("d")),
+        (Value("e"),),
+        (Value("e"), Index(0)),
+    ]
+
+
+def test_ranges_match_get_range():
+    source_map = YAMLWhere.from_string(SOURCE)
+    for path, key_range, value_range in source_map.walk():
+        assert value_range == source_map.get_range(*path)
+        if isinstance(path[-1], Value):
+            assert key_range == source_map.get_range(*path[:-1], Key(path[-1].value()))
+        else:
+            assert key_range is None
+
+
+def test_subtree_root():
+    source_map = YAMLWhere.from_string(SOURCE)
+    assert list(source_map.walk(Value("b"), Value("c"))) == [
+        ((Value("b"), Value("c"), Index(0)), None, Range.from_parts(2, 6, 2, 7)),
+        ((Value("b"), Value("c"), Index(1)), None, Range.from_parts(2, 9, 2, 15)),
+        ((Value("b"), Value("c"), Index(1), Value("d")), Range.from_parts(2, 10, 2, 11), Range.from_parts(2, 13, 2, 14)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "max_depth, expected",
+    [
+        (0, []),
+        (1, [(Value("a"),), (Value("b"),), (Value("e"),)]),
+        (2, [(Value("a"),), (Value("b"),), (Value("b"), Value("c")), (Value("e"),), (Value("e"), Index(0))]),
+    ],
+)
+def test_max_depth(max_depth, expected):
+    assert paths(YAMLWhere.from_string(SOURCE).walk(max_depth=max_depth)) == expected
+
+
+def test_max_depth_is_relative_to_root():
+    source_map = YAMLWhere.from_string(SOURCE)
+    assert paths(source_map.walk(Value("b"), max_depth=1)) == [(Value("b"), Value("c"))]
+
+
+def test_negative_max_depth():
+    with pytest.raises(ValueError):
+        YAMLWhere.from_string(SOURCE).walk(max_depth=-1)
+
+
+@pytest.mark.parametrize("source", ["", "42", "a: 1"])
+def test_nothing_below_scalars(source):
+    source_map = YAMLWhere.from_string(source)
+    root = (Value("a"),) if source == "a: 1" else ()
+    assert list(source_map.walk(*root)) == []
+
+
+@pytest.mark.parametrize(
+    "root, error",
+    [
+        ((Value("missing"),), MissingKeyError),
+        ((Value("b"), Value("c"), Index(5)), MissingKeyError),
+        ((Index(0),), UndefinedAccessError),
+        ((Value("a"), Value("x")), UndefinedAccessError),
+    ],
+)
+def test_invalid_root(root, error):
+    # Errors are raised by the call, not when the walk starts
+    with pytest.raises(error):
+        YAMLWhere.from_string(SOURCE).walk(*root)
+
+
+def test_complex_keys_are_skipped():
+    assert paths(YAMLWhere.from_string("? [a]\n: [1]\nb: 2\n").walk()) == [(Value("b"),)]
+
+
+def test_recursive_aliases():
+    assert paths(YAMLWhere.from_string("a: &x [1, *x]\n").walk()) == [
+        (Value("a"),),
+        (Value("a"), Index(0)),
+        (Value("a"), Index(1)),
+    ]
+
+
+def test_anchored_root():
+    assert paths(YAMLWhere.from_string("&x [1, *x]\n").walk()) == [(Index(0),), (Index(1),)]
+
+
+def test_aliases_are_walked():
+    assert paths(YAMLWhere.from_string("a: &x {b: 1}\nc: *x\n").walk()) == [
+        (Value("a"),),
+        (Value("a"), Value("b")),
+        (Value("c"),),
+        (Value("c"), Value("b")),
+    ]
+
+
+def test_walk_does_not_create_calculators():
+    source_map = YAMLWhere.from_string(SOURCE)
+    list(source_map.walk())
+    assert source_map._cache == {}